@@ -0,0 +1,191 @@
+# ArtworkCache.py
+
+# Poster, fanart and logo images of the library, downloaded from the TMDB image server into a content
+# addressed cache shared by every movie folder :
+# - objects/<2 hex>/<sha256 of the content><extension> : every distinct image once, whatever its name
+# - paths/<size>/<TMDB file name> : hardlink to the object of an image already downloaded, no request needed
+# Downloads run on a thread pool, a file being fetched once even if several movies want it at the same time,
+# and share a bandwidth cap. Images are then hardlinked (copied across filesystems) into the metadata folders
+
+# Library imports :
+import concurrent.futures
+import hashlib
+import os
+import threading
+
+# Module imports :
+from TMDBClient import TMDBClient, RateLimiter
+from FilePlacer import place_file
+
+# Kinds of artwork, with the field of the TMDB movie data holding their image path :
+# poster_path, backdrop_path, and the logos of the images appended to the data (see FileManager.fetch_data())
+KINDS = ("poster", "fanart", "logo")
+
+def image_paths(movie_data : dict[str, any], kinds : tuple[str] = KINDS) -> dict[str, str]:
+    """
+    TMDB image path (/abc.jpg) of every kind of artwork a movie has, the logos in English or without text first
+    """
+    paths = {}
+    if "poster" in kinds and movie_data.get("poster_path"):
+        paths["poster"] = movie_data["poster_path"]
+    if "fanart" in kinds and movie_data.get("backdrop_path"):
+        paths["fanart"] = movie_data["backdrop_path"]
+    logos = (movie_data.get("images") or {}).get("logos") or []
+    if "logo" in kinds and logos:
+        logos = sorted(logos, key = lambda logo: (logo.get("iso_639_1") not in ("en", None), -(logo.get("vote_average") or 0)))
+        if logos[0].get("file_path"):
+            paths["logo"] = logos[0]["file_path"]
+    return paths
+
+class ArtworkCache:
+    """
+    Content addressed cache of TMDB images, filled by `workers` concurrent downloads of at most `bandwidth`
+    bytes per second all together (0 for no cap)
+    base_url : image server (the TMDB one, or a local stub server for testing), size : image size in its URLs
+    kinds : kinds of artwork installed into the folders, see KINDS
+    """
+    def __init__(self, path : str = "artwork_cache", base_url : str = "https://image.tmdb.org/t/p", size : str = "original", workers : int = 8, bandwidth : float = 0, kinds : tuple[str] = KINDS, chunk_size : int = 64 << 10, client : TMDBClient = None):
+        """
+        Create the cache folders
+        client : HTTP client to use instead of a new one on base_url (retries, timeouts, pooled connections)
+        """
+        self.path = path
+        self.client = client if client is not None else TMDBClient(base_url, rate = 0, pool_size = workers)
+        self.size = size
+        self.kinds = tuple(kinds)
+        self.chunk_size = chunk_size
+        self.bandwidth = RateLimiter(bandwidth, burst = max(bandwidth / 4, chunk_size)) if bandwidth else None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "artwork")
+        self._lock = threading.Lock()
+        self._downloads = {} # image path -> future of its object path, while it is being downloaded
+        self._stats = {"cached":0, "downloaded":0, "bytes":0, "shared":0}
+        for folder in ("objects", "paths", "tmp"):
+            os.makedirs(os.path.join(path, folder), exist_ok = True)
+
+    def _ref_path(self, image_path : str) -> str:
+        """
+        Cache entry of a TMDB image path
+        """
+        return os.path.join(self.path, "paths", self.size, os.path.basename(image_path))
+
+    def _download(self, image_path : str) -> str:
+        """
+        Download an image into the cache, returns its object path
+        """
+        extension = os.path.splitext(image_path)[1].lower()
+        temporary = os.path.join(self.path, "tmp", f"{os.getpid()}.{threading.get_ident()}{extension}")
+        digest = hashlib.sha256()
+        size = 0
+        response = self.client.get(f"{self.size}/{image_path.lstrip('/')}", stream = True)
+        try:
+            if response.status_code != 200:
+                raise OSError(f"image {image_path} : HTTP {response.status_code}")
+            with open(temporary, "wb") as image_file:
+                for chunk in response.iter_content(self.chunk_size):
+                    if self.bandwidth is not None:
+                        self.bandwidth.acquire(len(chunk))
+                    digest.update(chunk)
+                    image_file.write(chunk)
+                    size += len(chunk)
+            expected = response.headers.get("Content-Length")
+            if expected is not None and int(expected) != size and not response.headers.get("Content-Encoding"):
+                raise OSError(f"image {image_path} : got {size} of {expected} bytes")
+        except BaseException:
+            self._remove(temporary)
+            raise
+        finally:
+            response.close()
+
+        # Identical content is stored once, the first object stays :
+        hexdigest = digest.hexdigest()
+        object_path = os.path.join(self.path, "objects", hexdigest[:2], hexdigest + extension)
+        os.makedirs(os.path.dirname(object_path), exist_ok = True)
+        try:
+            os.link(temporary, object_path)
+        except FileExistsError:
+            with self._lock:
+                self._stats["shared"] += 1
+        finally:
+            self._remove(temporary)
+        ref = self._ref_path(image_path)
+        os.makedirs(os.path.dirname(ref), exist_ok = True)
+        place_file(object_path, ref, "hardlink")
+        with self._lock:
+            self._stats["downloaded"] += 1
+            self._stats["bytes"] += size
+        return object_path
+
+    @staticmethod
+    def _remove(path : str):
+        """
+        Remove a file if it exists
+        """
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def fetch(self, image_path : str) -> concurrent.futures.Future:
+        """
+        Future of the cached file of an image : already done when it is in the cache, the download in progress
+        when another caller asked for it, a new download otherwise
+        """
+        ref = self._ref_path(image_path)
+        with self._lock:
+            if image_path in self._downloads:
+                return self._downloads[image_path]
+            if os.path.exists(ref):
+                self._stats["cached"] += 1
+                future = concurrent.futures.Future()
+                future.set_result(ref)
+                return future
+            future = self._executor.submit(self._download, image_path)
+            self._downloads[image_path] = future
+        future.add_done_callback(lambda _: self._forget(image_path))
+        return future
+
+    def _forget(self, image_path : str):
+        """
+        Drop a finished download, the cache answers for it from now on
+        """
+        with self._lock:
+            self._downloads.pop(image_path, None)
+
+    def prefetch(self, movie_data : dict[str, any]) -> dict[str, concurrent.futures.Future]:
+        """
+        Start downloading the artwork of a movie, without waiting : futures by kind
+        """
+        return {kind:self.fetch(image_path) for kind, image_path in image_paths(movie_data, self.kinds).items()}
+
+    def install(self, movie_data : dict[str, any], folder : str) -> dict[str, str]:
+        """
+        Put the artwork of a movie into a folder (poster.jpg, fanart.jpg, logo.png...), waiting for its downloads
+        Returns the files written by kind, and the errors of the images that couldn't be fetched by kind
+        """
+        written = {}
+        errors = {}
+        paths = image_paths(movie_data, self.kinds)
+        for kind, future in self.prefetch(movie_data).items():
+            image_path = paths[kind]
+            try:
+                source = future.result()
+                destination = os.path.join(folder, kind + os.path.splitext(image_path)[1].lower())
+                place_file(source, destination, "hardlink")
+                written[kind] = destination
+            except Exception as error:
+                errors[kind] = f"{error}"
+        return {"written":written, "errors":errors}
+
+    def stats(self) -> dict[str, int]:
+        """
+        Images found in the cache, downloaded (and their bytes), and downloaded but already stored under another name
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        """
+        Wait for the downloads in progress and close the connections
+        """
+        self._executor.shutdown(wait = True)
+        self.client.close()
@@ -0,0 +1,253 @@
+# BatchImporter.py
+
+# Headless import of many files described by a manifest, the same pipeline as MainWindow.confirm :
+# extract ID -> fetch metadata -> generate NFO -> create_data, with network and disk stages run by separate pools
+
+# Library imports :
+import argparse
+import asyncio
+import csv
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+
+# Module imports :
+from LogCollector import open_logger
+from FileManager import FileManager, TMDB_API_KEY
+from FilePlacer import bytes_to_copy
+from IOScheduler import IOScheduler
+from MetadataCache import MetadataCache
+from TMDBClient import TMDBClient
+from TitleIndex import open_title_index
+from LibraryIndex import LibraryIndex, CONFLICT_POLICIES
+from FileHasher import FileHasher
+from ArtworkCache import ArtworkCache
+
+# Columns of a manifest row :
+MANIFEST_FIELDS = ("path", "name", "link")
+
+def read_manifest(manifest_path : str) -> list[dict[str, str]]:
+    """
+    Read the rows of a manifest : CSV with a path,name,link header, JSON list of objects, or JSON Lines
+    The link may be left empty for files to identify with the offline title index
+    """
+    with open(manifest_path, newline = "", encoding = "utf-8") as manifest_file:
+        if manifest_path.endswith(".csv"):
+            rows = list(csv.DictReader(manifest_file))
+        elif manifest_path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in manifest_file if line.strip()]
+        else:
+            rows = json.load(manifest_file)
+    items = []
+    for number, row in enumerate(rows, 1):
+        if not (row.get("path") or "").strip():
+            raise ValueError(f"Manifest row {number} has no path")
+        items.append({field:(row.get(field) or "").strip() for field in MANIFEST_FIELDS})
+    return items
+
+class BatchImporter:
+    """
+    Run the import pipeline over many items : metadata is fetched by FileManager.fetch_many (at most
+    `network_workers` requests in flight, duplicate links fetched once) and every fetched item is handed
+    to an IOScheduler of `disk_workers` threads for the NFO and the copy, at most `per_device` copies
+    running at once on any disk
+    """
+    def __init__(self, filemanager : FileManager, base_path : str, network_workers : int = 8, disk_workers : int = 8, output = sys.stdout, per_device : int = 1, min_free_bytes : int = 0):
+        """
+        Initialize the importer
+        output : stream receiving one status line per item, None for silence
+        per_device / min_free_bytes : see IOScheduler
+        """
+        self.filemanager = filemanager
+        self.base_path = base_path
+        self.network_workers = network_workers
+        self.disk_workers = disk_workers
+        self.output = output
+        self.per_device = per_device
+        self.min_free_bytes = min_free_bytes
+        self._lock = threading.Lock()
+
+    def folder_name(self, item : dict[str, str], movie_data : dict[str, any]) -> str:
+        """
+        Library folder of an item : its name from the manifest, or the movie title
+        """
+        return (item.get("name") or movie_data.get("title") or "Unknown").replace(" ", "_")
+
+    def place(self, item : dict[str, str], movie_data : dict[str, any]) -> dict[str, str]:
+        """
+        Disk stage of an item : generate the NFO and create its library folder, returns the status ("imported",
+        or "skipped" if the movie or the file is already in the library, see FileManager.create_data()), the folder name, the
+        method used to place the file and the checksum of a cross-filesystem copy
+        """
+        nfo_content = self.filemanager.generate_nfo(movie_data)
+        folder_name = self.folder_name(item, movie_data)
+        placement = self.filemanager.create_data(self.base_path, folder_name, item["path"], nfo_content, movie_data = movie_data)
+        status = "skipped" if placement["method"] in ("skipped", "duplicate") else "imported"
+        return {"status":status, "folder":placement["folder"], "placement":placement["method"], "checksum":placement["checksum"]}
+
+    def resolve_link(self, item : dict[str, str]) -> str:
+        """
+        Link of an item : the one it was given, else a TMDB link found from its release name by the offline
+        title index (see FileManager.identify), empty if there is none
+        """
+        if item["link"]:
+            return item["link"]
+        id_type, movie_id = self.filemanager.identify(item["path"])
+        return f"https://www.themoviedb.org/movie/{movie_id}" if movie_id else ""
+
+    def import_item(self, item : dict[str, str]) -> dict[str, any]:
+        """
+        Run the whole pipeline for a single item, synchronously, returns its result (see run())
+        """
+        start = time.monotonic()
+        result = {**item, "status":"failed", "folder":None, "placement":None, "checksum":None, "error":None}
+        try:
+            if not os.path.isfile(item["path"]):
+                raise FileNotFoundError("source file not found")
+            item = {**item, "link":self.resolve_link(item)}
+            id_type, movie_id = self.filemanager.extract_id(item["link"])
+            if not movie_id:
+                raise ValueError("no IMDB/TMDB ID in link" if item["link"] else "no link and no matching title")
+            result["link"] = item["link"]
+            movie_data = self.filemanager.fetch_data(id_type, movie_id)
+            if not movie_data:
+                raise LookupError("metadata could not be fetched")
+            result.update(self.place(item, movie_data))
+        except Exception as error:
+            result["error"] = f"{error}"
+        result["seconds"] = round(time.monotonic() - start, 3)
+        return result
+
+    def _report(self, result : dict[str, any], done : int, total : int):
+        """
+        Print the status line of a finished item
+        """
+        if self.output is None:
+            return
+        status = {"imported":"OK  ", "skipped":"SKIP"}.get(result["status"], "FAIL")
+        detail = result["error"] if result["error"] else f"{result['folder']} ({result['placement']})"
+        with self._lock:
+            self.output.write(f"[{done:>{len(str(total))}}/{total}] {status} {result['path']} -> {detail}\n")
+            self.output.flush()
+
+    def run(self, items : list[dict[str, str]]) -> dict[str, any]:
+        """
+        Import every item, returns the summary report : counts, timings, and per item results
+        (status "imported", "skipped" or "failed", library folder, placement method, checksum, error message, seconds spent)
+        """
+        started = datetime.datetime.now(datetime.timezone.utc)
+        start = time.monotonic()
+        results = [None] * len(items)
+        done = 0
+
+        def finish(position, result):
+            nonlocal done
+            results[position] = result
+            with self._lock:
+                done += 1
+                count = done
+            self._report(result, count, len(items))
+
+        def place(position, movie_data, fetched_at):
+            item = items[position]
+            result = {**item, "status":"failed", "folder":None, "placement":None, "checksum":None, "error":None}
+            try:
+                result.update(self.place(item, movie_data))
+            except Exception as error:
+                result.update(status = "failed", error = f"{error}")
+            result["seconds"] = round(time.monotonic() - fetched_at, 3)
+            finish(position, result)
+
+        # Items sharing a link share the fetch, missing sources fail before any request :
+        positions_by_link = {}
+        for position, item in enumerate(items):
+            if not os.path.isfile(item["path"]):
+                finish(position, {**item, "status":"failed", "folder":None, "placement":None, "checksum":None, "error":"source file not found", "seconds":0})
+            else:
+                items[position] = item = {**item, "link":self.resolve_link(item)}
+                positions_by_link.setdefault(item["link"], []).append(position)
+
+        # The same file listed twice under different names is only imported once :
+        if self.filemanager.hasher is not None:
+            first_of = {}
+            for group in self.filemanager.hasher.duplicates(items[position]["path"] for positions in positions_by_link.values() for position in positions):
+                for path in group[1:]:
+                    first_of[path] = group[0]
+            for link, positions in positions_by_link.items():
+                for position in [position for position in positions if items[position]["path"] in first_of]:
+                    positions.remove(position)
+                    finish(position, {**items[position], "status":"skipped", "folder":None, "placement":"duplicate", "checksum":None, "error":f"same file as {first_of[items[position]['path']]}", "seconds":0})
+            positions_by_link = {link:positions for link, positions in positions_by_link.items() if positions}
+
+        def refused(position, future):
+            # The scheduler didn't run the job, e.g. not enough space on the library disk :
+            if future.exception() is not None and results[position] is None:
+                finish(position, {**items[position], "status":"failed", "folder":None, "placement":None, "checksum":None, "error":f"{future.exception()}", "seconds":0})
+
+        async def fetch_all(scheduler):
+            async for link, id_type, movie_id, movie_data in self.filemanager.fetch_many(positions_by_link, self.network_workers):
+                fetched_at = time.monotonic()
+                for position in positions_by_link[link]:
+                    if movie_data and self.filemanager.conflicts == "skip" and self.filemanager.in_library(self.base_path, movie_data):
+                        # Already in the library, not worth a place in the scheduler :
+                        place(position, movie_data, fetched_at)
+                    elif movie_data:
+                        if self.filemanager.artwork is not None:
+                            # Images download while the item waits for its disk, create_data() then links them :
+                            self.filemanager.artwork.prefetch(movie_data)
+                        path = items[position]["path"]
+                        try:
+                            size = bytes_to_copy(path, os.path.join(self.base_path, os.path.basename(path)), self.filemanager.placement)
+                            future = scheduler.submit(path, self.base_path, size, place, position, movie_data, fetched_at)
+                        except OSError as error: # the file vanished or can't be read since the batch started
+                            finish(position, {**items[position], "status":"failed", "folder":None, "placement":None, "checksum":None, "error":f"{error}", "seconds":0})
+                            continue
+                        future.add_done_callback(lambda future, position = position: refused(position, future))
+                    else:
+                        error = "metadata could not be fetched" if movie_id else "no IMDB/TMDB ID in link" if link else "no link and no matching title"
+                        finish(position, {**items[position], "status":"failed", "folder":None, "placement":None, "checksum":None, "error":error, "seconds":0})
+
+        with IOScheduler(self.per_device, self.disk_workers, self.min_free_bytes) as scheduler:
+            asyncio.run(fetch_all(scheduler))
+
+        imported = sum(result["status"] == "imported" for result in results)
+        skipped = sum(result["status"] == "skipped" for result in results)
+        return {
+            "started":started.isoformat(),
+            "finished":datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "seconds":round(time.monotonic() - start, 3),
+            "counts":{"total":len(items), "imported":imported, "skipped":skipped, "failed":len(items) - imported - skipped},
+            "items":results,
+        }
+
+# Command line :
+if __name__ == "__main__":
+    with open("config.json") as config_file:
+        config = json.load(config_file)
+    parser = argparse.ArgumentParser(description = "Import the files listed in a manifest (CSV with path,name,link columns, JSON or JSON Lines) without the GUI")
+    parser.add_argument("manifest", help = "manifest file (.csv, .json or .jsonl)")
+    parser.add_argument("--base-path", default = config["paths"]["library"], help = "library folder (default: config.json paths.library)")
+    parser.add_argument("--network-workers", type = int, default = 8, help = "concurrent metadata requests")
+    parser.add_argument("--disk-workers", type = int, default = 8, help = "concurrent NFO/copy jobs")
+    parser.add_argument("--per-device", type = int, default = config["scheduler"]["per_device"], help = "concurrent copies per disk (default: config.json scheduler.per_device)")
+    parser.add_argument("--conflicts", choices = CONFLICT_POLICIES, default = config["library"]["conflicts"], help = "what to do with movies already in the library (default: config.json library.conflicts)")
+    parser.add_argument("--report", default = "import_report.json", help = "summary report path")
+    arguments = parser.parse_args()
+
+    logger = open_logger("log.txt", queued = True)
+    filemanager = FileManager(logger, TMDB_API_KEY, MetadataCache(**config["cache"]), TMDBClient(**config["network"]), config["placement"], open_title_index(config["title_index"]["path"]), config["title_index"]["min_score"], LibraryIndex(config["library"]["index"]), arguments.conflicts, FileHasher(**config["hash_parameters"]), ArtworkCache(**config["artwork"]))
+    # Catch up with changes made to the library by hand, only the folders that changed are read :
+    if os.path.isdir(arguments.base_path):
+        filemanager.library.rescan(arguments.base_path)
+    importer = BatchImporter(filemanager, arguments.base_path, arguments.network_workers, arguments.disk_workers, per_device = arguments.per_device, min_free_bytes = config["scheduler"]["min_free_bytes"])
+    report = importer.run(read_manifest(arguments.manifest))
+    with open(arguments.report, "w", encoding = "utf-8") as report_file:
+        json.dump(report, report_file, indent = 2, ensure_ascii = False)
+    counts = report["counts"]
+    print(f"{counts['imported']}/{counts['total']} imported, {counts['skipped']} already in the library, {counts['failed']} failed in {report['seconds']} s, report written to {arguments.report}")
+    filemanager.hasher.close()
+    logger.close()
+    sys.exit(1 if counts["failed"] else 0)
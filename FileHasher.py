@@ -0,0 +1,299 @@
+# FileHasher.py
+
+# Content hashes of media files, to find the same release downloaded twice under different names :
+# - files are read in chunks into one reused buffer, memory stays at chunk size per worker
+# - many files are hashed at once over a process pool, bounded by the caps of config.json "hash_parameters"
+# - hashes are kept in SQLite, keyed by (device, inode, size, modification time) : an unchanged file is never
+#   hashed twice, whatever its name, and a file that changed is hashed again
+# Non cryptographic hashes (xxh3 when the xxhash package is installed, crc32 otherwise) only find candidates,
+# same_content() confirms them byte for byte ; cryptographic ones (blake2b, sha256) are trusted as they are
+
+# Library imports :
+import argparse
+import concurrent.futures
+import filecmp
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+class Crc32:
+    """
+    zlib.crc32 behind the update() / hexdigest() interface of hashlib
+    """
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self) -> str:
+        return f"{self.value:08x}"
+
+# Hash constructors by name, and the ones a match can be trusted from :
+ALGORITHMS = {"crc32":Crc32, "blake2b":hashlib.blake2b, "sha256":hashlib.sha256}
+if xxhash is not None:
+    ALGORITHMS["xxh3"] = xxhash.xxh3_128
+CRYPTOGRAPHIC = ("blake2b", "sha256")
+DEFAULT_ALGORITHM = "xxh3" if xxhash is not None else "crc32"
+
+def hash_file(path : str, algorithm : str = DEFAULT_ALGORITHM, chunk_size : int = 1 << 20) -> tuple[str, tuple[int, int, int, int]]:
+    """
+    Hash a file, returns its hex digest and the (device, inode, size, mtime_ns) it was hashed at, or None
+    instead of them if the file changed while it was read
+    Runs in the worker processes of FileHasher.hash_many(), hence a function of the module
+    """
+    digest = ALGORITHMS[algorithm]()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering = 0) as file:
+        status = os.fstat(file.fileno())
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            read = file.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+        after = os.fstat(file.fileno())
+    if (after.st_size, after.st_mtime_ns) != (status.st_size, status.st_mtime_ns):
+        return digest.hexdigest(), None
+    return digest.hexdigest(), (status.st_dev, status.st_ino, status.st_size, status.st_mtime_ns)
+
+class FileHasher:
+    """
+    Hashes of files, cached, computed over a process pool :
+    - memory_cost_cap : KiB of read buffers at most, over all workers (chunk_size each), 0 for no cap
+    - time_cost_cap : seconds hash_many() may spend, files not hashed by then get None, 0 for no cap
+    - parallelism_cap : worker processes at most, 0 for one per CPU
+    """
+    def __init__(self, cache_path : str = "hash_cache.sqlite", algorithm : str = "auto", memory_cost_cap : int = 0, time_cost_cap : float = 0, parallelism_cap : int = 0, chunk_size : int = 1 << 20):
+        """
+        Open (or create) the cache, algorithm "auto" being xxh3 when available, crc32 otherwise
+        """
+        algorithm = DEFAULT_ALGORITHM if algorithm == "auto" else algorithm
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown hash algorithm {algorithm!r}, expected one of {', '.join(ALGORITHMS)}" + ("" if xxhash else " (xxh3 needs the xxhash package)"))
+        self.algorithm = algorithm
+        self.cryptographic = algorithm in CRYPTOGRAPHIC
+        self.chunk_size = min(chunk_size, memory_cost_cap << 10) if memory_cost_cap else chunk_size
+        self.workers = parallelism_cap or os.cpu_count() or 1
+        if memory_cost_cap:
+            self.workers = max(1, min(self.workers, (memory_cost_cap << 10) // self.chunk_size))
+        self.time_cost_cap = time_cost_cap
+        self._lock = threading.Lock()
+        self._stats = {"cached":0, "hashed":0, "bytes":0, "timed_out":0}
+        self._pool = None # process pool, started by the first hash_many() that needs it
+        self._connection = sqlite3.connect(cache_path, check_same_thread = False, isolation_level = None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS hashes (device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, algorithm TEXT, digest TEXT, PRIMARY KEY (device, inode, algorithm))")
+
+    def _cached(self, status : os.stat_result) -> str:
+        """
+        Cached digest of a file, None if it was never hashed or changed since
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT digest FROM hashes WHERE device = ? AND inode = ? AND algorithm = ? AND size = ? AND mtime_ns = ?", (status.st_dev, status.st_ino, self.algorithm, status.st_size, status.st_mtime_ns)).fetchone()
+        return row[0] if row else None
+
+    def _store(self, results : list[tuple[str, tuple[int, int, int, int]]]):
+        """
+        Cache the digests of files hashed while they didn't change
+        """
+        rows = [(*key, self.algorithm, digest) for digest, key in results if key is not None]
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO hashes (device, inode, size, mtime_ns, algorithm, digest) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._stats["hashed"] += len(results)
+            self._stats["bytes"] += sum(key[2] for _, key in results if key is not None)
+
+    def hash(self, path : str) -> str:
+        """
+        Digest of a file, from the cache or hashed in this process
+        """
+        digest = self._cached(os.stat(path))
+        if digest is not None:
+            with self._lock:
+                self._stats["cached"] += 1
+            return digest
+        result = hash_file(path, self.algorithm, self.chunk_size)
+        self._store([result])
+        return result[0]
+
+    def hash_many(self, paths) -> dict[str, str]:
+        """
+        Digests of many files, by path : cached ones are looked up, the others are hashed over the process pool
+        (in this process if there is only one of them or one worker), None for the files that vanished or
+        weren't hashed within time_cost_cap
+        """
+        digests = {}
+        missing = []
+        for path in dict.fromkeys(paths):
+            try:
+                digests[path] = self._cached(os.stat(path))
+            except OSError:
+                digests[path] = None
+                continue
+            if digests[path] is None:
+                missing.append(path)
+        with self._lock:
+            self._stats["cached"] += sum(digest is not None for digest in digests.values())
+        if len(missing) <= 1 or self.workers == 1:
+            deadline = time.monotonic() + self.time_cost_cap if self.time_cost_cap else None
+            for path in missing:
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+                try:
+                    digests[path] = self.hash(path)
+                except OSError:
+                    pass
+            self._count_timeouts(digests, missing)
+            return digests
+
+        pool = self._process_pool()
+        futures = {pool.submit(hash_file, path, self.algorithm, self.chunk_size):path for path in missing}
+        results = []
+        try:
+            for future in concurrent.futures.as_completed(futures, timeout = self.time_cost_cap or None):
+                try:
+                    result = future.result()
+                except OSError:
+                    continue
+                digests[futures[future]] = result[0]
+                results.append(result)
+        except concurrent.futures.TimeoutError:
+            pass
+        except concurrent.futures.BrokenExecutor: # a worker died (killed, out of memory...)
+            self._drop_pool(pool)
+        finally:
+            for future in futures:
+                future.cancel() # the files given up on that no worker started
+            self._store(results)
+        self._count_timeouts(digests, missing)
+        return digests
+
+    def _process_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        """
+        Pool of the worker processes, kept from one hash_many() to the next so that only the first one pays
+        for starting them (workers are started on demand, up to self.workers)
+        """
+        with self._lock:
+            if self._pool is None:
+                # Threads of the caller (logging, schedulers) must not be forked along with it ; the workers
+                # import the main module of the program again, which must do nothing outside of its __main__ block :
+                context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+                self._pool = concurrent.futures.ProcessPoolExecutor(max_workers = self.workers, mp_context = context)
+            return self._pool
+
+    def _drop_pool(self, pool : concurrent.futures.ProcessPoolExecutor):
+        """
+        Forget a broken pool, the next hash_many() starts a new one
+        """
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait = False, cancel_futures = True)
+
+    def _count_timeouts(self, digests : dict[str, str], missing : list[str]):
+        """
+        Count the files hash_many() gave up on
+        """
+        with self._lock:
+            self._stats["timed_out"] += sum(digests[path] is None and os.path.exists(path) for path in missing)
+
+    def same_content(self, path : str, other : str) -> bool:
+        """
+        Whether two files hold the same bytes : the same file, or equal digests confirmed byte for byte when the
+        algorithm isn't cryptographic
+        """
+        status, other_status = os.stat(path), os.stat(other)
+        if (status.st_dev, status.st_ino) == (other_status.st_dev, other_status.st_ino):
+            return True
+        if status.st_size != other_status.st_size:
+            return False
+        digests = self.hash_many([path, other])
+        if digests[path] is None or digests[path] != digests[other]:
+            return False
+        return self.cryptographic or filecmp.cmp(path, other, shallow = False)
+
+    def duplicates(self, paths) -> list[list[str]]:
+        """
+        Groups of files holding the same bytes, in the order of `paths` : only files sharing their size with
+        another one are hashed, all of them in one hash_many() call
+        """
+        by_size = {}
+        for path in dict.fromkeys(paths):
+            try:
+                by_size.setdefault(os.path.getsize(path), []).append(path)
+            except OSError:
+                pass
+        candidates = [path for group in by_size.values() if len(group) > 1 for path in group]
+        digests = self.hash_many(candidates)
+        groups = {}
+        for path in candidates:
+            if digests[path] is not None:
+                groups.setdefault((os.path.getsize(path), digests[path]), []).append(path)
+        duplicates = []
+        for group in groups.values():
+            # Groups of a non cryptographic digest are split by actual content :
+            while len(group) > 1:
+                same = [group[0]] + [path for path in group[1:] if self.cryptographic or filecmp.cmp(group[0], path, shallow = False)]
+                if len(same) > 1:
+                    duplicates.append(same)
+                group = [path for path in group if path not in same]
+        return duplicates
+
+    def stats(self) -> dict[str, int]:
+        """
+        Files found in the cache, files hashed and their bytes, files given up on because of time_cost_cap
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        """
+        Stop the worker processes and close the cache
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait = True, cancel_futures = True)
+        with self._lock:
+            self._connection.close()
+
+# Command line :
+if __name__ == "__main__":
+    with open("config.json") as config_file:
+        config = json.load(config_file)
+    parser = argparse.ArgumentParser(description = "Hash media files, or find the duplicates among them")
+    parser.add_argument("command", choices = ("hash", "duplicates"))
+    parser.add_argument("paths", nargs = "+", help = "files, or directories to walk")
+    parser.add_argument("--algorithm", default = config["hash_parameters"]["algorithm"], choices = ["auto", *sorted(ALGORITHMS)], help = "default: config.json hash_parameters.algorithm")
+    arguments = parser.parse_args()
+
+    paths = []
+    for path in arguments.paths:
+        if os.path.isdir(path):
+            paths.extend(os.path.join(directory, name) for directory, _, names in os.walk(path) for name in sorted(names))
+        else:
+            paths.append(path)
+    hasher = FileHasher(**{**config["hash_parameters"], "algorithm":arguments.algorithm})
+    start = time.monotonic()
+    if arguments.command == "hash":
+        for path, digest in hasher.hash_many(paths).items():
+            print(f"{digest or '-'}  {path}")
+    else:
+        for group in hasher.duplicates(paths):
+            print(json.dumps(group, ensure_ascii = False))
+    stats = hasher.stats()
+    print(f"{stats['hashed']} files hashed ({stats['bytes'] >> 20} MiB), {stats['cached']} cached, {stats['timed_out']} timed out in {time.monotonic() - start:.2f} s", file = sys.stderr)
+    hasher.close()
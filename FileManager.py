@@ -1,10 +1,19 @@
+import asyncio
+import concurrent.futures
+import json
 import os
-import shutil
-import re
 import requests
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
-from LogWriter import LogWriter
+import threading
+from LogCollector import open_logger
+from MetadataCache import MetadataCache
+from TMDBClient import TMDBClient
+from FilePlacer import place_file, ResumableCopy
+from NfoWriter import render_nfo
+from TitleIndex import TitleIndex, open_title_index
+from LinkParser import parse_link, extract_ids
+from LibraryIndex import LibraryIndex, CONFLICT_POLICIES, media_kind
+from FileHasher import FileHasher
+from ArtworkCache import ArtworkCache
 
 # Todo
 # move api key from argument to keyring/json file
@@ -26,19 +35,41 @@ class Error(Exception):
         Print the formatted error message
         """
         # Write to log file :
-        self.logger.write("ERROR", {"message":f"{self.message}", "raised by":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}})
+        self.logger.write("ERROR", {"message":f"{self.message}"})
 
 class FileManager:
 
-    def __init__(self, logger, api_key : str):
+    def __init__(self, logger, api_key : str, cache : MetadataCache = None, client : TMDBClient = None, placement : str = "auto", title_index : TitleIndex = None, min_title_score : float = 0.7, library : LibraryIndex = None, conflicts : str = "skip", hasher : FileHasher = None, artwork : ArtworkCache = None):
         """
         Initialize class parameters
+        cache : metadata cache used by fetch_data(), None to always query TMDB
+        client : HTTP client of the TMDB API (pooled connections, timeouts, retries, rate limit), a default one if None
+        placement : how create_data() puts media files into the library, see FilePlacer.STRATEGIES
+        title_index / min_title_score : offline index used by identify(), None to only identify files from links
+        library : index of the library updated by create_data(), None to fill folders without looking at their content
+        conflicts : what create_data() does with a movie already in the library, see LibraryIndex.CONFLICT_POLICIES
+        hasher : content hashes used by create_data() to skip files already in the library under any name (needs
+        the library index), None to not look at contents
+        artwork : cache of the images create_data() puts into the metadata folders, None to leave them empty
         """
+        if conflicts not in CONFLICT_POLICIES:
+            raise ValueError(f"Unknown conflict policy {conflicts!r}, expected one of {', '.join(CONFLICT_POLICIES)}")
         self.logger = logger
         self._TMDB_API_KEY = api_key
+        self.cache = cache
+        self.client = client if client is not None else TMDBClient()
+        self.placement = placement
+        self.title_index = title_index
+        self.min_title_score = min_title_score
+        self.library = library
+        self.conflicts = conflicts
+        self.hasher = hasher
+        self.artwork = artwork
+        self._claims_lock = threading.Lock()
+        self._claims = set() # folders being filled and movies being imported, by create_data() calls in progress
 
         # Write to log file :
-        self.logger.write("ACTION", {"action":"Initialized FileManager instance", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
+        self.logger.write("ACTION", {"action":"Initialized FileManager instance", "output":"0"})
         
     @property
     def api_key(self) -> str:
@@ -46,7 +77,7 @@ class FileManager:
         Get the API key
         """
         # Write to log file :
-        self.logger.write("ACTION", {"action":"Fetched API key", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
+        self.logger.write("ACTION", {"action":"Fetched API key", "output":"0"})
         return self._TMDB_API_KEY
 
     @api_key.setter
@@ -58,141 +89,316 @@ class FileManager:
             assert key
             self._TMDB_API_KEY = key
             # Write to log file :
-            self.logger.write("ACTION", {"action":"Updated API key", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
+            self.logger.write("ACTION", {"action":"Updated API key", "output":"0"})
         except:
             raise Error("Provided API key is blank")
             sys.exit(1)
 
     def extract_id(self, link : str) -> tuple[str, str]:
         """
-        Extract IMDB or TMDB IDs from provided link
+        Extract IMDB or TMDB IDs from provided link, see LinkParser.parse_link()
         """
+        id_type, movie_id = parse_link(link)
         # Write to log file :
-        self.logger.write("ACTION", {"action":f"Started ID exctraction from link {link}", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
-        
-        # IMDB :
-        imdb_match = re.search(r"imdb\.com/title/(tt\d+)", link)
-        # Write to log file :
-        self.logger.write("ACTION", {"action":"Performed IMDB search", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":f"{imdb_match is None}"})
-        
-        # TMDB :
-        tmdb_match = re.search(r"themoviedb\.org/movie/(\d+)", link)
+        self.logger.write("ACTION", {"action":f"Extracted ID from link {link}", "output":f"{id_type} {movie_id}" if movie_id else "1"})
+        return id_type, movie_id
+
+    def extract_ids(self, links):
+        """
+        Extract the IDs of many links (a list, pasted text lines, a file...) lazily, yielding (link, id type, ID)
+        tuples, see LinkParser.extract_ids()
+        """
+        found = missing = 0
+        for link, id_type, movie_id in extract_ids(links):
+            if movie_id:
+                found += 1
+            else:
+                missing += 1
+            yield link, id_type, movie_id
         # Write to log file :
-        self.logger.write("ACTION", {"action":"Performed TMDB search", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":f"{tmdb_match is None}"})
-        
-        if imdb_match:
-            return "imdb", imdb_match.group(1)
-        elif tmdb_match:
-            return "tmdb", tmdb_match.group(1)
-        else:
+        self.logger.write("ACTION", {"action":f"Extracted IDs from {found + missing} links, {missing} without ID", "output":"0" if not missing else "1"})
+
+    def identify(self, file_path : str) -> tuple[str, str]:
+        """
+        Identify a file without a link, from the release name of the file or of its folder, using the offline title index
+        """
+        if self.title_index is None:
             return None, None
+        for name in (os.path.basename(file_path), os.path.basename(os.path.dirname(os.path.abspath(file_path)))):
+            match = self.title_index.identify(name, self.min_title_score)
+            if match:
+                # Write to log file :
+                self.logger.write("ACTION", {"action":f"Identified {name} as {match['title']} ({match['year']})", "output":f"{match['score']}"})
+                return "tmdb", str(match["id"])
+        # Write to log file :
+        self.logger.write("ACTION", {"action":f"Found no title matching {file_path}", "output":"1"})
+        return None, None
+
+    def _request(self, path : str, params : dict[str, str] = None) -> dict[str, any]:
+        """
+        Send a GET request to the TMDB API and return the decoded JSON response, empty if the request failed
+        """
+        try:
+            return self.client.get_json(path, {"api_key": self._TMDB_API_KEY, **(params or {})})
+        except (requests.RequestException, ValueError) as error: # network failure or non-JSON answer
+            # The error message holds the URL, API key included, only log its type :
+            Error(f"TMDB request {path} failed ({type(error).__name__})", self.logger).log()
+            return {}
 
-    def fetch_data(self, id_type : str, movie_id : int) -> dict[str, any]:
+    def fetch_data(self, id_type : str, movie_id : int, refresh : bool = False) -> dict[str, any]:
         """
-        Fetch movie data from IMDB/TMDB using ID
+        Fetch movie data from IMDB/TMDB using ID (id_type "imdb", "tmdb" or "tmdb_tv" for TV shows)
+        IMDB IDs are first resolved to TMDB IDs, both steps go through the cache (if any) unless `refresh` is set
         """
         # Write to log file :
-        self.logger.write("ACTION", {"action":f"Started fetching data of id {movie_id} using {id_type}", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
-        
-        # Select correct id method :
-        if id_type == "imdb":
-            url = f"https://api.themoviedb.org/3/find/{movie_id}"
-            params = {
-                "api_key": self._TMDB_API_KEY,
-                "external_source": "imdb_id"
-            }
-        else:
-            url = f"https://api.themoviedb.org/3/movie/{movie_id}"
-            params = {
-                "api_key": self._TMDB_API_KEY
-            }
-
-        # Fetch the data using requests :
-        response = requests.get(url, params = params)
-        #response.raise_for_status()  # raise an error for bad responses
-        data = response.json()
-        
-        # Parse and structure the data :
+        self.logger.write("ACTION", {"action":f"Started fetching data of id {movie_id} using {id_type}", "output":"0"})
+
+        # Resolve IMDB IDs into TMDB IDs :
         if id_type == "imdb":
-            movie_data = data.get("movie_results", [])[0] if data.get("movie_results") else None
-        else:
-            movie_data = data
+            found = self.cache.get_find(movie_id) if self.cache and not refresh else None
+            if found is None:
+                data = self._request(f"find/{movie_id}", {"external_source": "imdb_id"})
+                found = data.get("movie_results", [])[0] if data.get("movie_results") else None
+                if found is None:
+                    # Write to log file :
+                    self.logger.write("WARNING", {"message":f"No TMDB movie found for IMDB id {movie_id}"})
+                    return None
+                if self.cache:
+                    self.cache.put_find(movie_id, found)
+            id_type, movie_id = "tmdb", found["id"]
+
+        # Fetch the data (from the cache if possible) :
+        movie_data = self.cache.get(id_type, movie_id) if self.cache and not refresh else None
+        if movie_data is None:
+            # The logos are only listed in the images of a movie, fetched along with it when they are used :
+            params = {"append_to_response":"images", "include_image_language":"en,null"} if self.artwork is not None and "logo" in self.artwork.kinds else None
+            data = self._request(f"tv/{movie_id}" if id_type == "tmdb_tv" else f"movie/{movie_id}", params)
+            # Error responses ({"success": false, ...}) have no ID :
+            movie_data = data if data.get("id") else None
+            # TV shows have a name and a first air date, give them the fields the NFO is written from :
+            if movie_data and id_type == "tmdb_tv":
+                movie_data.setdefault("title", movie_data.get("name", "Unknown Title"))
+                movie_data.setdefault("release_date", movie_data.get("first_air_date") or "Unknown Year")
+                movie_data["media_type"] = "tv"
+            if movie_data and self.cache:
+                self.cache.put(id_type, movie_id, movie_data)
 
         # Write to log file :
-        self.logger.write("ACTION", {"action":"Fetched and parsed data", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":f"{movie_data}"})
+        self.logger.write("ACTION", {"action":"Fetched and parsed data", "output":lambda: f"{movie_data}"})
         
         return movie_data
 
+    async def fetch_many(self, links, concurrency : int = 8, refresh : bool = False):
+        """
+        Resolve many links concurrently, yielding (link, id type, ID, movie data) tuples as soon as each one
+        completes (ID and data are None for links without an ID, data is None if it couldn't be fetched)
+        At most `concurrency` fetches run at once, all sharing the client's rate limiter, and links pointing
+        to the same ID are fetched once
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        # fetch_data blocks on the network, it runs in worker threads (the default executor may have fewer) :
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers = concurrency, thread_name_prefix = "fetch_many")
+        loop = asyncio.get_running_loop()
+        links_by_id = {}
+        tasks = []
+
+        async def fetch(id_type, movie_id):
+            async with semaphore:
+                return id_type, movie_id, await loop.run_in_executor(executor, self.fetch_data, id_type, movie_id, refresh)
+
+        for link, id_type, movie_id in self.extract_ids(links):
+            if not movie_id:
+                yield link, None, None, None
+                continue
+            if (id_type, movie_id) not in links_by_id:
+                links_by_id[(id_type, movie_id)] = []
+                tasks.append(asyncio.ensure_future(fetch(id_type, movie_id)))
+            links_by_id[(id_type, movie_id)].append(link)
+        try:
+            for task in asyncio.as_completed(tasks):
+                id_type, movie_id, movie_data = await task
+                for link in links_by_id[(id_type, movie_id)]:
+                    yield link, id_type, movie_id, movie_data
+        finally:
+            # The consumer stopped early, don't leave fetches running :
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait = False, cancel_futures = True)
+
     def generate_nfo(self, movie_data : dict[str, any]) -> str:
         """
         Generate the .nfo content in XML format with proper indentation (4 spaces).
         """
-        # Define the entries
-        title = movie_data.get("title", "Unknown Title")
-        year = movie_data.get("release_date", "Unknown Year").split("-")[0]
-        plot = movie_data.get("overview", "")
-        imdb_link = f"https://www.imdb.com/title/{movie_data.get('imdb_id')}" if movie_data.get("imdb_id") else ""
-        tmdb_link = f"https://www.themoviedb.org/movie/{movie_data.get('id')}"
-        
-        # Create the root element
-        movie = ET.Element("movie")
-        
-        # Add child elements
-        ET.SubElement(movie, "title").text = title
-        ET.SubElement(movie, "year").text = year
-        ET.SubElement(movie, "plot").text = plot
-        ET.SubElement(movie, "imdb").text = imdb_link
-        ET.SubElement(movie, "tmdb").text = tmdb_link
-        ET.SubElement(movie, "genres").text = ", ".join([genre["name"] for genre in movie_data.get("genres", [])])
-        ET.SubElement(movie, "rating").text = str(movie_data.get("vote_average", "N/A"))
-
-        # Convert the tree to a string (no indentation)
-        raw_xml = ET.tostring(movie, encoding="UTF-8", method="xml").decode("UTF-8")
-        
-        # Use minidom to pretty print with desired indentation
-        parsed_xml = minidom.parseString(raw_xml)
-        pretty_xml = parsed_xml.toprettyxml(indent="    ")  # 4 spaces for indentation
+        nfo_content = render_nfo(movie_data)
 
         # Write to log file :
-        self.logger.write("ACTION", {"action":"Defined and parsed XML content", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":pretty_xml})
+        self.logger.write("ACTION", {"action":"Defined and parsed XML content", "output":nfo_content})
+        return nfo_content
+
+    def in_library(self, base_path : str, movie_data : dict[str, any]) -> list[dict[str, any]]:
+        """
+        Library folders already holding a movie (see LibraryIndex.find_movie()), an empty list without library index
+        """
+        if self.library is None:
+            return []
+        base_path = os.path.abspath(base_path)
+        return [entry for entry in self.library.find_movie(movie_data) if os.path.dirname(entry["folder"]) == base_path]
 
-        # Remove the extra newline after the declaration
-        return "\n".join(pretty_xml.splitlines()[1:])
+    def find_duplicate(self, base_path : str, file_path : str) -> dict[str, any]:
+        """
+        Library entry whose media file holds the same bytes as a file, None if there is none (or no hasher)
+        Only the library files of the same size are hashed, most files have none and cost a single lookup
+        """
+        if self.library is None or self.hasher is None:
+            return None
+        base_path = os.path.abspath(base_path)
+        candidates = {}
+        for entry in self.library.find_size(os.path.getsize(file_path)):
+            if os.path.dirname(entry["folder"]) == base_path and entry["file"]:
+                candidates[os.path.join(entry["folder"], entry["file"])] = entry
+        candidates = {path:entry for path, entry in candidates.items() if os.path.isfile(path)}
+        if not candidates:
+            return None
+        digests = self.hasher.hash_many([file_path, *candidates])
+        for path, entry in candidates.items():
+            if digests[file_path] is not None and digests[path] == digests[file_path] and self.hasher.same_content(file_path, path):
+                # Write to log file :
+                self.logger.write("ACTION", {"action":f"Found {file_path} in the library as {path}", "output":f"{digests[path]}"})
+                return entry
+        return None
 
+    def _claim(self, base_path : str, folder_name : str, movie_data : dict[str, any]) -> tuple[str, dict[str, any], list]:
+        """
+        Apply the conflict policy : returns the folder the movie goes to (None when it is skipped), the entry it
+        replaces if any, and the claims to release once it is placed
+        A folder holding another movie is never filled, the movie goes to a folder of its own, and two imports
+        running at once never pick the same folder nor both import a movie that is skipped when already there
+        """
+        movie_key = (media_kind(movie_data), str(movie_data.get("id")))
+        with self._claims_lock:
+            existing = self.in_library(base_path, movie_data)
+            replaced = None
+            if existing or movie_key in self._claims:
+                if self.conflicts == "skip":
+                    return None, existing[0] if existing else None, []
+                if self.conflicts == "replace" and existing:
+                    replaced = existing[0]
+                    folder_name = os.path.basename(replaced["folder"])
+                elif self.conflicts == "version":
+                    folder_name = self._free_folder(base_path, folder_name)
+            folder = os.path.abspath(os.path.join(base_path, folder_name))
+            taken = self.library.entry(folder)
+            if folder in self._claims or (taken is not None and (replaced is None or taken["folder"] != replaced["folder"])):
+                folder_name = self._free_folder(base_path, folder_name)
+                folder = os.path.abspath(os.path.join(base_path, folder_name))
+            claims = [folder, movie_key]
+            self._claims.update(claims)
+        return folder_name, replaced, claims
+
+    def _free_folder(self, base_path : str, folder_name : str) -> str:
+        """
+        LibraryIndex.free_folder(), also avoiding the folders being filled
+        """
+        while True:
+            folder_name = self.library.free_folder(base_path, folder_name)
+            if os.path.abspath(os.path.join(base_path, folder_name)) not in self._claims:
+                return folder_name
 
-    def create_data(self, base_path : str, folder_name : str, torrent_file_path : str, nfo_content : str):
+    def create_data(self, base_path : str, folder_name : str, torrent_file_path : str, nfo_content : str, progress = None, movie_data : dict[str, any] = None) -> dict[str, str]:
         """
         Create the folder structure and write the .nfo file
+        Returns how the media file was placed : {"method":..., "checksum":..., "folder":...} (see FilePlacer.place_file),
+        method "skipped" when the movie is already in the library and the conflict policy is "skip", "duplicate"
+        when the file itself already is (see find_duplicate()), whatever the policy
+        progress : called with (bytes copied, total bytes, bytes per second) while the file is copied, it may raise (anything
+        but OSError) to stop the import, the partial copy and the folders it created are then removed
+        movie_data : data of the movie, to look it up in the library index and record it there (ignored without index),
+        the folder may then differ from `folder_name` (see the conflict policy in __init__())
         """
-        # Extract the folder names from provided paths :
-        movie_folder = os.path.join(base_path, folder_name)
-        metadata_folder = os.path.join(movie_folder, "metadata")
+        # The same file under another name is never imported twice :
+        duplicate = self.find_duplicate(base_path, torrent_file_path)
+        if duplicate is not None:
+            return {"method":"duplicate", "checksum":None, "folder":os.path.basename(duplicate["folder"])}
+        claims = []
+        replaced = None
+        if self.library is not None and movie_data is not None:
+            folder_name, replaced, claims = self._claim(base_path, folder_name, movie_data)
+            if folder_name is None:
+                folder = os.path.basename(replaced["folder"]) if replaced else None
+                # Write to log file :
+                self.logger.write("ACTION", {"action":f"Skipped {torrent_file_path}, {movie_data.get('title')} is already in the library{f' at {folder}' if folder else ''}", "output":"0"})
+                return {"method":"skipped", "checksum":None, "folder":folder}
+        try:
+            # Extract the folder names from provided paths :
+            movie_folder = os.path.join(base_path, folder_name)
+            metadata_folder = os.path.join(movie_folder, "metadata")
 
-        # Create the folders :
+            # Create the folders :
 
-        os.makedirs(movie_folder, exist_ok = True)
-        # Write to log file :
-        self.logger.write("ACTION", {"action":f"Created movie folder at {movie_folder}", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
-        
-        os.makedirs(metadata_folder, exist_ok = True)
-        # Write to log file :
-        self.logger.write("ACTION", {"action":f"Created metadata folder at {metadata_folder}", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
+            os.makedirs(movie_folder, exist_ok = True)
+            # Write to log file :
+            self.logger.write("ACTION", {"action":f"Created movie folder at {movie_folder}", "output":"0"})
 
-        # Copy the torrent file to the movie folder :
-        torrent_filename = os.path.basename(torrent_file_path)
-        movie_file_path = os.path.join(movie_folder, torrent_filename)
-        shutil.copy(torrent_file_path, movie_file_path)
+            os.makedirs(metadata_folder, exist_ok = True)
+            # Write to log file :
+            self.logger.write("ACTION", {"action":f"Created metadata folder at {metadata_folder}", "output":"0"})
 
-        # Write to log file :
-        self.logger.write("ACTION", {"action":f"Copied file {torrent_filename} into {movie_file_path}", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
+            # Place the torrent file in the movie folder, without copying its data when the filesystems allow it :
+            torrent_filename = os.path.basename(torrent_file_path)
+            movie_file_path = os.path.join(movie_folder, torrent_filename)
+            try:
+                placement = place_file(torrent_file_path, movie_file_path, self.placement, progress)
+            except OSError:
+                raise # an interrupted copy across filesystems is resumed by the next attempt
+            except BaseException:
+                # Stopped by the progress callback (a cancelled import) : nothing of it is left behind
+                ResumableCopy(torrent_file_path, movie_file_path).discard()
+                for folder in (metadata_folder, movie_folder):
+                    try:
+                        os.rmdir(folder)
+                    except OSError: # not empty, it was there before
+                        pass
+                # Write to log file :
+                self.logger.write("ACTION", {"action":f"Stopped placing {torrent_filename} into {movie_file_path}", "output":"1"})
+                raise
 
-        # Write the .nfo file :
-        nfo_path = os.path.join(movie_folder, f"{folder_name}.nfo")
-        with open(nfo_path, "w", encoding="utf-8") as nfo_file:
-            nfo_file.write(nfo_content)
+            # Write to log file :
+            checksum = f", checksum {placement['checksum']}" if placement["checksum"] else ""
+            self.logger.write("ACTION", {"action":f"Placed file {torrent_filename} into {movie_file_path} ({placement['method']}{checksum})", "output":"0"})
 
-        # Write to log file :
-        self.logger.write("ACTION", {"action":f"Wrote content to {nfo_path} file", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
+            # The replaced file goes away, unless the new one took its name :
+            if replaced and replaced["file"] and replaced["file"] != torrent_filename:
+                try:
+                    os.remove(os.path.join(movie_folder, replaced["file"]))
+                    # Write to log file :
+                    self.logger.write("ACTION", {"action":f"Removed replaced file {replaced['file']} from {movie_folder}", "output":"0"})
+                except FileNotFoundError:
+                    pass
+
+            # Write the .nfo file :
+            nfo_path = os.path.join(movie_folder, f"{folder_name}.nfo")
+            with open(nfo_path, "w", encoding="utf-8") as nfo_file:
+                nfo_file.write(nfo_content)
+
+            # Write to log file :
+            self.logger.write("ACTION", {"action":f"Wrote content to {nfo_path} file", "output":"0"})
+
+            # Put the artwork into the metadata folder, the movie is imported even without it :
+            if self.artwork is not None and movie_data is not None:
+                artwork = self.artwork.install(movie_data, metadata_folder)
+                # Write to log file :
+                self.logger.write("ACTION", {"action":f"Installed artwork {', '.join(map(os.path.basename, artwork['written'].values())) or '(none)'} into {metadata_folder}", "output":"0"})
+                for kind, error in artwork["errors"].items():
+                    # Write to log file :
+                    self.logger.write("WARNING", {"message":f"No {kind} for {folder_name} : {error}"})
+
+            # Record the folder in the library index :
+            if self.library is not None and movie_data is not None:
+                self.library.add(movie_folder, movie_data, movie_file_path, placement["checksum"])
+        finally:
+            with self._claims_lock:
+                self._claims.difference_update(claims)
+        return {**placement, "folder":folder_name}
 
 if __name__ == "__main__":
 
@@ -201,8 +407,10 @@ if __name__ == "__main__":
     torrent_file_path = "/home/thomas/Documents/test.torrent"  # replace with the actual path to torrent file
     movie_link = input("Enter the IMDb or TMDb link for the movie: ")
 
-    logger = LogWriter("log.txt")
-    filemanager = FileManager(logger, TMDB_API_KEY)
+    logger = open_logger("log.txt")
+    with open("config.json") as config_file:
+        config = json.load(config_file)
+    filemanager = FileManager(logger, TMDB_API_KEY, MetadataCache(**config["cache"]), TMDBClient(**config["network"]), config["placement"], open_title_index(config["title_index"]["path"]), config["title_index"]["min_score"], LibraryIndex(config["library"]["index"]), config["library"]["conflicts"], FileHasher(**config["hash_parameters"]), ArtworkCache(**config["artwork"]))
 
     # Extract ID and fetch movie data :
     id_type, movie_id = filemanager.extract_id(movie_link)
@@ -214,6 +422,7 @@ if __name__ == "__main__":
             # Generate NFO content and create folder structure :
             nfo_content = filemanager.generate_nfo(movie_data)
             folder_name = movie_data.get("title", "Unknown Movie").replace(" ", "_")
-            filemanager.create_data(base_path, folder_name, torrent_file_path, nfo_content)
+            filemanager.create_data(base_path, folder_name, torrent_file_path, nfo_content, movie_data = movie_data)
         else:
             print("Error: Could not fetch movie data from TMDb.")
+    filemanager.hasher.close()
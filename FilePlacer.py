@@ -0,0 +1,324 @@
+# FilePlacer.py
+
+# Placement of media files into the library without pushing their data through userspace when it can be avoided
+
+# Library imports :
+import errno
+import hashlib
+import json
+import os
+import shutil
+import time
+
+try:
+    import fcntl
+except ImportError: # not on POSIX, reflinks are never attempted
+    fcntl = None
+
+# ioctl cloning a whole file on copy-on-write filesystems (Btrfs, XFS, bcachefs...), from linux/fs.h :
+FICLONE = 0x40049409
+
+# Strategies, cheapest first, each falling back to the next ones when it isn't valid for the source and destination :
+# - "hardlink" : new name for the same inode, instant and no extra space, but both names share the data
+# - "reflink" : new inode sharing the extents of the source until either is modified, instant on CoW filesystems
+# - "move" : rename when on the same filesystem, the source disappears (copy then delete across filesystems)
+# - "copy" : full in-kernel copy (copy_file_range, then sendfile, then a plain read/write loop) on the same
+#   filesystem, resumable and checksummed chunked copy (ResumableCopy) across filesystems
+# "auto" tries hardlink, then reflink, then copy
+STRATEGIES = ("auto", "hardlink", "reflink", "move", "copy")
+FALLBACKS = {
+    "auto":("hardlink", "reflink", "copy"),
+    "hardlink":("hardlink", "reflink", "copy"),
+    "reflink":("reflink", "copy"),
+    "move":("move",),
+    "copy":("copy",),
+}
+
+# Bytes copied between two progress reports of a copy on the same filesystem :
+COPY_STEP = 64 << 20
+
+# Errors meaning "this strategy can't place this file here", as opposed to a real failure (missing file, full disk...) :
+UNSUPPORTED = frozenset((errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EBADF))
+
+def _temporary_path(destination : str) -> str:
+    """
+    Name next to the destination under which a file is built before being renamed over it
+    """
+    directory, name = os.path.split(destination)
+    return os.path.join(directory, f".{name}.{os.getpid()}.part")
+
+def _hardlink(source : str, temporary : str):
+    """
+    Give the source inode a second name
+    """
+    os.link(source, temporary)
+
+def _reflink(source : str, temporary : str):
+    """
+    Clone the extents of the source into a new file
+    """
+    if fcntl is None:
+        raise OSError(errno.ENOTSUP, "reflinks are not supported on this platform")
+    with open(source, 'rb') as source_file, open(temporary, 'wb') as destination_file:
+        fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    shutil.copymode(source, temporary)
+
+def _copy(source : str, temporary : str, progress = None) -> str:
+    """
+    Copy the content of the source inside the kernel, returns the system call that did it
+    progress : called with (bytes copied, total bytes, bytes per second) every COPY_STEP bytes, the copy is then
+    split into system calls of that size so that the callback runs (and may raise to stop the copy)
+    """
+    with open(source, 'rb') as source_file, open(temporary, 'wb') as destination_file:
+        source_fd, destination_fd = source_file.fileno(), destination_file.fileno()
+        size = os.fstat(source_fd).st_size
+        step = COPY_STEP if progress is not None else size
+        start = time.monotonic()
+        method = None
+        # copy_file_range may itself reflink or copy server-side (NFS, SMB), sendfile is the older splice path :
+        for name in ("copy_file_range", "sendfile"):
+            call = getattr(os, name, None)
+            if call is None:
+                continue
+            try:
+                offset = 0
+                while offset < size:
+                    if name == "copy_file_range":
+                        copied = call(source_fd, destination_fd, min(step, size - offset), offset, offset)
+                    else:
+                        os.lseek(destination_fd, offset, os.SEEK_SET)
+                        copied = call(destination_fd, source_fd, offset, min(step, size - offset))
+                    if copied == 0:
+                        break
+                    offset += copied
+                    if progress is not None:
+                        progress(offset, size, offset / max(time.monotonic() - start, 1e-9))
+                method = name
+                break
+            except OSError as error:
+                # Only give up on a system call before it copied anything :
+                if error.errno not in UNSUPPORTED or offset:
+                    raise
+        if method is None:
+            os.lseek(destination_fd, 0, os.SEEK_SET)
+            offset = 0
+            while chunk := source_file.read(min(step, 1 << 20)):
+                destination_file.write(chunk)
+                offset += len(chunk)
+                if progress is not None and (offset % COPY_STEP < len(chunk) or offset == size):
+                    progress(offset, size, offset / max(time.monotonic() - start, 1e-9))
+            method = "read/write"
+    shutil.copymode(source, temporary)
+    return method
+
+def _remove(path : str):
+    """
+    Delete a file if it exists
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class ResumableCopy:
+    """
+    Chunked copy that survives being interrupted : the data goes to a temporary file next to the destination
+    (.<name>.part) and, every `checkpoint_bytes`, the temporary file is synced and a checkpoint
+    (.<name>.part.json) records the source it comes from and the SHA-256 of every chunk copied so far
+    A later run with the same source checks the checkpointed chunks against their hashes (reading the partial
+    copy, not the source) and resumes after the last one verified, and the destination is only renamed into
+    place when the copy is complete
+    The checksum of the file (SHA-256 of the chunk hashes, see chunked_checksum()) is computed from the
+    data as it is copied, so it needs no second read
+    """
+    def __init__(self, source : str, destination : str, chunk_size : int = 8 << 20, checkpoint_bytes : int = 256 << 20, progress = None):
+        """
+        Prepare the copy
+        progress : called after every chunk with (bytes copied, total bytes, bytes per second), None for silence
+        """
+        self.source = source
+        self.destination = destination
+        self.chunk_size = chunk_size
+        self.checkpoint_bytes = checkpoint_bytes
+        self.progress = progress
+        directory, name = os.path.split(destination)
+        self.temporary = os.path.join(directory, f".{name}.part")
+        self.checkpoint = f"{self.temporary}.json"
+
+    def _identity(self, status : os.stat_result) -> dict[str, any]:
+        """
+        What a checkpoint must match to be resumed : same source file, same size and modification time, same chunks
+        """
+        return {"source":os.path.abspath(self.source), "size":status.st_size, "mtime_ns":status.st_mtime_ns, "chunk_size":self.chunk_size}
+
+    def _resume(self, identity : dict[str, any]) -> list[str]:
+        """
+        Hashes of the chunks already in the temporary file that can be kept, empty to start over
+        """
+        try:
+            with open(self.checkpoint, encoding = "utf-8") as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+            hashes = checkpoint["chunks"]
+            if checkpoint["identity"] != identity:
+                return []
+            # Keep the chunks that still match their hash, up to the first one that doesn't (torn or corrupted write) :
+            with open(self.temporary, 'rb') as temporary_file:
+                for verified, chunk_hash in enumerate(hashes):
+                    if hashlib.sha256(temporary_file.read(self.chunk_size)).hexdigest() != chunk_hash:
+                        return hashes[:verified]
+            return hashes
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+
+    def _save_checkpoint(self, identity : dict[str, any], hashes : list[str]):
+        """
+        Atomically replace the checkpoint
+        """
+        with open(f"{self.checkpoint}.tmp", 'w', encoding = "utf-8") as checkpoint_file:
+            json.dump({"identity":identity, "chunks":hashes}, checkpoint_file)
+        os.replace(f"{self.checkpoint}.tmp", self.checkpoint)
+
+    def discard(self):
+        """
+        Delete the temporary file and the checkpoint of an abandoned copy
+        """
+        for path in (self.temporary, self.checkpoint, f"{self.checkpoint}.tmp"):
+            _remove(path)
+
+    def run(self) -> str:
+        """
+        Copy (or finish copying) the source to the destination, returns the checksum of the data
+        Raises OSError if the source changed while it was copied (the partial copy is discarded)
+        """
+        status = os.stat(self.source)
+        identity = self._identity(status)
+        size = status.st_size
+        hashes = self._resume(identity)
+        copied = len(hashes) * self.chunk_size
+        with open(self.source, 'rb') as source_file, open(self.temporary, 'r+b' if hashes else 'wb') as temporary_file:
+            source_file.seek(copied)
+            temporary_file.truncate(copied)
+            temporary_file.seek(copied)
+            start, resumed_at, unsaved = time.monotonic(), copied, 0
+            while chunk := source_file.read(self.chunk_size):
+                temporary_file.write(chunk)
+                hashes.append(hashlib.sha256(chunk).hexdigest())
+                copied += len(chunk)
+                unsaved += len(chunk)
+                if unsaved >= self.checkpoint_bytes and len(chunk) == self.chunk_size:
+                    temporary_file.flush()
+                    os.fsync(temporary_file.fileno())
+                    self._save_checkpoint(identity, hashes)
+                    unsaved = 0
+                if self.progress is not None:
+                    self.progress(copied, size, (copied - resumed_at) / max(time.monotonic() - start, 1e-9))
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        if copied != size or self._identity(os.stat(self.source)) != identity:
+            self.discard()
+            raise OSError(errno.EAGAIN, "source file changed during the copy", self.source)
+        shutil.copymode(self.source, self.temporary)
+        os.replace(self.temporary, self.destination)
+        _remove(self.checkpoint)
+        return combine_checksums(hashes)
+
+def combine_checksums(hashes : list[str]) -> str:
+    """
+    Checksum of a file from the SHA-256 of its chunks, in order
+    """
+    return hashlib.sha256(b"".join(bytes.fromhex(chunk_hash) for chunk_hash in hashes)).hexdigest()
+
+def chunked_checksum(path : str, chunk_size : int = 8 << 20) -> str:
+    """
+    Checksum of a file as computed by ResumableCopy, e.g. to check a library file against a recorded one later
+    """
+    hashes = []
+    with open(path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            hashes.append(hashlib.sha256(chunk).hexdigest())
+    return combine_checksums(hashes)
+
+def _same_device(source : str, destination : str) -> bool:
+    """
+    Whether the source file and the folder of the destination (or its nearest existing parent) are on the same filesystem
+    """
+    return os.stat(source).st_dev == os.stat(_existing_parent(os.path.dirname(os.path.abspath(destination)))).st_dev
+
+def _can_hardlink(source : str, destination : str) -> bool:
+    """
+    Whether the source can be hard linked next to the destination (or in its nearest existing parent), tried with
+    a link removed right away
+    """
+    probe = os.path.join(_existing_parent(os.path.dirname(os.path.abspath(destination))), f".{os.path.basename(destination)}.{os.getpid()}.link")
+    _remove(probe) # left over by an interrupted probe
+    try:
+        os.link(source, probe)
+    except OSError:
+        return False
+    _remove(probe)
+    return True
+
+def bytes_to_copy(source : str, destination : str, strategy : str = "auto") -> int:
+    """
+    Bytes place_file() may write for a source : none for a rename or a hard link on the same filesystem (a link
+    is tried first, see _can_hardlink()), the whole file otherwise, a link that can't be made falling back to a
+    full copy (see FALLBACKS)
+    """
+    if _same_device(source, destination) and ("copy" not in FALLBACKS[strategy] or (FALLBACKS[strategy][0] == "hardlink" and _can_hardlink(source, destination))):
+        return 0
+    return os.path.getsize(source)
+
+def _existing_parent(path : str) -> str:
+    """
+    Path itself if it exists, else its nearest existing parent (e.g. for a movie folder not created yet)
+    """
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+def place_file(source : str, destination : str, strategy : str = "auto", progress = None) -> dict[str, str]:
+    """
+    Put the source file at the destination path (replacing any file there) with the cheapest method allowed by
+    `strategy` that works for both filesystems, returns {"method":..., "checksum":...} :
+    method : "hardlink", "reflink", "rename", "copy_file_range", "sendfile", "read/write" or "chunked" (with
+    "+delete" for a move across filesystems)
+    checksum : checksum of the data for a chunked copy (see chunked_checksum()), None otherwise
+    progress : called with (bytes copied, total bytes, bytes per second) while the data is copied (see ResumableCopy
+    and _copy()), it may raise to stop the copy
+    The destination only ever appears complete : the file is built under a temporary name, then renamed
+    """
+    if strategy not in FALLBACKS:
+        raise ValueError(f"Unknown placement strategy {strategy!r}, expected one of {', '.join(STRATEGIES)}")
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        return {"method":"none", "checksum":None}
+    if not _same_device(source, destination):
+        # Neither links nor renames cross filesystems, and such copies (e.g. to a USB drive) are the slow ones worth resuming :
+        checksum = ResumableCopy(source, destination, progress = progress).run()
+        if strategy == "move":
+            os.remove(source)
+            return {"method":"chunked+delete", "checksum":checksum}
+        return {"method":"chunked", "checksum":checksum}
+    if strategy == "move":
+        os.replace(source, destination)
+        return {"method":"rename", "checksum":None}
+    temporary = _temporary_path(destination)
+    _remove(temporary) # left over by an interrupted placement
+    for method in FALLBACKS[strategy]:
+        try:
+            if method == "hardlink":
+                _hardlink(source, temporary)
+            elif method == "reflink":
+                _reflink(source, temporary)
+            else:
+                method = _copy(source, temporary, progress)
+            os.replace(temporary, destination)
+            return {"method":method, "checksum":None}
+        except OSError as error:
+            _remove(temporary)
+            if method in ("hardlink", "reflink") and error.errno in UNSUPPORTED:
+                continue
+            raise
+        except BaseException:
+            _remove(temporary)
+            raise
@@ -1,12 +1,16 @@
 # FileSelectorWidget.py
 
 # Library imports :
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal, QThread
 from PyQt6.QtWidgets import QApplication, QMessageBox, QHBoxLayout, QVBoxLayout, QPushButton, QMainWindow, QWidget, QLabel, QFileDialog
 from PyQt6.QtGui import QDragEnterEvent, QDropEvent, QDrag
-from PyQt6.QtCore import QFileInfo
 import os
 import sys
+import time
+
+# Files sent to the widget at once by a scan, and seconds between two batches :
+SCAN_BATCH = 512
+SCAN_INTERVAL = 0.1
 
 # Define default functions to handle errors :
 
@@ -22,21 +26,87 @@ def default_handle_file_not_found():
     """
     QMessageBox.critical(None, "File Not Found", "The selected file does not exist. Please select another file.")
 
+def scan_paths(paths : list[str], extensions : tuple[str] = None, min_size : int = 0, stopped : 'function' = None):
+    """
+    Yield the files of `paths` : the files themselves, and the files found under the directories (without
+    following their symbolic links) whose extension is in `extensions` (any if None) and that hold at least
+    `min_size` bytes, in sorted order. Stops early once `stopped()` returns True
+    """
+    extensions = tuple(extension.lower() for extension in extensions) if extensions is not None else None
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        directories = [path]
+        while directories:
+            if stopped is not None and stopped():
+                return
+            try:
+                with os.scandir(directories.pop()) as scan:
+                    entries = sorted(scan, key = lambda entry: entry.name)
+            except OSError: # unreadable or vanished
+                continue
+            subdirectories = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks = False):
+                        subdirectories.append(entry.path)
+                    elif entry.is_file() and (extensions is None or entry.name.lower().endswith(extensions)) and (not min_size or entry.stat().st_size >= min_size):
+                        yield entry.path
+                except OSError:
+                    pass
+            directories.extend(reversed(subdirectories)) # walked in order, depth first
+
+class DirectoryScanner(QThread):
+    """
+    Thread running scan_paths(), the files found being sent in batches so that the UI thread only handles a
+    few signals per second, however many files there are
+    """
+    filesFound = pyqtSignal(list) # a batch of file paths
+
+    def __init__(self, paths : list[str], extensions : tuple[str] = None, min_size : int = 0, parent = None):
+        """
+        Prepare the scan, start() runs it
+        """
+        super().__init__(parent)
+        self.paths = paths
+        self.extensions = extensions
+        self.min_size = min_size
+
+    def run(self):
+        """
+        Scan the paths until done or until requestInterruption() is called
+        """
+        batch = []
+        last = time.monotonic()
+        for path in scan_paths(self.paths, self.extensions, self.min_size, self.isInterruptionRequested):
+            batch.append(path)
+            if len(batch) >= SCAN_BATCH or time.monotonic() - last >= SCAN_INTERVAL:
+                self.filesFound.emit(batch)
+                batch = []
+                last = time.monotonic()
+        if batch:
+            self.filesFound.emit(batch)
+
 # Define the Widget class :
 class FileSelectorWidget(QWidget):
     """
     A file selector PyQT6 widget that supports double clicking to open a file browser,
-    or drag-dropping a file. The getSelectedFilePath() method returns either the file path
-    as a string, or executes functions provided as arguments if :
+    or drag-dropping files and directories. Directories are scanned in a background thread
+    for the files matching `extensions` and `min_size` (see scan_paths()), added as they are found.
+    The getSelectedFilePaths() method returns the file paths, and getSelectedFilePath()
+    the first one, or executes functions provided as arguments if :
     - no file was selected
     - the file was selected, but doesn't exist/can't be found anymore
     """
     # Define PyQT6 signals :
     fileSelected = pyqtSignal(str) # when a file is selected
+    filesAdded = pyqtSignal(list) # when files are added to the selection, by a drop or a scan
+    scanFinished = pyqtSignal() # when every directory dropped has been scanned
     fileNotSelected = pyqtSignal() # if no file is selected when accessing path
     fileNotFound = pyqtSignal() # if the selected file no longer can be found when accessing path
 
-    def __init__(self, file_not_selected_error_function : 'function' = default_handle_file_not_selected, file_inexistant_error_function : 'function' = default_handle_file_not_found):
+    def __init__(self, file_not_selected_error_function : 'function' = default_handle_file_not_selected, file_inexistant_error_function : 'function' = default_handle_file_not_found, extensions : tuple[str] = None, min_size : int = 0):
         """
         Initialize the attributes, connect the signals and define the widget
         """
@@ -44,6 +114,10 @@ class FileSelectorWidget(QWidget):
 
         # Initialize attributes :
         self.selected_file_path = None
+        self.selected_file_paths = {} # selected files in order (a dict, to drop the ones dropped twice)
+        self.extensions = extensions
+        self.min_size = min_size
+        self.scanners = [] # scans in progress
         self.file_not_selected_error_function = file_not_selected_error_function
         self.file_inexistant_error_function = file_inexistant_error_function
 
@@ -52,7 +126,7 @@ class FileSelectorWidget(QWidget):
         self.fileNotFound.connect(self.file_inexistant_error_function)
 
         # Define the label with a placeholder text :
-        self.label = QLabel("Drag and drop a file here, or double-click to select a file")
+        self.label = QLabel("Drag and drop files or folders here, or double-click to select files")
         self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.label.setStyleSheet("border: 2px dashed #aaa; padding: 20px;")
 
@@ -66,42 +140,116 @@ class FileSelectorWidget(QWidget):
 
     def dragEnterEvent(self, event : QDragEnterEvent):
         """
-        Handle the object being selected through drag and drop by checking if it is
-        valid, i.e. :
-        - there is an URL
-        - it is a local file
-        - it isn't a directory
+        Handle the objects being selected through drag and drop by checking if they are
+        valid, i.e. there are URLs and at least one of them is a local file or directory
+        (they are only looked at once dropped, in the scanning thread)
         """
         if event.mimeData().hasUrls(): # check if there is an URL
-            url = event.mimeData().urls()[0]
-            if url.isLocalFile(): # check if it is a local file
-                file_info = QFileInfo(url.toLocalFile())
-                if file_info.isFile(): # check if it isn't a directory
-                    event.acceptProposedAction() # accept the file for dropping
+            if any(url.isLocalFile() for url in event.mimeData().urls()): # check if there is a local file
+                event.acceptProposedAction() # accept the files for dropping
 
     def dropEvent(self, event : QDropEvent):
         """
-        Handle the object being dropped by extracting the first file from the URL,
-        and ensuring it's not a directory
+        Handle the objects being dropped : every local file or directory is handed to a scanning thread,
+        the files it finds being added to the selection as they come
         """
-        file_path = event.mimeData().urls()[0].toLocalFile() # get the first file from the dropped URL
-        file_info = QFileInfo(file_path) # get its path
-        if file_info.isFile(): # check if it isn't a directory
-            self.label.setText(f"Selected file : {file_path}") # update the label to display the path of the selected file
-            self.selected_file_path = file_path  # store the selected file path
-            self.fileSelected.emit(file_path)  # emit the file path
-            event.acceptProposedAction() # accept the file
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            self.scan(paths)
+            event.acceptProposedAction() # accept the files
 
     def mouseDoubleClickEvent(self, event):
         """
-        Open a file explorer on double clicking to select a file rather than drag and dropping
-        The file explorer only accepts selecting a single object, and only accepts files
+        Open a file explorer on double clicking to select files rather than drag and dropping
+        The file explorer only accepts files
+        """
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "Select Files", "", "All Files (*)")
+        if file_paths: # when files are selected
+            self.clear()
+            self.add_files(file_paths)
+
+    def scan(self, paths : list[str]):
+        """
+        Replace the selection with the files of `paths`, scanned in a background thread
+        """
+        self.clear()
+        scanner = DirectoryScanner(paths, self.extensions, self.min_size, self)
+        scanner.filesFound.connect(self.add_files)
+        scanner.finished.connect(lambda: self.scan_finished(scanner))
+        self.scanners.append(scanner)
+        self.update_label()
+        scanner.start()
+
+    def scan_finished(self, scanner : DirectoryScanner):
+        """
+        Forget a scan that is over, signal it when it was the last one
         """
-        file_path, _ = QFileDialog.getOpenFileName(self, "Select a File", "", "All Files (*)")
-        if file_path: # when a file is selected
-            self.label.setText(f"Selected file: {file_path}")
-            self.selected_file_path = file_path  # store the selected file path
-            self.fileSelected.emit(file_path)  # emit the file path
+        if scanner in self.scanners:
+            self.scanners.remove(scanner)
+            scanner.deleteLater()
+            self.update_label()
+            if not self.scanners:
+                self.scanFinished.emit()
+
+    def add_files(self, file_paths : list[str]):
+        """
+        Add files to the selection
+        """
+        added = [file_path for file_path in file_paths if file_path not in self.selected_file_paths]
+        self.selected_file_paths.update(dict.fromkeys(added))
+        if added:
+            if self.selected_file_path is None:
+                self.selected_file_path = added[0] # store the first selected file path
+            self.update_label()
+            for file_path in added:
+                self.fileSelected.emit(file_path) # emit the file paths
+            self.filesAdded.emit(added)
+
+    def stop_scans(self, wait : bool = False):
+        """
+        Stop the scans in progress, their files are no longer added ; wait for their threads to end if `wait`
+        (before the widget is destroyed)
+        """
+        for scanner in self.scanners:
+            if not scanner.isInterruptionRequested():
+                scanner.filesFound.disconnect(self.add_files)
+                scanner.requestInterruption()
+            if wait:
+                scanner.wait()
+
+    def clear(self):
+        """
+        Empty the selection, stopping the scans in progress
+        """
+        self.stop_scans()
+        self.selected_file_path = None
+        self.selected_file_paths = {}
+        self.update_label()
+
+    def update_label(self):
+        """
+        Show the selected file, or the number of files selected and whether a scan is still running
+        """
+        scanning = " (scanning...)" if any(not scanner.isInterruptionRequested() for scanner in self.scanners) else ""
+        if len(self.selected_file_paths) == 1 and not scanning:
+            self.label.setText(f"Selected file : {self.selected_file_path}")
+        elif self.selected_file_paths or scanning:
+            self.label.setText(f"{len(self.selected_file_paths)} files selected{scanning}")
+        else:
+            self.label.setText("Drag and drop files or folders here, or double-click to select files")
+
+    def getSelectedFilePaths(self) -> list[str]:
+        """
+        Selected files still existing, in order (see getSelectedFilePath() for the error signals)
+        Returns an empty list if there are none
+        """
+        if not self.selected_file_paths:
+            self.fileNotSelected.emit()
+            return []
+        paths = [path for path in self.selected_file_paths if os.path.isfile(path)]
+        if not paths:
+            self.fileNotFound.emit()
+        return paths
 
     def getSelectedFilePath(self) -> str:
         """
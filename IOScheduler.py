@@ -0,0 +1,160 @@
+# IOScheduler.py
+
+# Library imports :
+import concurrent.futures
+import errno
+import os
+import threading
+
+def device_of(path : str) -> int:
+    """
+    Device (st_dev) of a path, or of its nearest existing parent for a path that doesn't exist yet
+    """
+    path = os.path.abspath(path)
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except FileNotFoundError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                raise
+            path = parent
+
+def free_bytes(path : str) -> int:
+    """
+    Space available to unprivileged users on the filesystem of a path (or of its nearest existing parent)
+    """
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    status = os.statvfs(path)
+    return status.f_bavail * status.f_frsize
+
+class IOScheduler:
+    """
+    Runs disk jobs (e.g. create_data calls) on a thread pool, with at most `per_device` jobs at once touching
+    any given device, source or destination : jobs on one spinning disk run one after the other instead of
+    thrashing its heads, while jobs on different disks run in parallel
+    Among the jobs that can start, the ones whose devices are the least busy go first, then the biggest ones,
+    so that every device is kept busy and the long copies don't end up alone at the end
+    Copies don't start if the destination filesystem lacks the space for them (plus `min_free_bytes`), counting
+    the space promised to the copies already running there
+    """
+    def __init__(self, per_device : int = 1, workers : int = 8, min_free_bytes : int = 0, device_of = device_of, free_bytes = free_bytes):
+        """
+        Create the pool
+        device_of / free_bytes : how to find the device and free space of a path (replaceable to simulate devices)
+        """
+        self.per_device = per_device
+        self.min_free_bytes = min_free_bytes
+        self.device_of = device_of
+        self.free_bytes = free_bytes
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "io_scheduler")
+        self._lock = threading.Lock()
+        self._pending = []
+        self._active = {} # device -> number of running jobs
+        self._reserved = {} # device -> bytes promised to running copies
+        self._running = 0
+        self._workers = workers
+
+    def submit(self, source : str, destination : str, size : int, function, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Schedule function(*args, **kwargs), a job reading `source` and writing under `destination`
+        size : bytes the job writes to the destination filesystem, 0 for jobs that don't copy data (links,
+        renames), which then don't count against the devices either
+        Returns a future of the result, failing with OSError(ENOSPC) if there isn't enough space for the job
+        """
+        future = concurrent.futures.Future()
+        devices = frozenset((self.device_of(source), self.device_of(destination))) if size else frozenset()
+        job = {"function":function, "args":args, "kwargs":kwargs, "destination":destination, "size":size, "devices":devices, "future":future}
+        with self._lock:
+            self._pending.append(job)
+        self._dispatch()
+        return future
+
+    def _runnable(self, job : dict[str, any]) -> bool:
+        """
+        Whether a job can start now (to call with the lock held)
+        """
+        return all(self._active.get(device, 0) < self.per_device for device in job["devices"])
+
+    def _dispatch(self):
+        """
+        Start as many pending jobs as the pool and the devices allow
+        """
+        refused = []
+        with self._lock:
+            while self._pending and self._running < self._workers:
+                runnable = [job for job in self._pending if self._runnable(job)]
+                if not runnable:
+                    break
+                job = min(runnable, key = lambda job: (sum(self._active.get(device, 0) for device in job["devices"]), -job["size"]))
+                self._pending.remove(job)
+                if not job["future"].set_running_or_notify_cancel():
+                    continue
+                error = self._reserve(job)
+                if error is not None:
+                    refused.append((job, error))
+                    continue
+                for device in job["devices"]:
+                    self._active[device] = self._active.get(device, 0) + 1
+                self._running += 1
+                self._pool.submit(self._run, job)
+        # Outside of the lock, done callbacks may submit jobs :
+        for job, error in refused:
+            job["future"].set_exception(error)
+
+    def _reserve(self, job : dict[str, any]) -> OSError:
+        """
+        Promise the destination space a copy needs, returns the error refusing the job if there isn't enough (lock held)
+        """
+        if not job["size"]:
+            return None
+        try:
+            device = self.device_of(job["destination"])
+            available = self.free_bytes(job["destination"]) - self._reserved.get(device, 0) - self.min_free_bytes
+        except OSError as error:
+            return error
+        if available < job["size"]:
+            return OSError(errno.ENOSPC, f"{job['size']} bytes needed, {max(available, 0)} available", job["destination"])
+        self._reserved[device] = self._reserved.get(device, 0) + job["size"]
+        job["reserved_on"] = device
+        return None
+
+    def _run(self, job : dict[str, any]):
+        """
+        Run a job on a worker thread, then free its devices and start the next ones
+        """
+        try:
+            result = job["function"](*job["args"], **job["kwargs"])
+        except BaseException as error:
+            job["future"].set_exception(error)
+        else:
+            job["future"].set_result(result)
+        finally:
+            with self._lock:
+                for device in job["devices"]:
+                    self._active[device] -= 1
+                if "reserved_on" in job:
+                    self._reserved[job["reserved_on"]] -= job["size"]
+                self._running -= 1
+            self._dispatch()
+
+    def shutdown(self, wait : bool = True):
+        """
+        Wait for every scheduled job (if `wait`) and stop the pool
+        """
+        if wait:
+            while True:
+                with self._lock:
+                    futures = [job["future"] for job in self._pending]
+                if not futures:
+                    break
+                concurrent.futures.wait(futures)
+        self._pool.shutdown(wait = wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,214 @@
+# ImportJobs.py
+
+# Imports started from the GUI, run on a QThreadPool so that the window keeps answering while files are
+# fetched and copied : every job goes through the stages of STAGES, reports them, the progress and the
+# throughput of its copy through Qt signals (delivered on the UI thread), and can be cancelled at any time
+
+# Library imports :
+from PyQt6.QtCore import QCoreApplication, QObject, QRunnable, QThreadPool, pyqtSignal
+import threading
+import time
+
+# Module imports :
+from FileManager import FileManager
+from JobStore import JobStore
+
+# Stages of a job, in order, followed by one of "done", "failed" or "cancelled" :
+STAGES = ("queued", "resolving", "fetching", "placing")
+
+# Seconds between two progress signals of a copy, the UI doesn't need more :
+PROGRESS_INTERVAL = 0.1
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job that was asked to stop, at the next stage or copy step
+    """
+
+class JobSignals(QObject):
+    """
+    Signals of the jobs of a JobQueue, each carrying the job ID first
+    Sizes are sent as Python objects, they don't fit the C++ int of a plain int signal
+    """
+    stageChanged = pyqtSignal(int, str) # stage (see STAGES)
+    progressed = pyqtSignal(int, object, object, float) # bytes copied, total bytes, bytes per second
+    finished = pyqtSignal(int, dict) # title, folder, placement method, checksum, seconds
+    failed = pyqtSignal(int, str) # error message
+    cancelled = pyqtSignal(int)
+
+class ImportJob(QRunnable):
+    """
+    Import of one file : resolve its link (or identify it from its name), fetch its metadata, then write
+    its NFO and place it in the library
+    """
+    def __init__(self, job_id : int, filemanager : FileManager, base_path : str, path : str, name : str, link : str, signals : JobSignals):
+        """
+        Prepare the job, nothing runs before the pool starts it
+        """
+        super().__init__()
+        self.setAutoDelete(False) # the queue holds it until it is over
+        self.job_id = job_id
+        self.filemanager = filemanager
+        self.base_path = base_path
+        self.path = path
+        self.name = name
+        self.link = link
+        self.signals = signals
+        self._cancelled = threading.Event()
+        self._last_progress = 0.0
+
+    def cancel(self):
+        """
+        Ask the job to stop, it does at its next stage or copy step
+        """
+        self._cancelled.set()
+
+    def _stage(self, stage : str):
+        """
+        Stop if cancelled, otherwise report the stage the job enters
+        """
+        if self._cancelled.is_set():
+            raise JobCancelled()
+        self.signals.stageChanged.emit(self.job_id, stage)
+
+    def _progress(self, copied : int, total : int, rate : float):
+        """
+        Progress callback of the copy (see FileManager.create_data()), stops it once the job is cancelled
+        """
+        if self._cancelled.is_set():
+            raise JobCancelled()
+        now = time.monotonic()
+        if now - self._last_progress >= PROGRESS_INTERVAL or copied == total:
+            self._last_progress = now
+            self.signals.progressed.emit(self.job_id, copied, total, rate)
+
+    def run(self):
+        """
+        Run every stage, ending with the finished, failed or cancelled signal
+        """
+        start = time.monotonic()
+        try:
+            self._stage("resolving")
+            id_type, movie_id = self.filemanager.extract_id(self.link) if self.link else self.filemanager.identify(self.path)
+            if not movie_id:
+                raise LookupError("No IMDB/TMDB ID in the link" if self.link else "No link, and no title matching the file name")
+
+            self._stage("fetching")
+            movie_data = self.filemanager.fetch_data(id_type, movie_id)
+            if not movie_data:
+                raise LookupError("Could not fetch the movie data from TMDB")
+            if self.filemanager.artwork is not None:
+                self.filemanager.artwork.prefetch(movie_data)
+
+            self._stage("placing")
+            nfo_content = self.filemanager.generate_nfo(movie_data)
+            folder_name = (self.name or movie_data.get("title") or "Unknown").replace(" ", "_")
+            placement = self.filemanager.create_data(self.base_path, folder_name, self.path, nfo_content, self._progress, movie_data)
+            self.signals.finished.emit(self.job_id, {"title":movie_data.get("title"), "folder":placement["folder"], "placement":placement["method"], "checksum":placement["checksum"], "seconds":round(time.monotonic() - start, 3)})
+        except JobCancelled:
+            self.signals.cancelled.emit(self.job_id)
+        except Exception as error:
+            self.signals.failed.emit(self.job_id, f"{error}")
+
+class JobQueue(QObject):
+    """
+    Jobs waiting for or running on a pool of `workers` threads, in the order they were added
+    With a store, every job is recorded there (its ID being the one of the store) and follows its state
+    """
+    def __init__(self, filemanager : FileManager, base_path : str, workers : int = 2, store : JobStore = None):
+        """
+        Create the pool and the signals, connect to `signals` to follow the jobs
+        """
+        super().__init__()
+        self.filemanager = filemanager
+        self.base_path = base_path
+        self.store = store
+        self.signals = JobSignals()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(workers)
+        self._jobs = {} # job ID -> ImportJob, until it is over
+        self._next_id = 1
+        self.signals.stageChanged.connect(self._stage_changed)
+        self.signals.finished.connect(self._finished)
+        self.signals.failed.connect(self._failed)
+        self.signals.cancelled.connect(self._cancelled)
+
+    def add(self, path : str, name : str, link : str) -> int:
+        """
+        Queue the import of a file, returns its job ID (the job is in the "queued" stage until a worker takes it)
+        """
+        return self.add_many([(path, name, link)])[0]
+
+    def add_many(self, items : list[tuple[str, str, str]]) -> list[int]:
+        """
+        Queue the imports of files from (path, name, link), returns their job IDs in order
+        """
+        if self.store is not None:
+            job_ids = self.store.add_many(items)
+        else:
+            job_ids = list(range(self._next_id, self._next_id + len(items)))
+            self._next_id += len(items)
+        for job_id, (path, name, link) in zip(job_ids, items):
+            job = ImportJob(job_id, self.filemanager, self.base_path, path, name, link, self.signals)
+            self._jobs[job_id] = job
+            self.pool.start(job)
+        return job_ids
+
+    def _stage_changed(self, job_id : int, stage : str):
+        """
+        Record the stage a job entered
+        """
+        if self.store is not None:
+            self.store.update(job_id, state = stage)
+
+    def _finished(self, job_id : int, result : dict):
+        """
+        Record an import, "skipped" when the library already had the movie or the file
+        """
+        self._jobs.pop(job_id, None)
+        if self.store is not None:
+            state = "skipped" if result["placement"] in ("skipped", "duplicate") else "done"
+            self.store.update(job_id, state = state, title = result["title"] or self.store.job(job_id)["title"], folder = result["folder"], placement = result["placement"])
+
+    def _failed(self, job_id : int, error : str):
+        """
+        Record a failed job
+        """
+        self._jobs.pop(job_id, None)
+        if self.store is not None:
+            self.store.update(job_id, state = "failed", error = error)
+
+    def _cancelled(self, job_id : int):
+        """
+        Record a cancelled job
+        """
+        self._jobs.pop(job_id, None)
+        if self.store is not None:
+            self.store.update(job_id, state = "cancelled")
+
+    def cancel(self, job_id : int):
+        """
+        Cancel a job : a queued one is taken out of the pool right away, a running one stops at its next step
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        if self.pool.tryTake(job):
+            self.signals.cancelled.emit(job_id)
+        else:
+            job.cancel()
+
+    def running(self) -> list[int]:
+        """
+        IDs of the jobs not over yet
+        """
+        return list(self._jobs)
+
+    def shutdown(self):
+        """
+        Cancel every job and wait for the running ones to stop, then deliver the signals they sent meanwhile
+        (queued to this thread), so that they are handled while the store is still open
+        """
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+        self.pool.waitForDone()
+        QCoreApplication.sendPostedEvents()
@@ -0,0 +1,231 @@
+# JobHistoryWidget.py
+
+# Panel listing the imports of a JobStore, newest first, filtered by state and title. The list is a
+# QListView over JobHistoryModel : rows are read from the store one page at a time when the view paints
+# them, and only a few pages are kept, so the panel costs the same with 50 jobs or 50 000
+
+# Library imports :
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QListView, QLineEdit, QComboBox, QAbstractItemView
+import collections
+import sys
+
+# Module imports :
+from JobStore import JobStore, STATES
+
+# Rows read from the store at once, and pages kept in memory (the least recently used one is dropped) :
+PAGE_SIZE = 256
+CACHED_PAGES = 8
+
+# Milliseconds during which changes of the store are gathered into a single refresh of the view :
+REFRESH_DELAY = 100
+
+class JobHistoryModel(QAbstractListModel):
+    """
+    Jobs of a JobStore in a state (any if None) whose title contains a text, newest first
+    Each row shows the title, the state and the outcome of a job, its ID is under Qt.ItemDataRole.UserRole
+    Running jobs may also show a progress text (see set_progress()), kept in memory only
+    """
+    def __init__(self, store : JobStore, parent = None):
+        """
+        Count the jobs, nothing else is read before the view asks for rows
+        """
+        super().__init__(parent)
+        self.store = store
+        self.state = None
+        self.title = ""
+        self._count = store.count()
+        self._pages = collections.OrderedDict() # page number -> jobs of the page
+        self._progress = {} # job ID -> progress text, while it is copied
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(REFRESH_DELAY)
+        self._refresh_timer.timeout.connect(self.refresh)
+
+    def rowCount(self, parent : QModelIndex = QModelIndex()) -> int:
+        """
+        Number of jobs shown, a flat list
+        """
+        return 0 if parent.isValid() else self._count
+
+    def _job(self, row : int) -> dict[str, any]:
+        """
+        Job of a row, reading its page from the store if it isn't cached
+        """
+        number = row // PAGE_SIZE
+        page = self._pages.get(number)
+        if page is None:
+            page = self.store.page(number * PAGE_SIZE, PAGE_SIZE, self.state, self.title)
+            self._pages[number] = page
+            if len(self._pages) > CACHED_PAGES:
+                self._pages.popitem(last = False)
+        else:
+            self._pages.move_to_end(number)
+        offset = row % PAGE_SIZE
+        return page[offset] if offset < len(page) else None
+
+    def data(self, index : QModelIndex, role : int = Qt.ItemDataRole.DisplayRole):
+        """
+        Text, job ID or tooltip of a row
+        """
+        if not index.isValid() or index.row() >= self._count:
+            return None
+        job = self._job(index.row())
+        if job is None: # the store changed, refresh() is on its way
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            if job["id"] in self._progress:
+                detail = self._progress[job["id"]]
+            elif job["state"] == "failed":
+                detail = f"failed : {job['error']}"
+            elif job["state"] in ("done", "skipped"):
+                detail = f"{job['state']} ({job['placement']})"
+            else:
+                detail = job["state"]
+            return f"{job['title']} : {detail}"
+        if role == Qt.ItemDataRole.UserRole:
+            return job["id"]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return "\n".join(f"{field} : {job[field]}" for field in ("path", "link", "folder", "error") if job[field])
+        return None
+
+    def set_filter(self, state : str = None, title : str = ""):
+        """
+        Show the jobs in a state (any if None) whose title contains `title`
+        """
+        self.beginResetModel()
+        self.state = state or None
+        self.title = title
+        self._pages.clear()
+        self._count = self.store.count(self.state, self.title)
+        self.endResetModel()
+
+    def schedule_refresh(self):
+        """
+        Refresh the view shortly, gathering the changes made meanwhile (a folder of jobs queued at once...)
+        """
+        if not self._refresh_timer.isActive():
+            self._refresh_timer.start()
+
+    def stop_refresh(self):
+        """
+        Drop a refresh scheduled but not done yet, before the store is closed
+        """
+        self._refresh_timer.stop()
+
+    def refresh(self):
+        """
+        Read the store again : new jobs are inserted at the top of the view (keeping the selection and the
+        scrolling), other changes update the rows
+        """
+        count = self.store.count(self.state, self.title)
+        self._pages.clear()
+        if count > self._count and not self.state and not self.title:
+            # Unfiltered, jobs only ever get added, on top (a title filter may match an older job once its
+            # title is known, a state filter any job entering the state) :
+            self.beginInsertRows(QModelIndex(), 0, count - self._count - 1)
+            self._count = count
+            self.endInsertRows()
+        elif count != self._count:
+            # Jobs entered or left the filter, anywhere in the list :
+            self.beginResetModel()
+            self._count = count
+            self.endResetModel()
+        if self._count:
+            self.dataChanged.emit(self.index(0), self.index(self._count - 1))
+
+    def set_progress(self, job_id : int, text : str = None):
+        """
+        Show a progress text for a job instead of its state, or its state again if `text` is None
+        Only the row of the job is repainted, if it is in a cached page (otherwise it isn't on screen)
+        """
+        if text is None:
+            self._progress.pop(job_id, None)
+        else:
+            self._progress[job_id] = text
+        for number, page in self._pages.items():
+            for offset, job in enumerate(page):
+                if job["id"] == job_id:
+                    index = self.index(number * PAGE_SIZE + offset)
+                    self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+                    return
+
+class JobHistoryWidget(QWidget):
+    """
+    A PyQT6 widget listing the jobs of a JobStore, with a text box filtering them by title and a menu
+    filtering them by state
+    """
+    # Define PyQT6 signals :
+    jobSelected = pyqtSignal(int) # when a job is selected, with its ID
+
+    def __init__(self, store : JobStore, parent = None):
+        """
+        Initialize the model, the view and the filters
+        """
+        super().__init__(parent)
+        self.model = JobHistoryModel(store, self)
+
+        # Filters :
+        self.title_filter = QLineEdit(self)
+        self.title_filter.setObjectName("history_title_filter")
+        self.title_filter.setPlaceholderText("Filter by title...")
+        self.state_filter = QComboBox(self)
+        self.state_filter.setObjectName("history_state_filter")
+        self.state_filter.addItem("all states", None)
+        for state in STATES:
+            self.state_filter.addItem(state, state)
+        # Filter once typing pauses, rather than on every key :
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(250)
+        self._filter_timer.timeout.connect(self.apply_filter)
+        self.title_filter.textChanged.connect(lambda _: self._filter_timer.start())
+        self.state_filter.currentIndexChanged.connect(lambda _: self.apply_filter())
+
+        # Rows all have the same height, so that the view never has to measure the ones it doesn't show :
+        self.view = QListView(self)
+        self.view.setObjectName("history_view")
+        self.view.setUniformItemSizes(True)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.view.setModel(self.model)
+        self.view.selectionModel().currentChanged.connect(lambda index, _: self.select(index))
+
+        # Define the layout :
+        filters = QHBoxLayout()
+        filters.addWidget(self.title_filter)
+        filters.addWidget(self.state_filter)
+        layout = QVBoxLayout()
+        layout.addLayout(filters)
+        layout.addWidget(self.view)
+        self.setLayout(layout)
+
+    def apply_filter(self):
+        """
+        Filter the jobs with the current title and state
+        """
+        self.model.set_filter(self.state_filter.currentData(), self.title_filter.text().strip())
+
+    def select(self, index : QModelIndex):
+        """
+        Emit the ID of a job selected in the view
+        """
+        job_id = index.data(Qt.ItemDataRole.UserRole) if index.isValid() else None
+        if job_id is not None:
+            self.jobSelected.emit(job_id)
+
+    def selected_job(self) -> int:
+        """
+        ID of the selected job, None if there is none
+        """
+        index = self.view.currentIndex()
+        return index.data(Qt.ItemDataRole.UserRole) if index.isValid() else None
+
+# Example usage :
+if __name__ == "__main__":
+    # Browse a job store :
+    app = QApplication(sys.argv)
+    history = JobHistoryWidget(JobStore(sys.argv[1] if len(sys.argv) > 1 else "jobs.sqlite"))
+    history.resize(600, 800)
+    history.show()
+    # Start the event loop :
+    app.exec()
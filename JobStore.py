@@ -0,0 +1,145 @@
+# JobStore.py
+
+# History of the imports started from the GUI, kept in SQLite : every job with its file, its state and its
+# outcome, newest first. Views read it one page at a time (see page()), so that tens of thousands of jobs
+# never have to be loaded at once
+
+# Library imports :
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# States of a job : the stages it goes through (see ImportJobs.STAGES), then how it ended
+STATES = ("queued", "resolving", "fetching", "placing", "done", "skipped", "failed", "cancelled", "interrupted")
+FINAL_STATES = ("done", "skipped", "failed", "cancelled", "interrupted")
+
+# Job fields, in the order of the table columns :
+FIELDS = ("id", "path", "name", "link", "title", "state", "folder", "placement", "error", "created", "updated")
+
+class JobStore:
+    """
+    Jobs stored in SQLite, known by an ID growing with every job
+    title : what the job is shown as, the name given or the file name until the movie title is known
+    Jobs left unfinished by a closed GUI are marked "interrupted" by interrupt_unfinished()
+    """
+    def __init__(self, path : str = "jobs.sqlite"):
+        """
+        Open (or create) the store
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread = False, isolation_level = None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, path TEXT, name TEXT, link TEXT, title TEXT, state TEXT, folder TEXT, placement TEXT, error TEXT, created REAL, updated REAL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id)")
+
+    def interrupt_unfinished(self) -> int:
+        """
+        Mark the jobs that never ended "interrupted" (the GUI that ran them was closed), returns how many
+        """
+        with self._lock:
+            return self._connection.execute(f"UPDATE jobs SET state = 'interrupted', updated = ? WHERE state NOT IN ({', '.join('?' * len(FINAL_STATES))})", (time.time(), *FINAL_STATES)).rowcount
+
+    def add(self, path : str, name : str = None, link : str = None) -> int:
+        """
+        Record a queued job, returns its ID
+        """
+        return self.add_many([(path, name, link)])[0]
+
+    def add_many(self, items : list[tuple[str, str, str]]) -> list[int]:
+        """
+        Record queued jobs from (path, name, link) in one transaction, returns their IDs in order
+        """
+        now = time.time()
+        ids = []
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                for path, name, link in items:
+                    ids.append(self._connection.execute("INSERT INTO jobs (path, name, link, title, state, created, updated) VALUES (?, ?, ?, ?, 'queued', ?, ?)", (path, name, link, name or os.path.basename(path), now, now)).lastrowid)
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return ids
+
+    def update(self, job_id : int, **fields):
+        """
+        Change fields of a job (state, title, folder, placement, error)
+        """
+        unknown = set(fields) - set(FIELDS[4:9])
+        if unknown:
+            raise ValueError(f"Unknown job fields {', '.join(sorted(unknown))}")
+        with self._lock:
+            self._connection.execute(f"UPDATE jobs SET {', '.join(f'{field} = ?' for field in fields)}, updated = ? WHERE id = ?", (*fields.values(), time.time(), job_id))
+
+    @staticmethod
+    def _where(state : str, title : str) -> tuple[str, list]:
+        """
+        WHERE clause and parameters selecting the jobs in a state (any if None) whose title contains `title`
+        """
+        conditions, parameters = [], []
+        if state:
+            conditions.append("state = ?")
+            parameters.append(state)
+        if title:
+            conditions.append("title LIKE ? ESCAPE '\\'")
+            parameters.append("%" + title.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), parameters
+
+    def count(self, state : str = None, title : str = "") -> int:
+        """
+        Number of jobs in a state (any if None) whose title contains `title` (case insensitive)
+        """
+        where, parameters = self._where(state, title)
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM jobs" + where, parameters).fetchone()[0]
+
+    def page(self, offset : int, limit : int, state : str = None, title : str = "") -> list[dict[str, any]]:
+        """
+        Jobs `offset` to `offset + limit` of the ones count() counts, newest first
+        """
+        where, parameters = self._where(state, title)
+        with self._lock:
+            rows = self._connection.execute(f"SELECT {', '.join(FIELDS)} FROM jobs{where} ORDER BY id DESC LIMIT ? OFFSET ?", (*parameters, limit, offset)).fetchall()
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def job(self, job_id : int) -> dict[str, any]:
+        """
+        A job, None if there is no such job
+        """
+        with self._lock:
+            row = self._connection.execute(f"SELECT {', '.join(FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def counts(self) -> dict[str, int]:
+        """
+        Number of jobs in every state
+        """
+        with self._lock:
+            return dict(self._connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def close(self):
+        """
+        Close the store
+        """
+        with self._lock:
+            self._connection.close()
+
+# Command line :
+if __name__ == "__main__":
+    with open("config.json") as config_file:
+        config = json.load(config_file)
+    parser = argparse.ArgumentParser(description = "List the imports started from the GUI, newest first")
+    parser.add_argument("--state", choices = STATES)
+    parser.add_argument("--title", default = "", help = "only the jobs whose title contains this")
+    parser.add_argument("--limit", type = int, default = 50)
+    arguments = parser.parse_args()
+
+    store = JobStore(config["gui"]["history"])
+    for job in store.page(0, arguments.limit, arguments.state, arguments.title):
+        print(json.dumps(job, ensure_ascii = False))
+    print(json.dumps(store.counts()))
+    store.close()
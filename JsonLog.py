@@ -0,0 +1,203 @@
+# JsonLog.py
+
+# Machine-readable twin of the log : one JSON object per entry in a JSON Lines file, plus a sidecar index
+# of fixed size records (entry number, timestamp, type, offset, length) to query it without parsing it
+
+# Library imports :
+import argparse
+import datetime
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+
+# Index record : entry number, POSIX timestamp, CRC32 of the type, byte offset and length of the line
+RECORD = struct.Struct("<QdIQI")
+
+def type_code(log_type : str) -> int:
+    """
+    Code of a log type in the index
+    """
+    return zlib.crc32(log_type.encode("utf-8"))
+
+class JsonLogSink:
+    """
+    Append-only JSON Lines log file with its index (<path>.idx)
+    """
+    def __init__(self, path : str, buffering : int = 1 << 20):
+        """
+        Open the log and its index for appending, indexing lines the index doesn't know about yet
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab', buffering = buffering)
+        self._index = open(f"{path}.idx", 'ab', buffering = buffering)
+        self._size = self._file.seek(0, os.SEEK_END)
+        self._repair_index()
+
+    def _repair_index(self):
+        """
+        Drop index records pointing past the end of the log and index the lines written after the last record
+        """
+        with open(f"{self.path}.idx", 'rb') as index:
+            data = index.read()
+        valid = len(data) // RECORD.size
+        while valid and sum(RECORD.unpack_from(data, (valid - 1) * RECORD.size)[3:]) > self._size:
+            valid -= 1
+        if len(data) != valid * RECORD.size:
+            self._index.truncate(valid * RECORD.size)
+        offset = sum(RECORD.unpack_from(data, (valid - 1) * RECORD.size)[3:]) if valid else 0
+        with open(self.path, 'rb') as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b"\n"): # torn last line, left out of the index
+                    break
+                self._index.write(RECORD.pack(*index_fields(json.loads(line)), offset, len(line)))
+                offset += len(line)
+        self._index.flush()
+
+    def append(self, entry_number : int, timestamp : float, log_type : str, line : str):
+        """
+        Append one serialized entry (without its trailing newline)
+        """
+        data = line.encode("utf-8") + b"\n"
+        with self._lock:
+            self._file.write(data)
+            self._index.write(RECORD.pack(entry_number, timestamp, type_code(log_type), self._size, len(data)))
+            self._size += len(data)
+
+    def refresh(self):
+        """
+        Catch up with lines appended by other processes sharing the log (to call while holding their common lock)
+        """
+        with self._lock:
+            self._file.flush()
+            self._index.flush()
+            self._size = os.fstat(self._file.fileno()).st_size
+
+    def flush_buffers(self):
+        """
+        Push buffered lines and index records to the operating system
+        """
+        with self._lock:
+            self._file.flush()
+            self._index.flush()
+
+    def close(self):
+        """
+        Flush and close the log and its index
+        """
+        with self._lock:
+            self._file.close()
+            self._index.close()
+
+def index_fields(entry : dict) -> tuple[int, float, int]:
+    """
+    Index fields (entry number, timestamp, type code) of a parsed entry
+    """
+    return entry["entry"], datetime.datetime.fromisoformat(entry["timestamp"]).timestamp(), type_code(entry["type"])
+
+class JsonLogQuery:
+    """
+    Read-only view of a JSON Lines log through its index, both memory-mapped : entries are filtered on the
+    timestamp and the type of their index record before any JSON is parsed
+    """
+    def __init__(self, path : str):
+        """
+        Map the log and its index
+        """
+        self.path = path
+        self._maps = []
+        if os.path.exists(path) and not os.path.exists(f"{path}.idx"): # log copied without its index
+            JsonLogSink(path).close()
+        # Index first : lines are flushed before their records, so every mapped record points into the mapped log
+        self.index = self._map(f"{path}.idx")
+        self.log = self._map(path)
+        self.length = len(self.index) // RECORD.size if self.index is not None else 0
+
+    def _map(self, path : str):
+        """
+        Memory-map a file read-only, None if it is empty or missing
+        """
+        try:
+            with open(path, 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return None
+                mapping = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        self._maps.append(mapping)
+        return mapping
+
+    def record(self, position : int) -> tuple[int, float, int, int, int]:
+        """
+        Index record at a position
+        """
+        return RECORD.unpack_from(self.index, position * RECORD.size)
+
+    def query(self, types = None, since : float = None, until : float = None, file : str = None):
+        """
+        Stream the entries (as dicts) matching every given filter :
+        types : log types, since/until : POSIX timestamps, file : file name of the invoker (any invoker field)
+        Every record of the index is checked : timestamps are taken by the writers (and by remote clients of a
+        LogCollector) before they get the log, so the file isn't in timestamp order and can't be bisected
+        """
+        if self.length == 0:
+            return
+        codes = {type_code(log_type) for log_type in types} if types else None
+        wanted_types = set(types) if types else None
+        with memoryview(self.index) as view, view[:self.length * RECORD.size] as records:
+            for _, timestamp, code, offset, length in RECORD.iter_unpack(records):
+                if (since is not None and timestamp < since) or (until is not None and timestamp > until):
+                    continue
+                if codes is not None and code not in codes:
+                    continue
+                entry = json.loads(self.log[offset:offset + length])
+                if wanted_types is not None and entry["type"] not in wanted_types: # CRC32 collision
+                    continue
+                if file is not None and not any(isinstance(value, dict) and value.get("file") == file for value in entry.values()):
+                    continue
+                yield entry
+
+    def close(self):
+        """
+        Unmap the log and its index
+        """
+        for mapping in self._maps:
+            mapping.close()
+        self._maps = []
+
+def parse_time(value : str) -> float:
+    """
+    Parse a command line time : a duration before now ("90s", "15m", "1h", "2d") or an ISO 8601 date
+    """
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", value)
+    if match:
+        seconds = float(match.group(1)) * {"s":1, "m":60, "h":3600, "d":86400}[match.group(2)]
+        return datetime.datetime.now(datetime.timezone.utc).timestamp() - seconds
+    moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo = datetime.timezone.utc)
+    return moment.timestamp()
+
+# Query tool :
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Stream the entries of a JSON Lines log matching filters")
+    parser.add_argument("log", nargs = "?", default = "log.jsonl", help = "JSON Lines log file (default: log.jsonl)")
+    parser.add_argument("--type", action = "append", dest = "types", help = "log type to keep, can be repeated")
+    parser.add_argument("--since", type = parse_time, help = "start time, duration before now (1h, 30m...) or ISO 8601 date")
+    parser.add_argument("--until", type = parse_time, help = "end time, same format as --since")
+    parser.add_argument("--file", help = "file name of the invoker, e.g. FileManager.py")
+    arguments = parser.parse_args()
+    log_query = JsonLogQuery(arguments.log)
+    try:
+        for entry in log_query.query(arguments.types, arguments.since, arguments.until, arguments.file):
+            sys.stdout.write(json.dumps(entry, ensure_ascii = False) + "\n")
+    except BrokenPipeError: # e.g. piped into head
+        pass
+    finally:
+        log_query.close()
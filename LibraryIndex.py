@@ -0,0 +1,292 @@
+# LibraryIndex.py
+
+# Index of the movies already in the library, kept in SQLite so that "is it already imported ?" is one
+# lookup instead of a walk of the library : FileManager.create_data() records every folder it fills, and
+# rescan() brings the index up to date with changes made by hand, only reading the folders that changed
+
+# Library imports :
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+# Module imports :
+from LinkParser import parse_link
+
+# What create_data() does when the movie is already in the library :
+# - skip : leave the library as it is, nothing is copied
+# - replace : put the new file in the first folder holding the movie, in place of the previous one
+# - version : import the new file as another version of the movie, in a folder of its own
+CONFLICT_POLICIES = ("skip", "replace", "version")
+
+# Entry fields, in the order of the table columns :
+FIELDS = ("folder", "kind", "tmdb_id", "imdb_id", "title", "year", "file", "size", "mtime_ns", "checksum", "added")
+
+def media_kind(movie_data : dict[str, any]) -> str:
+    """
+    "movie" or "tv", see FileManager.fetch_data()
+    """
+    return movie_data.get("media_type", "movie")
+
+def read_nfo(path : str) -> dict[str, str]:
+    """
+    Title, year and IDs of the movie described by an NFO file, None if it can't be read
+    """
+    try:
+        movie = ET.parse(path).getroot()
+    except (OSError, ET.ParseError):
+        return None
+    year = movie.findtext("year") or ""
+    fields = {"kind":"movie", "tmdb_id":None, "imdb_id":None, "title":movie.findtext("title"), "year":year if year.isdigit() else None}
+    for tag in ("tmdb", "imdb"):
+        id_type, movie_id = parse_link(movie.findtext(tag) or "")
+        if id_type == "imdb":
+            fields["imdb_id"] = movie_id
+        elif id_type:
+            fields["kind"], fields["tmdb_id"] = ("tv" if id_type == "tmdb_tv" else "movie"), movie_id
+    return fields
+
+class LibraryIndex:
+    """
+    Folders of the library, each with the movie it holds (TMDB and IMDB IDs, title, year) and its media file
+    (name, size, modification time, checksum when it was copied), several folders may hold the same movie
+    Folders are known by their absolute path, and the modification time of every folder is kept so that a
+    rescan only reads the folders whose content changed
+    """
+    def __init__(self, path : str = "library.sqlite"):
+        """
+        Open (or create) the index
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread = False, isolation_level = None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS entries (folder TEXT PRIMARY KEY, kind TEXT, tmdb_id TEXT, imdb_id TEXT, title TEXT, year TEXT, file TEXT, size INTEGER, mtime_ns INTEGER, checksum TEXT, added REAL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_tmdb ON entries (tmdb_id, kind)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_imdb ON entries (imdb_id)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_title ON entries (title COLLATE NOCASE, year)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_size ON entries (size)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY, mtime_ns INTEGER)")
+
+    def _select(self, condition : str, parameters : tuple) -> list[dict[str, any]]:
+        """
+        Entries matching an SQL condition, oldest first
+        """
+        with self._lock:
+            rows = self._connection.execute(f"SELECT {', '.join(FIELDS)} FROM entries WHERE {condition} ORDER BY added", parameters).fetchall()
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def entry(self, folder : str) -> dict[str, any]:
+        """
+        Entry of a folder, None if it isn't indexed
+        """
+        entries = self._select("folder = ?", (os.path.abspath(folder),))
+        return entries[0] if entries else None
+
+    def find(self, id_type : str, movie_id) -> list[dict[str, any]]:
+        """
+        Entries holding a movie, by id type ("imdb", "tmdb" or "tmdb_tv") and ID
+        """
+        if id_type == "imdb":
+            return self._select("imdb_id = ?", (str(movie_id),))
+        return self._select("tmdb_id = ? AND kind = ?", (str(movie_id), "tv" if id_type == "tmdb_tv" else "movie"))
+
+    def find_movie(self, movie_data : dict[str, any]) -> list[dict[str, any]]:
+        """
+        Entries holding the movie of fetched data, by its TMDB or its IMDB ID
+        """
+        return self._select("(tmdb_id = ? AND kind = ?) OR imdb_id = ?", (str(movie_data.get("id")), media_kind(movie_data), movie_data.get("imdb_id") or ""))
+
+    def find_title(self, title : str, year : str = None) -> list[dict[str, any]]:
+        """
+        Entries of a title (case insensitive), of a given year if any
+        """
+        if year is None:
+            return self._select("title = ? COLLATE NOCASE", (title,))
+        return self._select("title = ? COLLATE NOCASE AND year = ?", (title, str(year)))
+
+    def find_size(self, size : int) -> list[dict[str, any]]:
+        """
+        Entries whose media file has a given size, the only candidates for holding the same content as a file
+        """
+        return self._select("size = ?", (size,))
+
+    def add(self, folder : str, movie_data : dict[str, any], file_path : str, checksum : str = None):
+        """
+        Record the folder a movie was imported into, with its media file, replacing its previous entry if any
+        """
+        folder = os.path.abspath(folder)
+        status = os.stat(file_path)
+        year = (movie_data.get("release_date") or "").split("-")[0]
+        entry = {
+            "folder":folder,
+            "kind":media_kind(movie_data),
+            "tmdb_id":str(movie_data["id"]) if movie_data.get("id") is not None else None,
+            "imdb_id":movie_data.get("imdb_id") or None,
+            "title":movie_data.get("title"),
+            "year":year if year.isdigit() else None,
+            "file":os.path.basename(file_path),
+            "size":status.st_size,
+            "mtime_ns":status.st_mtime_ns,
+            "checksum":checksum,
+            "added":time.time(),
+        }
+        self._store([entry], [folder])
+
+    def _store(self, entries : list[dict[str, any]], directories : list[str]):
+        """
+        Write entries, and the current modification time of directories, in one transaction
+        """
+        mtimes = []
+        for directory in directories:
+            try:
+                mtimes.append((directory, os.stat(directory).st_mtime_ns))
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(f"INSERT OR REPLACE INTO entries VALUES ({', '.join('?' * len(FIELDS))})", [tuple(entry[field] for field in FIELDS) for entry in entries])
+            self._connection.executemany("INSERT OR REPLACE INTO directories VALUES (?, ?)", mtimes)
+            self._connection.execute("COMMIT")
+
+    def remove(self, folder : str):
+        """
+        Forget a folder
+        """
+        folder = os.path.abspath(folder)
+        with self._lock:
+            self._connection.execute("DELETE FROM entries WHERE folder = ?", (folder,))
+            self._connection.execute("DELETE FROM directories WHERE path = ?", (folder,))
+
+    def free_folder(self, base_path : str, folder_name : str) -> str:
+        """
+        First folder name of the form <folder_name>_<n> (n from 2) neither indexed nor existing in the library
+        """
+        number = 2
+        while True:
+            candidate = f"{folder_name}_{number}"
+            folder = os.path.join(os.path.abspath(base_path), candidate)
+            if not os.path.exists(folder) and self.entry(folder) is None:
+                return candidate
+            number += 1
+
+    def _read_folder(self, folder : str) -> dict[str, any]:
+        """
+        Entry of a library folder, from its NFO and its largest other file, None if it holds no NFO
+        """
+        nfo = None
+        media = None
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks = False):
+                    continue
+                if entry.name.endswith(".nfo"):
+                    nfo = nfo or entry.path
+                elif not entry.name.startswith(".") and (media is None or entry.stat().st_size > media.stat().st_size):
+                    media = entry
+        fields = read_nfo(nfo) if nfo else None
+        if fields is None:
+            return None
+        previous = self.entry(folder)
+        same_file = previous is not None and media is not None and (previous["file"], previous["size"], previous["mtime_ns"]) == (media.name, media.stat().st_size, media.stat().st_mtime_ns)
+        return {
+            "folder":folder,
+            **fields,
+            "file":media.name if media else None,
+            "size":media.stat().st_size if media else None,
+            "mtime_ns":media.stat().st_mtime_ns if media else None,
+            "checksum":previous["checksum"] if same_file else None,
+            "added":previous["added"] if previous else time.time(),
+        }
+
+    def rescan(self, base_path : str) -> dict[str, int]:
+        """
+        Bring the entries of a library up to date : the library folder is only listed if its modification time
+        changed, and only the movie folders whose modification time changed (or new ones) are read, the others
+        cost a stat() each
+        Returns the number of folders checked, read, and removed from the index
+        """
+        base_path = os.path.abspath(base_path)
+        # Folders directly in the library, "_" and "%" being wildcards of LIKE :
+        inside = base_path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + os.sep + "%"
+        with self._lock:
+            known = dict(self._connection.execute("SELECT path, mtime_ns FROM directories WHERE path LIKE ? ESCAPE '\\'", (inside,)).fetchall())
+            indexed = {row[0] for row in self._connection.execute("SELECT folder FROM entries WHERE folder LIKE ? ESCAPE '\\'", (inside,))}
+        base_mtime = os.stat(base_path).st_mtime_ns
+        folders = set(known) | indexed
+        if self._directory_mtime(base_path) != base_mtime:
+            folders = {entry.path for entry in os.scandir(base_path) if entry.is_dir(follow_symlinks = False)}
+        counts = {"checked":len(folders), "read":0, "removed":0}
+
+        entries = []
+        directories = [base_path]
+        removed = (set(known) | indexed) - folders
+        for folder in folders:
+            try:
+                mtime = os.stat(folder).st_mtime_ns
+            except FileNotFoundError:
+                removed.add(folder)
+                continue
+            if known.get(folder) == mtime and folder in indexed:
+                continue
+            counts["read"] += 1
+            entry = self._read_folder(folder)
+            if entry is None:
+                removed.add(folder)
+            else:
+                entries.append(entry)
+                directories.append(folder)
+        for folder in removed:
+            self.remove(folder)
+        counts["removed"] = len(removed)
+        self._store(entries, directories)
+        return counts
+
+    def _directory_mtime(self, path : str) -> int:
+        """
+        Modification time of a directory when it was last indexed, None if it never was
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT mtime_ns FROM directories WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def counts(self) -> dict[str, int]:
+        """
+        Number of indexed folders and of distinct movies
+        """
+        with self._lock:
+            folders, movies = self._connection.execute("SELECT COUNT(*), COUNT(DISTINCT kind || COALESCE(tmdb_id, imdb_id, folder)) FROM entries").fetchone()
+        return {"folders":folders, "movies":movies}
+
+    def close(self):
+        """
+        Close the index
+        """
+        with self._lock:
+            self._connection.close()
+
+# Command line :
+if __name__ == "__main__":
+    with open("config.json") as config_file:
+        config = json.load(config_file)
+    parser = argparse.ArgumentParser(description = "Rescan the library index, or look movies up in it")
+    parser.add_argument("--index", default = config["library"]["index"], help = "index path (default: config.json library.index)")
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+    rescan_parser = subparsers.add_parser("rescan", help = "bring the index up to date with the library folder")
+    rescan_parser.add_argument("base_path", nargs = "?", default = config["paths"]["library"], help = "library folder (default: config.json paths.library)")
+    find_parser = subparsers.add_parser("find", help = "entries of links or IDs (tt0133093, https://www.themoviedb.org/movie/603...)")
+    find_parser.add_argument("links", nargs = "+")
+    arguments = parser.parse_args()
+
+    index = LibraryIndex(arguments.index)
+    if arguments.command == "rescan":
+        start = time.monotonic()
+        counts = index.rescan(arguments.base_path)
+        print(f"{counts['checked']} folders checked, {counts['read']} read, {counts['removed']} removed in {time.monotonic() - start:.3f} s, {index.counts()['folders']} indexed")
+    else:
+        for link in arguments.links:
+            id_type, movie_id = parse_link(link)
+            print(json.dumps({"link":link, "entries":index.find(id_type, movie_id) if movie_id else []}, ensure_ascii = False))
+    index.close()
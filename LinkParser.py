@@ -0,0 +1,67 @@
+# LinkParser.py
+
+# Extraction of IMDB and TMDB IDs from links, in a single pass of one precompiled pattern :
+# - IMDB : any tt ID, bare (tt0133093) or in any imdb.com link (www., m., locale prefixes, /reference...)
+# - TMDB : themoviedb.org or tmdb.org links to a movie or a TV show, with or without a language prefix
+#   (/fr/movie/603), query string or slug (/movie/603-the-matrix)
+# The first ID of a link wins, and IDs come out as ("imdb", "tt0133093"), ("tmdb", "603") or ("tmdb_tv", "1399")
+
+# Library imports :
+import argparse
+import json
+import re
+import sys
+
+# Both kinds of IDs start with a "t" (tt0133093, themoviedb.org, tmdb.org), the pattern starts with it so
+# that the search skips to the next "t" before trying anything, the IMDB group holds the ID without it :
+LINK = re.compile(
+    r"t(?:(?<![0-9A-Za-z]t)(t\d{7,})(?!\d)"
+    r"|(?:hemoviedb|mdb)\.org/(?:[a-z]{2}(?:-[A-Za-z]{2})?/)?(movie|tv)/(\d+))"
+)
+
+# id type of the TMDB link kinds :
+TMDB_KINDS = {"movie":"tmdb", "tv":"tmdb_tv"}
+
+def parse_link(link : str) -> tuple[str, str]:
+    """
+    (id type, ID) of a link, (None, None) if it holds no IMDB/TMDB ID
+    """
+    match = LINK.search(link)
+    if match is None:
+        return None, None
+    imdb_id, kind, tmdb_id = match.groups()
+    if imdb_id:
+        return "imdb", "t" + imdb_id
+    return TMDB_KINDS[kind], tmdb_id
+
+def extract_ids(links):
+    """
+    Parse many links lazily, yielding one (link, id type, ID) tuple per link, in order (see parse_link())
+    links : any iterable of strings, such as a list, text.splitlines() or the lines of a file
+    """
+    search = LINK.search
+    for link in links:
+        match = search(link)
+        if match is None:
+            yield link, None, None
+            continue
+        imdb_id, kind, tmdb_id = match.groups()
+        if imdb_id:
+            yield link, "imdb", "t" + imdb_id
+        else:
+            yield link, TMDB_KINDS[kind], tmdb_id
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Extract the IMDB/TMDB IDs of links, one per line, as JSON Lines")
+    parser.add_argument("files", nargs = "*", help = "files of links, standard input if none")
+    arguments = parser.parse_args()
+
+    def lines():
+        for path in arguments.files or ["-"]:
+            with (open(path, encoding = "utf-8") if path != "-" else sys.stdin) as links_file:
+                for line in links_file:
+                    if line.strip():
+                        yield line.strip()
+
+    for link, id_type, movie_id in extract_ids(lines()):
+        print(json.dumps({"link":link, "id_type":id_type, "id":movie_id}))
@@ -0,0 +1,170 @@
+# LogCollector.py
+
+# Library imports :
+import datetime
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+
+# Module imports :
+from LogWriter import LogWriter
+
+# Messages are length-prefixed JSON arrays : [log type, resolved arguments, ISO 8601 timestamp]
+# A null log type is a flush request, its arguments are the ones of LogWriter.flush()
+HEADER = struct.Struct("!I")
+
+def encode_entry(log_type : str, args : dict, moment : datetime.datetime) -> bytes:
+    """
+    Serialize an entry for the collector socket
+    """
+    data = json.dumps([log_type, args, moment.isoformat()], ensure_ascii = False).encode("utf-8")
+    return HEADER.pack(len(data)) + data
+
+class LogCollector:
+    """
+    Local Unix socket server that receives entries from LogClient producers (other processes) and
+    writes them through a single LogWriter, which numbers them in the order they arrive
+    """
+    def __init__(self, logger : LogWriter, socket_path : str):
+        """
+        Bind the socket, replacing a stale one left by a previous collector
+        """
+        self.logger = logger
+        self.socket_path = socket_path
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        collector = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while header := self.rfile.read(HEADER.size):
+                    if len(header) < HEADER.size:
+                        return
+                    data = self.rfile.read(HEADER.unpack(header)[0])
+                    log_type, args, timestamp = json.loads(data)
+                    if log_type is None:
+                        collector.logger.flush(**args)
+                        continue
+                    collector.logger.submit(log_type, args, datetime.datetime.fromisoformat(timestamp))
+
+        self.server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+        self._thread = None
+
+    def start(self):
+        """
+        Serve producers from a background thread
+        """
+        self._thread = threading.Thread(target = self.server.serve_forever, name = "LogCollector", daemon = True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop serving, wait for connected producers to disconnect, remove the socket and drain the logger
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.logger.drain()
+
+class LogClient(LogWriter):
+    """
+    LogWriter that streams its entries to a LogCollector instead of writing files : levels, invoker capture
+    and deferred arguments work the same, numbering and storage are done by the collector
+    """
+    def __init__(self, socket_path : str, queued = False, batch_size = 64, flush_interval = 0.5, max_queue_size = 10000, overflow_policy = "block", minimum_level = None):
+        """
+        Connect to the collector
+        """
+        self.log_file = None
+        self.socket_path = socket_path
+        self.shared = False
+        self.entry_number = None
+        self.error_number = None
+        self._load_config(minimum_level)
+        self._socket = None
+        self._connect()
+        self._start_writer(queued, batch_size, flush_interval, max_queue_size, overflow_policy)
+
+    def _connect(self):
+        """
+        (Re)open the connection to the collector
+        """
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(self.socket_path)
+
+    def _emit(self, entries):
+        """
+        Send entries to the collector in a single write
+        """
+        self._send(b"".join(encode_entry(*entry) for entry in entries))
+
+    def _send(self, data : bytes):
+        """
+        Send messages to the collector, reconnecting once if the connection was lost
+        """
+        if self._socket is None: # closed, or a previous send failed twice
+            self._connect()
+        try:
+            self._socket.sendall(data)
+        except OSError:
+            self._connect()
+            self._socket.sendall(data)
+
+    def _flush_buffers(self):
+        """
+        Nothing is buffered on the producer side
+        """
+
+    def _close_sinks(self):
+        """
+        Close the connection, entries written after close() open a new one
+        """
+        self._socket.close()
+        self._socket = None
+
+    def flush(self, number_of_entries = 0, inverse = False):
+        """
+        Ask the collector to flush the log (see LogWriter.flush()), after the entries written before
+        The request is sent without waiting for the collector to carry it out
+        """
+        self.drain() # queued entries must reach the collector before the request
+        with self._lock:
+            self._send(encode_entry(None, {"number_of_entries":number_of_entries, "inverse":inverse}, datetime.datetime.now()))
+
+def open_logger(log_file : str = "log.txt", queued : bool = False) -> LogWriter:
+    """
+    Logger of a program writing to the log other programs write to : a LogClient of the collector whose socket
+    is config.json["log"]["collector"] if it is set and the collector runs, otherwise a LogWriter of log_file
+    (shared when config.json["log"]["shared"] is, or when the collector can't be reached)
+    """
+    with open("config.json") as config_file:
+        socket_path = json.load(config_file)["log"].get("collector")
+    if socket_path:
+        try:
+            return LogClient(socket_path, queued = queued)
+        except OSError:
+            return LogWriter(log_file, queued = queued, shared = True)
+    return LogWriter(log_file, queued = queued)
+
+# Run a collector :
+if __name__ == "__main__":
+    with open("config.json") as config_file:
+        config = json.load(config_file)
+    socket_path = sys.argv[1] if len(sys.argv) > 1 else config["log"].get("collector") or "centaurus-log.sock"
+    collector = LogCollector(LogWriter("log.txt", queued = True), socket_path)
+    collector.start()
+    print(f"Collecting log entries on {socket_path}, Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.stop()
+        collector.logger.close()
@@ -0,0 +1,328 @@
+# LogSegments.py
+
+# Library imports :
+import bisect
+import os
+import re
+import struct
+import threading
+
+# Header line of every entry, used to rebuild the index of a segment from its text :
+ENTRY_PATTERN = re.compile(rb"^entry (\d+) :$", re.MULTILINE)
+
+class LogSegments:
+    """
+    Storage of a log as numbered segment files with an offset index :
+    - the active segment is the log file itself (e.g. log.txt), entries are appended to it
+    - once it reaches `max_segment_bytes` or `max_segment_entries`, it is renamed to log.txt.<n>,
+      n increasing with age (log.txt.1 is the oldest), and a new active segment is started
+    - every segment has an index (log.txt.idx, log.txt.<n>.idx) of fixed size (entry number, byte offset)
+      records, so entries can be counted and located without reading the log
+    Dropping entries deletes whole segments, plus truncating or rewriting a single (bounded) segment
+    """
+    _RECORD = struct.Struct("<QQ")
+
+    def __init__(self, path : str, max_segment_bytes : int = 10 << 20, max_segment_entries : int = 0, max_segments : int = 0, buffering : int = 1 << 20):
+        """
+        Open the active segment, repairing its index if the last run didn't record every entry
+        max_segment_bytes / max_segment_entries : rotation thresholds, 0 to disable
+        max_segments : number of rotated segments to keep, the oldest are deleted beyond that, 0 to keep all
+        """
+        self.path = path
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_entries = max_segment_entries
+        self.max_segments = max_segments
+        self.buffering = buffering
+        self._lock = threading.RLock()
+        self.segment_ids = self._scan_segment_ids()
+        self._file = None
+        self._index = None
+        self._open_active()
+
+    def _scan_segment_ids(self) -> list[int]:
+        """
+        List the ids of the rotated segments on disk, oldest first
+        """
+        directory, name = os.path.split(os.path.abspath(self.path))
+        pattern = re.compile(re.escape(name) + r"\.(\d+)")
+        return sorted(int(match.group(1)) for match in map(pattern.fullmatch, os.listdir(directory)) if match)
+
+    def refresh(self):
+        """
+        Catch up with changes made by other processes sharing the log (to call while holding their common lock) :
+        reopen the active segment if it was rotated or replaced, otherwise re-read its size and number of entries
+        (the list of rotated segments is re-read by the operations that use it)
+        """
+        with self._lock:
+            try:
+                replaced = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+            except FileNotFoundError:
+                replaced = True
+            if replaced:
+                self._close_active()
+                self.segment_ids = self._scan_segment_ids()
+                self._open_active()
+            else:
+                self._file.flush()
+                self._index.flush()
+                self._size = os.fstat(self._file.fileno()).st_size
+                self._entries = os.fstat(self._index.fileno()).st_size // self._RECORD.size
+
+    def segment_path(self, segment_id : int = None) -> str:
+        """
+        Path of a rotated segment, or of the active one when `segment_id` is None
+        """
+        return self.path if segment_id is None else f"{self.path}.{segment_id}"
+
+    def _open_active(self):
+        """
+        Open the active segment and its index for appending
+        """
+        self._file = open(self.path, 'ab', buffering = self.buffering)
+        self._index = open(f"{self.path}.idx", 'ab', buffering = self.buffering)
+        self._size = self._file.seek(0, os.SEEK_END)
+        self._repair_index()
+        self._entries = self._index.seek(0, os.SEEK_END) // self._RECORD.size
+
+    def _close_active(self):
+        """
+        Flush and close the active segment and its index
+        """
+        self._file.close()
+        self._index.close()
+
+    def _read_index(self, segment_id : int = None) -> list[tuple[int, int]]:
+        """
+        Read the (entry number, offset) records of a segment
+        """
+        try:
+            with open(f"{self.segment_path(segment_id)}.idx", 'rb') as index:
+                data = index.read()
+        except FileNotFoundError:
+            return []
+        return list(self._RECORD.iter_unpack(data[:len(data) - len(data) % self._RECORD.size]))
+
+    def _repair_index(self, chunk_size : int = 1 << 20):
+        """
+        Make the active index match its segment : drop records pointing past the end of the text, and index
+        entries written after the last record (legacy log files, or a crash between the two writes)
+        """
+        records = self._read_index()
+        valid = len(records)
+        while valid and records[valid - 1][1] >= self._size:
+            valid -= 1
+        if self._index.seek(0, os.SEEK_END) != valid * self._RECORD.size: # stale records or a torn last record
+            self._index.truncate(valid * self._RECORD.size)
+        # Scan the text after the last indexed entry, line by line through fixed size chunks :
+        position = records[valid - 1][1] + 1 if valid else 0
+        carry = b""
+        with open(self.path, 'rb') as file:
+            file.seek(position)
+            while chunk := file.read(chunk_size):
+                data = carry + chunk
+                end = data.rfind(b"\n") + 1 # only look at complete lines
+                self._index.write(b"".join(self._RECORD.pack(int(match.group(1)), position + match.start()) for match in ENTRY_PATTERN.finditer(data, 0, end)))
+                position += end
+                carry = data[end:]
+        self._index.flush()
+
+    def append(self, entry_number : int, text : str):
+        """
+        Append an entry to the active segment, rotating first if it is full
+        """
+        data = text.encode("utf-8")
+        with self._lock:
+            if self._entries and ((self.max_segment_bytes and self._size + len(data) > self.max_segment_bytes) or (self.max_segment_entries and self._entries >= self.max_segment_entries)):
+                self.rotate()
+            self._file.write(data)
+            self._index.write(self._RECORD.pack(entry_number, self._size))
+            self._size += len(data)
+            self._entries += 1
+
+    def flush_buffers(self):
+        """
+        Push buffered entries and index records to the operating system
+        """
+        with self._lock:
+            # Text first, so that the index never points to missing text :
+            self._file.flush()
+            self._index.flush()
+
+    def rotate(self):
+        """
+        Turn the active segment into the newest rotated one and start a new active segment
+        """
+        with self._lock:
+            self.segment_ids = self._scan_segment_ids()
+            self._close_active()
+            segment_id = self.segment_ids[-1] + 1 if self.segment_ids else 1
+            os.replace(f"{self.path}.idx", f"{self.segment_path(segment_id)}.idx")
+            os.replace(self.path, self.segment_path(segment_id))
+            self.segment_ids.append(segment_id)
+            while self.max_segments and len(self.segment_ids) > self.max_segments:
+                self._delete_segment(self.segment_ids.pop(0))
+            self._open_active()
+
+    def _delete_segment(self, segment_id : int):
+        """
+        Delete a rotated segment and its index
+        """
+        for path in (self.segment_path(segment_id), f"{self.segment_path(segment_id)}.idx"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _segment_entries(self, segment_id : int = None) -> int:
+        """
+        Number of entries of a segment, from the size of its index
+        """
+        if segment_id is None:
+            return self._entries
+        try:
+            return os.path.getsize(f"{self.segment_path(segment_id)}.idx") // self._RECORD.size
+        except FileNotFoundError:
+            return 0
+
+    def count(self) -> int:
+        """
+        Total number of entries over every segment
+        """
+        with self._lock:
+            self.segment_ids = self._scan_segment_ids()
+            return self._entries + sum(self._segment_entries(segment_id) for segment_id in self.segment_ids)
+
+    def last_entry_number(self) -> int:
+        """
+        Number of the newest entry, 0 if the log is empty
+        """
+        with self._lock:
+            self.segment_ids = self._scan_segment_ids()
+            self.flush_buffers()
+            for segment_id in [None] + self.segment_ids[::-1]:
+                records = self._read_index(segment_id)
+                if records:
+                    return records[-1][0]
+        return 0
+
+    def locate(self, entry_number : int) -> tuple[str, int]:
+        """
+        Find the segment file and byte offset of an entry, (None, None) if it isn't in the log anymore
+        """
+        with self._lock:
+            self.segment_ids = self._scan_segment_ids()
+            self.flush_buffers()
+            for segment_id in [None] + self.segment_ids[::-1]:
+                records = self._read_index(segment_id)
+                if records and records[0][0] <= entry_number:
+                    # Entry numbers increase within a segment :
+                    index = bisect.bisect_left(records, (entry_number, 0))
+                    if index < len(records) and records[index][0] == entry_number:
+                        return self.segment_path(segment_id), records[index][1]
+                    break
+        return None, None
+
+    def clear(self):
+        """
+        Delete every entry
+        """
+        with self._lock:
+            self.segment_ids = self._scan_segment_ids()
+            for segment_id in self.segment_ids:
+                self._delete_segment(segment_id)
+            self.segment_ids = []
+            self._close_active()
+            open(self.path, 'wb').close()
+            open(f"{self.path}.idx", 'wb').close()
+            self._open_active()
+
+    def drop_newest(self, number_of_entries : int):
+        """
+        Delete the newest entries : whole segments, then a single truncate
+        """
+        with self._lock:
+            self.segment_ids = self._scan_segment_ids()
+            self.flush_buffers()
+            remaining = number_of_entries
+            # The active segment goes first, it is emptied rather than deleted :
+            if remaining >= self._entries:
+                remaining -= self._entries
+                self._truncate_segment(None, 0)
+            else:
+                self._truncate_segment(None, self._entries - remaining)
+                return
+            while remaining and self.segment_ids:
+                segment_id = self.segment_ids[-1]
+                entries = self._segment_entries(segment_id)
+                if remaining >= entries:
+                    remaining -= entries
+                    self._delete_segment(self.segment_ids.pop())
+                else:
+                    self._truncate_segment(segment_id, entries - remaining)
+                    return
+
+    def _truncate_segment(self, segment_id : int, keep : int):
+        """
+        Keep only the first `keep` entries of a segment
+        """
+        records = self._read_index(segment_id)
+        offset = records[keep][1] if keep < len(records) else None
+        if offset is None:
+            return
+        if segment_id is None:
+            self._file.truncate(offset)
+            self._index.truncate(keep * self._RECORD.size)
+            self._size = offset
+            self._entries = keep
+        else:
+            os.truncate(self.segment_path(segment_id), offset)
+            os.truncate(f"{self.segment_path(segment_id)}.idx", keep * self._RECORD.size)
+
+    def drop_oldest(self, number_of_entries : int):
+        """
+        Delete the oldest entries : whole segments, then rewriting the remainder of at most one segment
+        """
+        with self._lock:
+            self.segment_ids = self._scan_segment_ids()
+            self.flush_buffers()
+            remaining = number_of_entries
+            while remaining and self.segment_ids:
+                segment_id = self.segment_ids[0]
+                entries = self._segment_entries(segment_id)
+                if remaining >= entries:
+                    remaining -= entries
+                    self._delete_segment(self.segment_ids.pop(0))
+                else:
+                    self._drop_segment_head(segment_id, remaining)
+                    return
+            if remaining >= self._entries:
+                self._truncate_segment(None, 0)
+            elif remaining:
+                self._close_active()
+                self._drop_segment_head(None, remaining)
+                self._open_active()
+
+    def _drop_segment_head(self, segment_id : int, number_of_entries : int):
+        """
+        Remove the first entries of a segment by copying the rest into a new file, shifting the index offsets
+        """
+        path = self.segment_path(segment_id)
+        records = self._read_index(segment_id)[number_of_entries:]
+        start = records[0][1]
+        with open(path, 'rb') as source, open(f"{path}.tmp", 'wb') as destination:
+            source.seek(start)
+            while chunk := source.read(1 << 20):
+                destination.write(chunk)
+        with open(f"{path}.idx.tmp", 'wb') as index:
+            index.write(b"".join(self._RECORD.pack(number, offset - start) for number, offset in records))
+        os.replace(f"{path}.tmp", path)
+        os.replace(f"{path}.idx.tmp", f"{path}.idx")
+
+    def close(self):
+        """
+        Flush and close the active segment
+        """
+        with self._lock:
+            if self._file is not None:
+                self._close_active()
+                self._file = None
@@ -1,110 +1,557 @@
+import atexit
+import contextlib
 import datetime
+import fcntl
 import json
 import os
-import re
+import queue
+import struct
+import sys
+import threading
+import time
+
+# Module imports :
+from JsonLog import JsonLogSink
+from LogSegments import LogSegments
+
+# Overflow policies for the queued writer, applied when the queue is full :
+OVERFLOW_POLICIES = ("block", "drop_newest", "drop_oldest")
+# Sentinel asking the background writer to stop :
+_STOP = object()
+# Fields of config.json["log"]["types"] that the writer fills with the invoker of the logging code when not provided :
+INVOKER_FIELDS = frozenset(("invoker", "raised by", "triggered by"))
+
+class Deferred:
+    """
+    Log argument computed only if the entry is actually written : Deferred(function, *args, **kwargs)
+    Any zero-argument callable passed as an argument value is deferred the same way
+    """
+    __slots__ = ("function", "args", "kwargs")
+
+    def __init__(self, function, *args, **kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def __call__(self):
+        return self.function(*self.args, **self.kwargs)
+
+class Invoker:
+    """
+    Record of the code that wrote a log entry : the file and instance of the logging function and the
+    function that called it. Only names and a reference to the instance are taken from the frame, the
+    strings are built when the entry is formatted
+    """
+    __slots__ = ("file", "instance", "function", "called_by")
+
+    def __init__(self, frame):
+        """
+        Capture the invoker from the frame of the logging function
+        """
+        code = frame.f_code
+        self.file = code.co_filename
+        self.function = code.co_name
+        # Only methods have an instance, avoid building f_locals for everything else :
+        self.instance = frame.f_locals.get("self") if code.co_argcount and code.co_varnames[0] == "self" else None
+        caller = frame.f_back
+        self.called_by = caller.f_code.co_name if caller is not None else None
+
+    @classmethod
+    def capture(cls, depth : int = 1) -> "Invoker":
+        """
+        Capture the invoker of the function `depth` levels above the caller of this method
+        (depth = 1 means the function calling capture() is the one writing to the log)
+        """
+        return cls(sys._getframe(depth))
+
+    def as_dict(self) -> dict[str, str]:
+        """
+        Format the invoker the same way log entries always described it
+        """
+        invoker = {"file":os.path.basename(self.file)}
+        if self.function == "<module>": # module level code has no instance nor meaningful caller
+            return invoker
+        invoker["instance"] = f"{self.instance}"
+        invoker["called by"] = f"{self.called_by}"
+        return invoker
+
+
+class LogCounters:
+    """
+    Entry and error counters of a log file, stored as two unsigned 64 bits integers in a small
+    sidecar file that is checkpointed in place every `checkpoint_interval` increments
+    """
+    _RECORD = struct.Struct("<QQ")
+
+    def __init__(self, path : str, checkpoint_interval : int = 100, seed : tuple[int, int] = (0, 0)):
+        """
+        Open (or create, starting from `seed`) the counter file
+        """
+        self.path = path
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        data = os.pread(self._fd, self._RECORD.size, 0)
+        if len(data) == self._RECORD.size:
+            self.entry_number, self.error_number = self._RECORD.unpack(data)
+        else: # new (or torn) counter file
+            self.entry_number, self.error_number = seed
+            self.checkpoint()
+        self._since_checkpoint = 0
+
+    def increment(self, is_error : bool = False):
+        """
+        Bump the counters, writing a checkpoint once every `checkpoint_interval` calls
+        """
+        self.entry_number += 1
+        if is_error:
+            self.error_number += 1
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def reload(self):
+        """
+        Read the counters back from the file, after another process may have changed them
+        """
+        data = os.pread(self._fd, self._RECORD.size, 0)
+        if len(data) == self._RECORD.size:
+            self.entry_number, self.error_number = self._RECORD.unpack(data)
+
+    def lock(self):
+        """
+        Take the exclusive inter-process lock on the counter file (blocking)
+        """
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def unlock(self):
+        """
+        Release the inter-process lock
+        """
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def checkpoint(self):
+        """
+        Persist the current counters (a single 16 bytes positional write)
+        """
+        os.pwrite(self._fd, self._RECORD.pack(self.entry_number, self.error_number), 0)
+        self._since_checkpoint = 0
+
+    def close(self):
+        """
+        Write a last checkpoint and close the counter file
+        """
+        if self._fd is not None:
+            self.checkpoint()
+            os.close(self._fd)
+            self._fd = None
 
 class LogWriter:
-    def __init__(self, log_file):
+    def __init__(self, log_file, queued = False, batch_size = 64, flush_interval = 0.5, max_queue_size = 10000, overflow_policy = "block", checkpoint_interval = 100, minimum_level = None, max_segment_bytes = 10 << 20, max_segment_entries = 0, max_segments = 0, jsonl_file = None, shared = None):
         """
         Initialize the log file and entry/error numbers
+        queued : hand entries to a background thread that keeps the log file open and flushes it in batches
+        batch_size / flush_interval : the queued writer flushes after this many entries or this many seconds, whichever comes first
+        max_queue_size / overflow_policy : bound of the queue and what to do when it is full ("block", "drop_newest" or "drop_oldest")
+        checkpoint_interval : number of entries between two writes of the counter file (<log_file>.counters)
+        minimum_level : entries whose type has a lower level in config.json["log"]["levels"] are skipped,
+        defaults to config.json["log"]["minimum_level"]
+        max_segment_bytes / max_segment_entries / max_segments : rotation of the log into numbered segments (see LogSegments)
+        jsonl_file : also write every entry as one JSON object per line to this file, indexed for JsonLog.py queries
+        (it isn't rotated nor affected by flush())
+        shared : several processes write to the same log, entries (or batches of entries, when queued) are numbered
+        and appended while holding a lock on the counter file, then flushed before releasing it, defaults to
+        config.json["log"]["shared"]
         """
         self.log_file = log_file
+        self._load_config(minimum_level)
+
+        # Entry/error counters, seeded from config.json for logs created before the counter file existed :
+        self.shared = self.config["log"].get("shared", False) if shared is None else shared
+        seed = (self.config["log"].get("entry_number", 0), self.config["log"].get("error_number", 0))
+        self.counters = LogCounters(f"{log_file}.counters", checkpoint_interval, seed)
+
+        # Segmented log file, opened (and its index repaired) without any other writer in between when shared :
+        if self.shared:
+            self.counters.lock()
+        try:
+            self.segments = LogSegments(log_file, max_segment_bytes, max_segment_entries, max_segments)
+            self.json_sink = JsonLogSink(jsonl_file) if jsonl_file else None
+            self.counters.reload()
+            # A crash can lose the increments made since the last checkpoint, the log index knows better :
+            last_entry_number = self.segments.last_entry_number()
+            if last_entry_number > self.counters.entry_number:
+                self.counters.entry_number = last_entry_number
+                self.counters.checkpoint()
+        finally:
+            if self.shared:
+                self.counters.unlock()
+        self.entry_number = self.counters.entry_number
+        self.error_number = self.counters.error_number
+
+        self._start_writer(queued, batch_size, flush_interval, max_queue_size, overflow_policy)
+
+    def _load_config(self, minimum_level):
+        """
+        Load config.json and the log levels
+        """
         with open("config.json") as config_file:
             self.config = json.load(config_file)
-        self.entry_number = self.config["log"]["entry_number"]
-        self.error_number = self.config["log"]["error_number"]
+        self.levels = self.config["log"].get("levels", {})
+        self.set_minimum_level(self.config["log"].get("minimum_level", 0) if minimum_level is None else minimum_level)
 
-    def _get_timestamp(self):
+    def _start_writer(self, queued, batch_size, flush_interval, max_queue_size, overflow_policy):
         """
-        Get the current timestamp in ISO 8601 format with timezone info
+        Set up the synchronous writer, or the queue and background thread of the queued one
         """
-        return datetime.datetime.now(datetime.timezone.utc).isoformat()
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow_policy!r}, expected one of {OVERFLOW_POLICIES}")
+        self.queued = queued
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.dropped_entries = 0
+        self.failed_entries = 0 # entries the background writer could not write (full disk...)
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._closed = False
+        if self.queued:
+            self._queue = queue.Queue(maxsize = max_queue_size)
+            self._worker = threading.Thread(target = self._worker_loop, name = "LogWriter", daemon = True)
+            self._worker.start()
+        # Make sure queued entries and counters reach the disk when the interpreter exits :
+        atexit.register(self.close)
+
+    @contextlib.contextmanager
+    def _process_lock(self):
+        """
+        Hold the inter-process lock of a shared log, with every file re-synchronized with the other writers
+        (no-op for a log owned by this process)
+        """
+        if not self.shared:
+            yield
+            return
+        self.counters.lock()
+        try:
+            self.counters.reload()
+            self.segments.refresh()
+            if self.json_sink is not None:
+                self.json_sink.refresh()
+            yield
+            # Nothing buffered may outlive the lock :
+            self.counters.checkpoint()
+            self._flush_buffers()
+        finally:
+            self.counters.unlock()
+
+    def set_minimum_level(self, level):
+        """
+        Set the minimum level of written entries, either as a number or as the name of a log type
+        """
+        self.minimum_level = self.levels[level] if isinstance(level, str) else level
+        # Types written at this level, unknown types are always written :
+        self._disabled_types = frozenset(log_type for log_type, log_level in self.levels.items() if log_level < self.minimum_level)
+
+    def is_enabled(self, log_type) -> bool:
+        """
+        Check whether entries of this type are written, to skip building expensive arguments otherwise
+        """
+        return log_type not in self._disabled_types
 
     def _increment_entry_number(self, log_type):
         """
-        Increment the number of entries and errors in config.json and for the script
+        Increment the number of entries and errors in the counter file and for the script
         """
-        self.config["log"]["entry_number"] += 1
-        if log_type == "ERROR":
-            self.config["log"]["error_number"] += 1
-        with open("config.json", 'w') as config_file:
-            json.dump(self.config, config_file, indent=2)
-        self.entry_number = self.config["log"]["entry_number"]
-        self.error_number = self.config["log"]["error_number"]
+        self.counters.increment(log_type == "ERROR")
+        self.entry_number = self.counters.entry_number
+        self.error_number = self.counters.error_number
 
-    def _display_dict(self, d, indent=0, prefix=""):
+    def _display_dict(self, d, indent=0, prefix="", lines=None):
+        """
+        Render a (nested) dictionary as a tree, appending the lines to `lines` and returning it
+        """
+        if lines is None:
+            lines = []
         items = list(d.items())
-        with open(self.log_file, 'a') as file:
-            for index, (key, value) in enumerate(items):
-                is_last = index == len(items) - 1
-                # Adjusting connectors for nested dictionaries
-                if isinstance(value, dict):
-                    file.write(f"{prefix}{'└── ' if is_last else '├── '}{key} :\n")
-                    # Update prefix for nested items, maintaining connector lines
-                    new_prefix = prefix + ('    ' if is_last else '│   ')
-                    # Recursive call for nested dictionary with new prefix
-                    self._display_dict(value, indent + 1, new_prefix)
-                else:
-                    # Print key-value pair with proper connector
-                    file.write(f"{prefix}{'└── ' if is_last else '├── '}{key} : {value}\n")
-
-
-    def write(self, log_type, args):
+        for index, (key, value) in enumerate(items):
+            is_last = index == len(items) - 1
+            # Adjusting connectors for nested dictionaries
+            if isinstance(value, dict):
+                lines.append(f"{prefix}{'└── ' if is_last else '├── '}{key} :\n")
+                # Update prefix for nested items, maintaining connector lines
+                new_prefix = prefix + ('    ' if is_last else '│   ')
+                # Recursive call for nested dictionary with new prefix
+                self._display_dict(value, indent + 1, new_prefix, lines)
+            else:
+                # Print key-value pair with proper connector
+                lines.append(f"{prefix}{'└── ' if is_last else '├── '}{key} : {value}\n")
+        return lines
+
+    def _resolve(self, d):
+        """
+        Turn the arguments into a tree of strings : invokers formatted, deferred arguments evaluated
+        """
+        resolved = {}
+        for key, value in d.items():
+            if isinstance(value, Invoker):
+                value = value.as_dict()
+            elif callable(value) and not isinstance(value, type): # deferred argument
+                value = value()
+            resolved[key] = self._resolve(value) if isinstance(value, dict) else f"{value}"
+        return resolved
+
+    def _format_entry(self, log_type, args, moment):
+        """
+        Build the full text of a log entry, header and argument tree included, and its JSON record
+        (timestamp, type, JSON line) if there is a JSON Lines sink
+        """
+        # Timestamp in ISO 8601 format with timezone info :
+        timestamp = moment.isoformat()
+        lines = [
+            f"entry {self.entry_number} :\n",
+            f"├── timestamp : {timestamp}\n",
+            f"└── type : {log_type}\n",
+        ]
+        self._display_dict(args, 1, "    ", lines)
+        record = None
+        if self.json_sink is not None:
+            json_entry = {"entry":self.entry_number, "timestamp":timestamp, "type":log_type}
+            json_entry.update((key, value) for key, value in args.items() if key not in json_entry)
+            line = json.dumps(json_entry, ensure_ascii = False)
+            record = (moment.timestamp(), log_type, line)
+        return "".join(lines), record
+
+    def invoker(self, depth : int = 1) -> Invoker:
+        """
+        Capture the invoker of the calling function, to pass explicitly where the writer can't fill it in
+        """
+        return Invoker.capture(depth + 1)
+
+    def _complete_args(self, log_type, args, depth):
+        """
+        Order the arguments as specified in config.json and fill in the invoker fields that weren't provided
+        """
+        fields = self.config["log"]["types"].get(log_type, ())
+        if not any(field in INVOKER_FIELDS and field not in args for field in fields):
+            return args
+        invoker = Invoker.capture(depth + 1)
+        completed = {field:args[field] if field in args else invoker for field in fields if field in args or field in INVOKER_FIELDS}
+        # Keep arguments that config.json doesn't know about :
+        completed.update((key, value) for key, value in args.items() if key not in completed)
+        return completed
+
+    def write(self, log_type, args, depth = 1):
         """
         Write a prettified log entry of the specified type to the log file using config.json for argument specification
+        Invoker fields ("invoker", "raised by", "triggered by") are filled in automatically when missing,
+        describing the function `depth` levels above write() (1 = the function calling write())
+        Entries of a type below the minimum level are skipped before anything is computed, argument values
+        can be callables (or Deferred) to only build them for written entries
+        """
+        if log_type in self._disabled_types:
+            return
+        args = self._complete_args(log_type, args, depth + 1)
+        self.submit(log_type, self._resolve(args), datetime.datetime.now(datetime.timezone.utc))
+
+    def submit(self, log_type, args, moment):
+        """
+        Write an entry whose arguments are already resolved to strings, e.g. received by a LogCollector
+        """
+        entry = (log_type, args, moment)
+        if not self.queued or self._closed: # entries written after close() go straight to the file
+            with self._lock:
+                self._emit([entry])
+                self._flush_buffers()
+            return
+        self._enqueue(entry)
+
+    def _emit(self, entries):
+        """
+        Number, format and append entries, all under the same inter-process lock when the log is shared
+        """
+        with self._process_lock():
+            for log_type, args, moment in entries:
+                self._increment_entry_number(log_type)
+                text, record = self._format_entry(log_type, args, moment)
+                self.segments.append(self.entry_number, text)
+                if record is not None:
+                    self.json_sink.append(self.entry_number, *record)
+
+    def _flush_buffers(self):
+        """
+        Push the buffered entries of every sink to the operating system
+        """
+        self.segments.flush_buffers()
+        if self.json_sink is not None:
+            self.json_sink.flush_buffers()
+
+    def _enqueue(self, item):
+        """
+        Hand an item to the background writer, applying the overflow policy if the queue is full
         """
-        self._increment_entry_number(log_type)
-        with open(self.log_file, 'a') as file:
-            file.write(f"entry {self.entry_number} :\n")
-            file.write(f"├── timestamp : {self._get_timestamp()}\n")
-            file.write(f"└── type : {log_type}\n")
-        self._display_dict(args, 1, "    ")
+        if self.overflow_policy == "block":
+            self._put(item)
+            return
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                if self.overflow_policy == "drop_newest":
+                    self.dropped_entries += 1
+                    return
+            # drop_oldest : make room by discarding the oldest queued entry, then retry
+            try:
+                oldest = self._queue.get_nowait()
+            except queue.Empty:
+                continue
+            self._queue.task_done()
+            if isinstance(oldest, tuple):
+                self.dropped_entries += 1
+            else:
+                # Never drop control items (drain/close requests), requeue them instead :
+                self._put(oldest)
+
+    def _put(self, item):
+        """
+        Queue an item, waiting for room as long as the background writer runs
+        """
+        while True:
+            try:
+                self._queue.put(item, timeout = 0.1)
+                return
+            except queue.Full:
+                self._check_worker()
+
+    def _check_worker(self):
+        """
+        Raise if the background writer stopped, nothing would empty the queue anymore
+        """
+        if not self._worker.is_alive():
+            raise RuntimeError(f"The background writer of {self.log_file} stopped, queued entries can't be written")
+
+    def _report_failure(self, action : str, error : Exception):
+        """
+        Tell about an error of the background writer on stderr, the log itself may be what fails
+        """
+        sys.stderr.write(f"LogWriter could not {action} ({self.log_file}) : {error!r}\n")
+
+    def _worker_loop(self):
+        """
+        Background thread : write queued entries in batches through the open segment files, flushing by size or by time
+        """
+        pending = 0
+        deadline = None
+        while True:
+            # Take what is queued, up to a batch, stopping at drain/close requests :
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            batch = []
+            control = None
+            try:
+                item = self._queue.get(timeout = timeout)
+                while True:
+                    if not isinstance(item, tuple):
+                        control = item
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            # An error (full disk...) costs the batch, not the writer : drain() and close() still get answered
+            if batch:
+                try:
+                    with self._lock:
+                        self._emit(batch)
+                except Exception as error:
+                    self.failed_entries += len(batch)
+                    self._report_failure(f"write {len(batch)} entries", error)
+                pending += len(batch)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            # Flush when the batch is full, when it has waited long enough, or on a drain/close request :
+            if pending and (control is not None or pending >= self.batch_size or time.monotonic() >= deadline):
+                try:
+                    with self._lock:
+                        self._flush_buffers()
+                except Exception as error:
+                    self._report_failure("flush the log", error)
+                pending = 0
+                deadline = None
+            for _ in range(len(batch) + (control is not None)):
+                self._queue.task_done()
+            if isinstance(control, threading.Event):
+                control.set()
+            elif control is _STOP:
+                return
+
+    def drain(self):
+        """
+        Block until every queued entry has been written and flushed to the log file
+        Raises RuntimeError if the background writer stopped
+        """
+        if not self.queued or self._closed:
+            return
+        done = threading.Event()
+        self._put(done)
+        while not done.wait(0.1):
+            self._check_worker()
+
+    def close(self):
+        """
+        Drain the queue, stop the background writer and checkpoint the counters, no-op if already closed
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self.queued:
+            try:
+                self._check_worker()
+                self._put(_STOP)
+            except RuntimeError as error: # what the stopped writer left in the queue is lost
+                self._report_failure(f"write {self._queue.qsize()} queued entries", error)
+            self._worker.join()
+        with self._lock:
+            self._close_sinks()
+        atexit.unregister(self.close)
+
+    def _close_sinks(self):
+        """
+        Persist the counters and push the last buffered entries, the files stay open for entries written after close()
+        """
+        if not self.shared: # shared counters are written back under the lock, a late checkpoint could be stale
+            self.counters.checkpoint()
+        self._flush_buffers()
 
     def flush(self, number_of_entries = 0, inverse = False):
         """
         Flush the log file of a certain number of entries
         0 = all of them, by default
         inverse : by default, deletes oldest entries, but inverse makes it delete the newest ones
+        Only whole segments are deleted, plus at most one segment truncated (newest) or rewritten (oldest)
         """
-        if number_of_entries: # if the number of entries to delete is specified, flush the corresponding ones
-            with open(self.log_file, 'r') as log_file:
-                lines = log_file.readlines()
-                # Determine values for the for loop based on if we should loop in increasing or decreasing order :
-                (start, stop, step) = (len(lines) - 1, -1, -1) if inverse else (0, len(lines), 1)
-                # "Entry x :" where x is an int is the pattern to match to count the number of entries (to detect the number of lines to delete, which is inconsistent based on log type) :
-                pattern = r"Entry \d+ :"
-                number_of_entries_found = 0
-                number_of_entries_index = number_of_entries if inverse else number_of_entries + 1
-                # Find the line matching the pattern, starting from the end
-                for i in range(start, stop, step):
-                    if re.match(pattern, lines[i]):
-                        number_of_entries_found += 1
-                    if number_of_entries_found == number_of_entries_index:
-                        # If the pattern is found, truncate lines accordingly
-                        lines = lines[:i] if inverse else lines[i:]
-                        break
-                    if ((i == 0 and inverse) or (i == len(lines)-1 and (not inverse))):
-                        # If the list has been completely seen (meaning the number of entries was bigger than what was in the file), delete everything
-                        lines = []
-        else: # if it isn't specified, i.e. 0, then delete everything
-            lines = []
-        # Move to the beginning and write the modified lines back :
-        with open(self.log_file, 'w') as log_file:
-            log_file.seek(0)
-            log_file.writelines(lines)
-            log_file.truncate()  # Remove any leftover content
+        self.drain() # queued entries must be on disk before segments are touched
+        with self._lock, self._process_lock():
+            if not number_of_entries: # if it isn't specified, i.e. 0, then delete everything
+                self.segments.clear()
+            elif inverse:
+                self.segments.drop_newest(number_of_entries)
+            else:
+                self.segments.drop_oldest(number_of_entries)
 
 # Example usage
 if __name__ == "__main__":
     logger = LogWriter("log.txt")
     logger.write("DEBUG", {"message":"hey, LogWriter.py works !"})
 # Example of logging commands for every type of events (to copy paste from so that arguments are already written)
+# The invoker fields ("invoker", "raised by", "triggered by") are filled in by the writer
 """
-logger.write("COMMAND", {"command":"", "requires sudo":"", "invoker":"", "output (STDOUT stream)":"", "errors (STDERR Stream)":""})
+logger.write("COMMAND", {"command":"", "requires sudo":"", "output (STDOUT stream)":"", "errors (STDERR Stream)":""})
 logger.write("INFO", {"message":""})
 logger.write("DEBUG", {"message":""})
-logger.write("WARNING", {"message":"", "raised by":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}})
-logger.write("EVENT", {"event":"","triggered by":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
-logger.write("ACTION", {"action":"", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
-logger.write("ERROR", {"message":"", "raised by":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}", "running command":""}})
-"""
\ No newline at end of file
+logger.write("WARNING", {"message":""})
+logger.write("EVENT", {"event":"", "output":"0"})
+logger.write("ACTION", {"action":"", "output":"0"})
+logger.write("ERROR", {"message":"", "raised by":{**logger.invoker().as_dict(), "running command":""}})
+"""
@@ -0,0 +1,151 @@
+# MetadataCache.py
+
+# Library imports :
+import collections
+import json
+import sqlite3
+import threading
+import time
+
+class MetadataCache:
+    """
+    Two-tier cache of TMDB metadata : an in-memory LRU in front of an SQLite store
+    - movie data, keyed by (id type, id)
+    - IMDB -> TMDB "find" results, keyed by IMDB id, kept separately (and longer, they don't change)
+    Entries expire after their TTL, the store is trimmed (least recently used first) beyond `max_bytes`
+    """
+    def __init__(self, path : str = "metadata_cache.sqlite", memory_entries : int = 256, ttl : float = 7 * 86400, find_ttl : float = 30 * 86400, max_bytes : int = 64 << 20):
+        """
+        Open (or create) the store
+        """
+        self.path = path
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.find_ttl = find_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._memory = collections.OrderedDict() # key -> (stored at, data)
+        self._stats = {"memory_hits":0, "disk_hits":0, "misses":0, "expired":0, "memory_evictions":0, "disk_evictions":0}
+        self._connection = sqlite3.connect(path, check_same_thread = False, isolation_level = None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS entries (kind TEXT, id_type TEXT, id TEXT, data TEXT, size INTEGER, stored REAL, accessed REAL, PRIMARY KEY (kind, id_type, id))")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _get(self, key : tuple[str, str, str], ttl : float):
+        """
+        Look a key up in memory, then on disk, None on a miss or if the entry expired
+        """
+        now = time.time()
+        with self._lock:
+            if key in self._memory:
+                stored, data = self._memory[key]
+                if now - stored <= ttl:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return data
+                del self._memory[key]
+            row = self._connection.execute("SELECT data, stored FROM entries WHERE kind = ? AND id_type = ? AND id = ?", key).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            data, stored = row
+            if now - stored > ttl:
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._connection.execute("UPDATE entries SET accessed = ? WHERE kind = ? AND id_type = ? AND id = ?", (now, *key))
+            self._stats["disk_hits"] += 1
+            data = json.loads(data)
+            self._remember(key, stored, data)
+            return data
+
+    def _put(self, key : tuple[str, str, str], data):
+        """
+        Store an entry in both tiers, trimming the store if it grew too big
+        """
+        now = time.time()
+        serialized = json.dumps(data, ensure_ascii = False)
+        with self._lock:
+            self._remember(key, now, data)
+            previous = self._connection.execute("SELECT size FROM entries WHERE kind = ? AND id_type = ? AND id = ?", key).fetchone()
+            self._connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)", (*key, serialized, len(serialized), now, now))
+            self._size += len(serialized) - (previous[0] if previous else 0)
+            if self.max_bytes and self._size > self.max_bytes:
+                self._trim()
+
+    def _remember(self, key, stored, data):
+        """
+        Put an entry at the front of the memory LRU, evicting the least recently used one if it is full
+        """
+        self._memory[key] = (stored, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last = False)
+            self._stats["memory_evictions"] += 1
+
+    def _trim(self):
+        """
+        Delete the least recently accessed entries of the store until it fits in 3/4 of `max_bytes`
+        """
+        target = self.max_bytes * 3 // 4
+        rows = self._connection.execute("SELECT kind, id_type, id, size FROM entries ORDER BY accessed")
+        evicted = []
+        for kind, id_type, entry_id, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((kind, id_type, entry_id))
+            self._size -= size
+        rows.close()
+        self._connection.executemany("DELETE FROM entries WHERE kind = ? AND id_type = ? AND id = ?", evicted)
+        self._stats["disk_evictions"] += len(evicted)
+
+    def get(self, id_type : str, entry_id) -> dict:
+        """
+        Cached movie data of an ID, None on a miss
+        """
+        return self._get(("movie", id_type, str(entry_id)), self.ttl)
+
+    def put(self, id_type : str, entry_id, data : dict):
+        """
+        Cache the movie data of an ID
+        """
+        self._put(("movie", id_type, str(entry_id)), data)
+
+    def get_find(self, imdb_id : str) -> dict:
+        """
+        Cached TMDB "find" result of an IMDB id, None on a miss
+        """
+        return self._get(("find", "imdb", imdb_id), self.find_ttl)
+
+    def put_find(self, imdb_id : str, result : dict):
+        """
+        Cache the TMDB "find" result of an IMDB id
+        """
+        self._put(("find", "imdb", imdb_id), result)
+
+    def invalidate(self, id_type : str, entry_id):
+        """
+        Forget the movie data of an ID
+        """
+        key = ("movie", id_type, str(entry_id))
+        with self._lock:
+            self._memory.pop(key, None)
+            row = self._connection.execute("SELECT size FROM entries WHERE kind = ? AND id_type = ? AND id = ?", key).fetchone()
+            if row:
+                self._connection.execute("DELETE FROM entries WHERE kind = ? AND id_type = ? AND id = ?", key)
+                self._size -= row[0]
+
+    def stats(self) -> dict[str, int]:
+        """
+        Hit/miss/eviction counters since the cache was opened, with the current size of both tiers
+        """
+        with self._lock:
+            return {**self._stats, "memory_entries":len(self._memory), "disk_bytes":self._size}
+
+    def close(self):
+        """
+        Close the store
+        """
+        with self._lock:
+            self._connection.close()
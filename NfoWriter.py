@@ -0,0 +1,70 @@
+# NfoWriter.py
+
+# Direct writer of the .nfo files, in one pass over the movie data, with the exact bytes the previous
+# ElementTree -> string -> minidom -> toprettyxml -> splitlines pipeline produced :
+# - 4 spaces of indentation, one element per line, no XML declaration and no trailing newline
+# - empty elements written <tag/>
+# - text escaped as minidom escapes it (&, <, > and, depending on the Python version, ")
+# - line breaks normalized as an XML parser and str.splitlines() did : \r\n, \r, \x85, U+2028 and U+2029 become \n
+
+# Library imports :
+import io
+import re
+from xml.dom import minidom
+
+# Characters XML 1.0 can't carry, on which the previous pipeline failed :
+INVALID_CHARACTERS = re.compile("[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]")
+
+# Line breaks turned into \n, by the parser (\r\n, \r) or by splitlines() (the others) :
+LINE_BREAKS = re.compile("\r\n|[\r\x85\u2028\u2029]")
+
+# minidom escapes double quotes in text up to Python 3.12 only, follow the running version :
+ESCAPE_QUOTES = minidom.parseString('<a>"</a>').documentElement.toxml() != '<a>"</a>'
+
+def escape(text : str) -> str:
+    """
+    Escape and normalize the text of an element
+    """
+    invalid = INVALID_CHARACTERS.search(text)
+    if invalid:
+        raise ValueError(f"Character {invalid.group()!r} can't be written in an NFO")
+    text = LINE_BREAKS.sub("\n", text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;"))
+    return text.replace('"', "&quot;") if ESCAPE_QUOTES else text
+
+def nfo_fields(movie_data : dict[str, any]) -> list[tuple[str, str]]:
+    """
+    Elements of the NFO of a movie, in order, as (tag, text)
+    """
+    imdb_link = f"https://www.imdb.com/title/{movie_data.get('imdb_id')}" if movie_data.get("imdb_id") else ""
+    return [
+        ("title", movie_data.get("title", "Unknown Title")),
+        ("year", movie_data.get("release_date", "Unknown Year").split("-")[0]),
+        ("plot", movie_data.get("overview", "")),
+        ("imdb", imdb_link),
+        ("tmdb", f"https://www.themoviedb.org/{movie_data.get('media_type', 'movie')}/{movie_data.get('id')}"),
+        ("genres", ", ".join([genre["name"] for genre in movie_data.get("genres", [])])),
+        ("rating", str(movie_data.get("vote_average", "N/A"))),
+    ]
+
+def write_nfo(movie_data : dict[str, any], file):
+    """
+    Write the NFO of a movie to a text file object
+    """
+    lines = ["<movie>"]
+    for tag, text in nfo_fields(movie_data):
+        if text is None or text == "":
+            lines.append(f"    <{tag}/>")
+        elif isinstance(text, str):
+            lines.append(f"    <{tag}>{escape(text)}</{tag}>")
+        else:
+            raise TypeError(f"Cannot write {text!r} (type {type(text).__name__}) in an NFO")
+    lines.append("</movie>")
+    file.write("\n".join(lines))
+
+def render_nfo(movie_data : dict[str, any]) -> str:
+    """
+    NFO of a movie as a string
+    """
+    buffer = io.StringIO()
+    write_nfo(movie_data, buffer)
+    return buffer.getvalue()
@@ -0,0 +1,132 @@
+# Stylesheet.py
+
+# Stylesheet of the GUI : an SCSS template whose variables are the "colors" of config.json, compiled to CSS
+# by libsass. Compiled stylesheets are cached on disk under a hash of the colors and the template, so that
+# a launch with unchanged colors only reads a file, libsass being imported on a cache miss only. Only the
+# CACHED_STYLESHEETS most recently used ones are kept, edits reloaded while the GUI runs don't pile up
+
+# Compiled stylesheets kept in the cache :
+CACHED_STYLESHEETS = 8
+
+# Library imports :
+import hashlib
+import json
+import os
+
+# SCSS template, formatted with the colors (hence the doubled braces) :
+TEMPLATE = """
+    $background_color:{background_color};
+    $list_background_color:{list_background_color};
+    $border_color:{border_color};
+    $item_background_color:{item_background_color};
+    $selected_item_background_color:{selected_item_background_color};
+    $main_text_color:{main_text_color};
+    $small_text_color:{small_text_color};
+    $button_text_color:{button_text_color};
+    $connect_button_color:{connect_button_color};
+    $disconnect_button_color:{disconnect_button_color};
+    $scroll_border_color:{scroll_border_color};
+    QWidget#central_widget {{
+        background-color:$background_color;
+    }}
+    QListWidget {{
+        background-color: $list_background_color;
+        border:1px solid $border_color;
+        padding: 5px;
+    }}
+    QListWidget::item {{
+        background-color: $item_background_color;
+        margin: 5px;
+        padding: 10px;
+        border-radius: 10px;
+        color: $border_color;
+    }}
+    QListWidget::item:selected {{
+        background-color: $selected_item_background_color;
+    }}
+    QLabel#title_label {{
+        font-size: 28px;
+        font-weight: bold;
+        color: $main_text_color;
+    }}
+    QLabel#status_label {{
+        font-size: 18px;
+        font-weight: bold;
+        color: $small_text_color;
+    }}
+    QLabel#address_label {{
+        font-size: 14px;
+        color: $small_text_color;
+    }}
+    QLabel#location_label {{
+        font-size: 14px;
+        color: $small_text_color;
+    }}
+    QPushButton {{
+        font-size: 16px;
+        font-weight: bold;
+        padding: 10px;
+        border-radius: 10px;
+    }}
+    QPushButton#connect_button {{
+        background-color: $connect_button_color;
+        color: white;
+    }}
+    QPushButton#disconnect_button {{
+        background-color: $disconnect_button_color;
+        color: white;
+    }}
+    QScrollArea {{
+        border: 2px solid $scroll_border_color;
+    }}
+"""
+
+def stylesheet_key(colors : dict[str, str], template : str = TEMPLATE) -> str:
+    """
+    Hash of the colors and the template, the name of their compiled stylesheet in the cache
+    """
+    digest = hashlib.sha256(json.dumps(colors, sort_keys = True).encode())
+    digest.update(template.encode())
+    return digest.hexdigest()
+
+def compile_stylesheet(colors : dict[str, str], cache_path : str = "stylesheet_cache", template : str = TEMPLATE) -> tuple[str, bool]:
+    """
+    CSS of the template with the colors, and whether it came from the cache (otherwise it was compiled,
+    then cached)
+    """
+    path = os.path.join(cache_path, stylesheet_key(colors, template) + ".css")
+    try:
+        with open(path, encoding = "utf-8") as css_file:
+            stylesheet = css_file.read()
+        os.utime(path) # most recently used, evicted last
+        return stylesheet, True
+    except OSError:
+        pass
+    import sass # only needed on a cache miss, and slow to import
+    stylesheet = sass.compile(string = template.format(**colors))
+    # Written under a temporary name then renamed, another instance never reads half a file :
+    os.makedirs(cache_path, exist_ok = True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding = "utf-8") as css_file:
+        css_file.write(stylesheet)
+    os.replace(temporary, path)
+    evict_stylesheets(cache_path)
+    return stylesheet, False
+
+def evict_stylesheets(cache_path : str = "stylesheet_cache", keep : int = CACHED_STYLESHEETS):
+    """
+    Delete the compiled stylesheets of the cache but the `keep` most recently used ones
+    """
+    paths = []
+    with os.scandir(cache_path) as entries:
+        for entry in entries:
+            if entry.name.endswith(".css"):
+                try:
+                    paths.append((entry.stat().st_mtime_ns, entry.path))
+                except FileNotFoundError: # evicted by another instance meanwhile
+                    pass
+    for _, path in sorted(paths, reverse = True)[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,145 @@
+# TMDBClient.py
+
+# Library imports :
+import email.utils
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuses worth retrying : rate limited, or a transient server/gateway error
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+class RateLimiter:
+    """
+    Thread-safe token bucket : `rate` tokens per second, up to `burst` saved up. It can also be paused,
+    e.g. when the server answered 429 with a Retry-After header
+    """
+    def __init__(self, rate : float, burst : float = None):
+        """
+        Start with a full bucket
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens : float) -> float:
+        """
+        Take tokens (possibly going into debt) and return how long the caller has to wait before using them
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.rate > 0: # otherwise unlimited
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= tokens
+                wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def acquire(self, tokens : float = 1.0):
+        """
+        Block until `tokens` tokens are available
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds : float):
+        """
+        Hold every caller back for `seconds`
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+def retry_after(response : requests.Response) -> float:
+    """
+    Delay requested by a Retry-After header (seconds or HTTP date), None if there is none
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TMDBClient:
+    """
+    HTTP client of the TMDB API : one connection-pooled session, connect/read timeouts, retries with
+    exponential backoff (honouring Retry-After) and a client-side rate limiter shared by every request
+    base_url can point to a local stub server for testing
+    """
+    def __init__(self, base_url : str = "https://api.themoviedb.org/3", connect_timeout : float = 5, read_timeout : float = 20, retries : int = 4, backoff : float = 0.5, max_backoff : float = 30, rate : float = 40, burst : float = None, pool_size : int = 10):
+        """
+        Create the session
+        retries : number of retries after the first attempt, backoff : first delay (doubled on every retry, capped at max_backoff)
+        rate / burst : requests per second allowed by the rate limiter, 0 for no limit
+        pool_size : number of kept-alive connections
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = RateLimiter(rate, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _delay(self, attempt : int, response : requests.Response = None) -> float:
+        """
+        Delay before the next attempt : Retry-After if the server gave one, exponential backoff with jitter otherwise
+        """
+        if response is not None:
+            delay = retry_after(response)
+            if delay is not None:
+                return min(delay, self.max_backoff)
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def get(self, path : str, params : dict[str, str] = None, stream : bool = False) -> requests.Response:
+        """
+        GET a path of the API, retrying connection errors, timeouts, 429 and 5xx responses
+        Raises the last requests exception, or returns the last response, once retries are exhausted
+        stream : leave the body to be read by the caller (response.iter_content()), who then closes the response
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.get(url, params = params, timeout = self.timeout, stream = stream)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self._delay(attempt))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                return response
+            delay = self._delay(attempt, response)
+            if response.status_code == 429:
+                # Every request would be refused for that long, hold them all back :
+                self.limiter.pause(delay)
+            else:
+                time.sleep(delay)
+            response.close()
+
+    def get_json(self, path : str, params : dict[str, str] = None) -> dict[str, any]:
+        """
+        GET a path of the API and decode the JSON response
+        """
+        return self.get(path, params).json()
+
+    def close(self):
+        """
+        Close the pooled connections
+        """
+        self.session.close()
@@ -0,0 +1,396 @@
+# TitleIndex.py
+
+# Offline identification of movies from file names : an index over a local dump of TMDB titles (JSON Lines,
+# optionally gzipped, one movie per line with id, title, original_title, release_date or year, popularity),
+# searched by trigrams without any network call
+#
+# Index file layout (little endian), memory-mapped by TitleIndex :
+# - header : magic, number of entries, number of trigrams, offsets of the sections
+# - entries : (TMDB id, offset of its strings, popularity, year) records, one per distinct title of a movie
+# - strings : for every entry, its display title, a NUL byte, its normalized title
+# - trigram keys : sorted CRC32 of the trigrams of the normalized titles, with the start of their postings
+# - postings : for every key, the ascending numbers of the entries containing that trigram
+# - exact titles : sorted keys (CRC32 of the normalized title << 16 | year), with the number of their entry, the
+#   entries of a key from the most popular to the least
+
+# Library imports :
+import argparse
+import array
+import bisect
+import collections
+import gzip
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+import zlib
+
+HEADER = struct.Struct("<8sIIQQQQQ")
+MAGIC = b"CTIDX002"
+ENTRY = struct.Struct("<IIfH")
+
+# Words of release names that come after the title (quality, source, codec, edition...), normalized :
+RELEASE_TAGS = re.compile(r"2160p|1080p|1080i|720p|576p|480p|4k|uhd|hdr|hdr10|dv|bluray|blu ray|bdrip|brrip|bdremux|remux|web dl|webdl|webrip|web|hdtv|dvdrip|dvdscr|dvd|hdrip|x264|x265|h264|h265|hevc|avc|xvid|divx|aac|ac3|dts|ddp?5|atmos|truehd|10bit|proper|repack|extended|unrated|remastered|imax|multi|vostfr|truefrench|french|subfrench")
+YEAR = re.compile(r"(?<!\d)(19\d\d|20\d\d)(?!\d)")
+
+# Postings read and candidates scored by identify() when a name is neither a title nor one typo away from one :
+# the trigram search then mostly runs for names of movies missing from the dump, tight bounds keep it under a
+# millisecond
+IDENTIFY_POSTINGS = 2000
+IDENTIFY_CANDIDATES = 10
+
+# Positions of a name where a mistyped character is looked for when every trigram of the name is indexed :
+TYPO_POSITIONS = 3
+
+# Characters tried in place of a mistyped one (see TitleIndex._near_exact()) :
+SUBSTITUTES = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+# Extensions of media files, the only ones removed from a release name (a folder "The.Matrix.1999" has none) :
+MEDIA_EXTENSIONS = frozenset((".mkv", ".mp4", ".avi", ".m4v", ".mov", ".wmv", ".ts", ".m2ts", ".webm", ".mpg", ".mpeg"))
+
+def normalize(text : str) -> str:
+    """
+    Comparable form of a title : no accents, case folded, only letters and digits separated by single spaces
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(character for character in text if not unicodedata.combining(character)).casefold()
+    return " ".join(re.sub(r"[\W_]+", " ", text.replace("&", " and ")).split())
+
+def trigrams(normalized : str) -> set[str]:
+    """
+    Trigrams of a normalized title, padded so that short titles and word boundaries count
+    """
+    padded = f"  {normalized} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+def trigram_key(trigram : str) -> int:
+    """
+    Key of a trigram in the index
+    """
+    return zlib.crc32(trigram.encode("utf-8"))
+
+def parse_release_name(name : str) -> tuple[str, int]:
+    """
+    (title, year) of a release file or folder name, e.g. "The.Matrix.1999.1080p.BluRay.x264-GRP.mkv" gives
+    ("The Matrix", 1999), year None when there is none
+    """
+    name = name.strip()
+    stem, extension = os.path.splitext(name)
+    if extension.lower() in MEDIA_EXTENSIONS:
+        name = stem
+    name = re.sub(r"^\s*[\[{][^\]}]*[\]}]\s*", "", name) # [group] prefix
+    words = re.sub(r"[._]+", " ", name).split()
+    # The title stops at the first release tag :
+    for position, word in enumerate(words):
+        if position and RELEASE_TAGS.fullmatch(normalize(word)):
+            words = words[:position]
+            break
+    text = " ".join(words)
+    # and at the last year that isn't the very start of the name (2001 A Space Odyssey 1968) :
+    year, end = None, len(text)
+    for match in YEAR.finditer(text):
+        if match.start() > 0:
+            year, end = int(match.group(1)), match.start()
+    return re.sub(r"[\s(\[{-]+$", "", text[:end]).strip(), year
+
+def read_dump(path : str):
+    """
+    Stream the (TMDB id, titles, year, popularity) of the movies of a JSON Lines dump (.gz or not)
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding = "utf-8") as dump:
+        for line in dump:
+            if not line.strip():
+                continue
+            movie = json.loads(line)
+            titles = [title for title in (movie.get("title"), movie.get("original_title")) if title]
+            year = movie.get("year") or (movie.get("release_date") or "")[:4]
+            yield movie["id"], titles, int(year) if str(year).isdigit() else 0, float(movie.get("popularity") or 0)
+
+def build_index(movies, path : str) -> int:
+    """
+    Write the index of (TMDB id, titles, year, popularity) records, returns its number of entries
+    """
+    entries = array.array("I")
+    offsets = array.array("I")
+    popularities = array.array("f")
+    years = array.array("H")
+    strings = bytearray()
+    postings = collections.defaultdict(lambda: array.array("I"))
+    for movie_id, titles, year, popularity in movies:
+        seen = set()
+        for title in titles:
+            normalized = normalize(title)
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            number = len(entries)
+            entries.append(movie_id)
+            offsets.append(len(strings))
+            popularities.append(popularity)
+            years.append(year)
+            strings += title.encode("utf-8") + b"\0" + normalized.encode("utf-8")
+            for key in {trigram_key(trigram) for trigram in trigrams(normalized)}:
+                postings[key].append(number)
+    keys = sorted(postings)
+    starts = array.array("I", [0])
+    for key in keys:
+        starts.append(starts[-1] + len(postings[key]))
+    with open(path, 'wb') as index:
+        index.write(b"\0" * HEADER.size)
+        entries_offset = index.tell()
+        index.write(b"".join(ENTRY.pack(*record) for record in zip(entries, offsets, popularities, years)))
+        strings_offset = index.tell()
+        index.write(strings)
+        index.write(b"\0" * (-index.tell() % 4)) # align the arrays for memoryview casts
+        keys_offset = index.tell()
+        index.write(array.array("I", keys).tobytes())
+        index.write(starts.tobytes())
+        postings_offset = index.tell()
+        for key in keys:
+            index.write(postings[key].tobytes())
+        index.write(b"\0" * (-index.tell() % 8))
+        exact_offset = index.tell()
+        exact = sorted((zlib.crc32(strings[offset:end].split(b"\0", 1)[1]) << 16 | years[number], -popularities[number], number) for number, (offset, end) in enumerate(zip(offsets, [*offsets[1:], len(strings)])))
+        index.write(array.array("Q", [key for key, _, _ in exact]).tobytes())
+        index.write(array.array("I", [number for _, _, number in exact]).tobytes())
+        index.seek(0)
+        index.write(HEADER.pack(MAGIC, len(entries), len(keys), entries_offset, strings_offset, keys_offset, postings_offset, exact_offset))
+    return len(entries)
+
+class TitleIndex:
+    """
+    Read-only, memory-mapped title index : fuzzy search of a title (with an optional year) by trigram similarity
+    Candidates come from the rarest trigrams of the query only (a title sharing at least `min_score` of them
+    has to contain one of those), then are ranked by Dice similarity, year closeness and popularity
+    """
+    def __init__(self, path : str):
+        """
+        Map the index
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, self.length, key_count, self._entries, self._strings, keys_offset, postings_offset, exact_offset = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a title index of this version, rebuild it")
+        self._strings_end = keys_offset
+        self._view = view = memoryview(self._map)
+        self._keys = view[keys_offset:keys_offset + 4 * key_count].cast("I")
+        self._starts = view[keys_offset + 4 * key_count:postings_offset].cast("I")
+        self._postings = view[postings_offset:postings_offset + 4 * self._starts[-1]].cast("I")
+        self._exact_keys = view[exact_offset:exact_offset + 8 * self.length].cast("Q")
+        self._exact_entries = view[exact_offset + 8 * self.length:exact_offset + 12 * self.length].cast("I")
+        self._trigram_keys = None # set of the trigram keys, read by the first _near_exact() that needs it
+
+    def _posting(self, key : int) -> memoryview:
+        """
+        Entries containing a trigram, empty if none
+        """
+        position = bisect.bisect_left(self._keys, key)
+        if position == len(self._keys) or self._keys[position] != key:
+            return self._postings[0:0]
+        return self._postings[self._starts[position]:self._starts[position + 1]]
+
+    def entry(self, number : int) -> tuple[int, str, str, int, float]:
+        """
+        (TMDB id, title, normalized title, year, popularity) of an entry
+        """
+        movie_id, offset, popularity, year = ENTRY.unpack_from(self._map, self._entries + number * ENTRY.size)
+        end = self._strings + ENTRY.unpack_from(self._map, self._entries + (number + 1) * ENTRY.size)[1] if number + 1 < self.length else self._strings_end
+        title, normalized = self._map[self._strings + offset:end].split(b"\0", 1)
+        return movie_id, title.decode("utf-8"), normalized.rstrip(b"\0").decode("utf-8"), year, popularity
+
+    def _score(self, number : int, query : set[str], year : int) -> tuple[int, dict[str, any]]:
+        """
+        TMDB id and result of an entry for a query (see search())
+        """
+        movie_id, display, candidate, candidate_year, popularity = self.entry(number)
+        candidate_trigrams = trigrams(candidate)
+        score = 2 * len(query & candidate_trigrams) / (len(query) + len(candidate_trigrams))
+        if year and candidate_year:
+            score += 0.1 if candidate_year == year else 0.05 if abs(candidate_year - year) == 1 else -0.1
+        return movie_id, {"id":movie_id, "title":display, "year":candidate_year or None, "score":round(score, 4), "popularity":popularity}
+
+    def _rank(self, numbers, query : set[str], year : int, limit : int, min_score : float) -> list[dict[str, any]]:
+        """
+        Results of the given entries scoring at least min_score, one per movie, best first
+        """
+        results = {}
+        for number in numbers:
+            movie_id, result = self._score(number, query, year)
+            if result["score"] >= min_score and (movie_id not in results or results[movie_id]["score"] < result["score"]):
+                results[movie_id] = result
+        return sorted(results.values(), key = lambda result: (-result["score"], -result["popularity"]))[:limit]
+
+    def exact(self, title : str) -> list[int]:
+        """
+        Entries whose normalized title is the normalized title given (plus the rare CRC32 collisions)
+        """
+        start = zlib.crc32(normalize(title).encode("utf-8")) << 16
+        return self._exact_entries[bisect.bisect_left(self._exact_keys, start):bisect.bisect_left(self._exact_keys, start + (1 << 16))].tolist()
+
+    def _popularity(self, number : int) -> float:
+        """
+        Popularity of an entry
+        """
+        return ENTRY.unpack_from(self._map, self._entries + number * ENTRY.size)[2]
+
+    def _best_exact(self, normalized : str, year : int) -> int:
+        """
+        Entry _rank() would put first among the exact titles, without scoring them all (they all have a Dice
+        similarity of 1) : the most popular one of the year, else of a year off by one, else without a year,
+        else of any year ; None if there is none
+        Every year of a title is a key of its own whose first entry is the most popular, so that this costs a
+        few bisections however many movies share the title
+        """
+        start = zlib.crc32(normalized.encode("utf-8")) << 16
+        position = bisect.bisect_left(self._exact_keys, start)
+        if position == self.length or self._exact_keys[position] >> 16 != start >> 16: # no such title
+            return None
+        if year:
+            for candidate_years in ((year,), (year - 1, year + 1), (0,)):
+                firsts = []
+                for candidate_year in candidate_years:
+                    position = bisect.bisect_left(self._exact_keys, start | candidate_year)
+                    if position < self.length and self._exact_keys[position] == start | candidate_year:
+                        firsts.append(self._exact_entries[position])
+                if firsts:
+                    return max(firsts, key = self._popularity)
+        # Most popular entry of any year, one per year :
+        end = bisect.bisect_left(self._exact_keys, start + (1 << 16), position)
+        best, best_popularity = None, None
+        while position < end:
+            number = self._exact_entries[position]
+            popularity = self._popularity(number)
+            if best is None or popularity > best_popularity:
+                best, best_popularity = number, popularity
+            position = bisect.bisect_left(self._exact_keys, self._exact_keys[position] + 1, position, end)
+        return best
+
+    def _typo_positions(self, normalized : str) -> list[int]:
+        """
+        Positions of a normalized title where a mistyped character may be : the ones under every trigram of the
+        title that no indexed title has, else the TYPO_POSITIONS ones under the rarest trigrams
+        """
+        padded = f"  {normalized} "
+        lengths = [len(self._posting(trigram_key(padded[index:index + 3]))) for index in range(len(padded) - 2)]
+        # Trigram `index` of the padded title covers the characters index - 2 to index :
+        covered = lambda index: {position for position in range(index - 2, index + 1) if 0 <= position < len(normalized)}
+        missing = [index for index, length in enumerate(lengths) if not length]
+        if missing:
+            positions = set.intersection(*map(covered, missing)) or covered(missing[0])
+        else: # the three trigrams over a mistyped character are usually all rare
+            positions = sorted(range(len(normalized)), key = lambda position: sum(lengths[position:position + 3]))[:TYPO_POSITIONS]
+        return sorted(positions)
+
+    def _near_exact(self, normalized : str, year : int) -> list[int]:
+        """
+        Best exact entry (see _best_exact()) of every title one typo away from a normalized title : two
+        neighbour characters swapped, one character too many, or one character mistyped, the usual typing
+        mistakes (a mistyped character is only looked for where _typo_positions() finds it may be)
+        """
+        variants = dict.fromkeys(normalized[:position] + normalized[position + 1] + normalized[position] + normalized[position + 2:] for position in range(len(normalized) - 1))
+        variants.update(dict.fromkeys(normalized[:position] + normalized[position + 1:] for position in range(len(normalized))))
+        for position in self._typo_positions(normalized):
+            if normalized[position] != " ":
+                if self._trigram_keys is None:
+                    self._trigram_keys = set(self._keys)
+                before, after = normalized[position - 1] if position else " ", normalized[position + 1] if position + 1 < len(normalized) else " "
+                # A title has every trigram of its own, the one centered on the new character first :
+                variants.update(dict.fromkeys(normalized[:position] + character + normalized[position + 1:] for character in SUBSTITUTES if trigram_key(before + character + after) in self._trigram_keys))
+        numbers = []
+        for variant in variants:
+            # Only variants that are themselves normalized titles can be in the table :
+            if variant and variant != normalized and variant[0] != " " and variant[-1] != " " and "  " not in variant:
+                number = self._best_exact(variant, year)
+                if number is not None:
+                    numbers.append(number)
+        return numbers
+
+    def search(self, title : str, year : int = None, limit : int = 5, min_score : float = 0.5, max_candidates : int = 30, max_postings : int = 10000) -> list[dict[str, any]]:
+        """
+        Best matches of a title, as {"id", "title", "year", "score", "popularity"} dicts, best first
+        score : Dice similarity of the trigrams, +0.1 for the same year, +0.05 one year off, -0.1 further off
+        max_postings : bound on the postings read : past it, only the rarest trigrams are used, which still finds
+        titles differing by a typo or two (they keep most rare trigrams of the query) but may miss looser matches
+        """
+        normalized = normalize(title)
+        if not normalized:
+            return []
+        query = trigrams(normalized)
+        lists = sorted((self._posting(trigram_key(trigram)) for trigram in query), key = len)
+        # A title with a Dice similarity of s shares at least s / (2 - s) of the query's trigrams, so it
+        # contains one of the len(query) - needed + 1 rarest ones :
+        similarity = max(min_score - 0.1, 0.01) # before the year bonus
+        needed = max(1, int(similarity / (2 - similarity) * len(query)))
+        hits = collections.Counter()
+        read = 0
+        for posting in lists[:len(lists) - needed + 1]:
+            if read and read + len(posting) > max_postings:
+                break
+            hits.update(posting[:max_postings]) # a single trigram common enough finds nothing close anyway
+            read += len(posting)
+        candidates = sorted(hits, key = hits.__getitem__, reverse = True)[:max_candidates]
+        return self._rank(candidates, query, year, limit, min_score)
+
+    def identify(self, name : str, min_score : float = 0.7) -> dict[str, any]:
+        """
+        Best match of a release file or folder name, None if nothing is close enough
+        Titles spelled like the one of a movie, or one typo away from it, are found by the exact titles table,
+        the others by search()
+        """
+        title, year = parse_release_name(name)
+        normalized = normalize(title)
+        number = self._best_exact(normalized, year) if normalized else None
+        query = trigrams(normalized)
+        if number is not None and self.entry(number)[2] == normalized:
+            results = self._rank([number], query, year, 1, min_score)
+        else: # no exact title, or a CRC32 collision
+            results = self._rank(self.exact(title), query, year, 1, min_score)
+        results = results or self._rank(self._near_exact(normalized, year), query, year, 1, min_score) or self.search(title, year, 1, min_score, max_candidates = IDENTIFY_CANDIDATES, max_postings = IDENTIFY_POSTINGS)
+        return results[0] if results else None
+
+    def close(self):
+        """
+        Unmap the index
+        """
+        self._keys.release()
+        self._starts.release()
+        self._postings.release()
+        self._exact_keys.release()
+        self._exact_entries.release()
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+def open_title_index(path : str) -> TitleIndex:
+    """
+    Open an index if it was built, None otherwise
+    """
+    return TitleIndex(path) if path and os.path.exists(path) else None
+
+# Build and query tools :
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Build or query the offline title index")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    build = commands.add_parser("build", help = "index a TMDB dump (JSON Lines, .gz or not)")
+    build.add_argument("dump")
+    build.add_argument("index", nargs = "?", default = "titles.idx")
+    query = commands.add_parser("query", help = "identify release names")
+    query.add_argument("names", nargs = "+")
+    query.add_argument("--index", default = "titles.idx")
+    query.add_argument("--limit", type = int, default = 5)
+    arguments = parser.parse_args()
+
+    if arguments.command == "build":
+        print(f"{build_index(read_dump(arguments.dump), arguments.index)} titles indexed into {arguments.index}")
+    else:
+        title_index = TitleIndex(arguments.index)
+        for name in arguments.names:
+            title, year = parse_release_name(name)
+            sys.stdout.write(json.dumps({"name":name, "title":title, "year":year, "matches":title_index.search(title, year, arguments.limit)}, ensure_ascii = False) + "\n")
+        title_index.close()
@@ -0,0 +1,429 @@
+# WatchDaemon.py
+
+# Daemon sorting the files dropped into watched folders : inotify events (no polling) mark files as written,
+# files are imported once their whole folder has been quiet for a while, through a queue kept in SQLite so
+# that nothing is lost across restarts
+
+# Library imports :
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import re
+import select
+import signal
+import sqlite3
+import struct
+import threading
+import time
+
+# Module imports :
+from LogCollector import open_logger
+from FileManager import FileManager, TMDB_API_KEY
+from MetadataCache import MetadataCache
+from TMDBClient import TMDBClient
+from TitleIndex import open_title_index, MEDIA_EXTENSIONS
+from LibraryIndex import LibraryIndex
+from FileHasher import FileHasher
+from ArtworkCache import ArtworkCache
+from BatchImporter import BatchImporter
+
+# inotify flags, from sys/inotify.h :
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+EVENT = struct.Struct("iIII") # wd, mask, cookie, length of the name that follows
+
+# Suffixes of files still being downloaded, they get renamed once complete :
+PARTIAL_SUFFIXES = (".part", ".!qb", ".crdownload", ".tmp")
+LINK_SUFFIX = ".link"
+
+IMDB_ID = re.compile(r"\b(tt\d{7,8})\b")
+TMDB_ID = re.compile(r"\btmdb(?:id)?[-_= ]?(\d+)\b", re.IGNORECASE)
+
+class Inotify:
+    """
+    Minimal inotify binding through ctypes
+    """
+    def __init__(self):
+        """
+        Create a non-blocking inotify instance
+        """
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno = True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._poll = select.poll()
+        self._poll.register(self.fd, select.POLLIN)
+
+    def add_watch(self, path : str, mask : int = WATCH_MASK) -> int:
+        """
+        Watch a directory, returns its watch descriptor
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def read(self, timeout : float) -> list[tuple[int, int, int, str]]:
+        """
+        Wait up to `timeout` seconds (None : forever) for events, returns them as (wd, mask, cookie, name)
+        """
+        if not self._poll.poll(None if timeout is None else max(0, int(timeout * 1000))):
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0"))
+                events.append((wd, mask, cookie, name))
+                offset += EVENT.size + length
+
+    def close(self):
+        """
+        Close the instance, which removes every watch
+        """
+        os.close(self.fd)
+
+class ImportQueue:
+    """
+    Files seen by the daemon, stored in SQLite with their state :
+    "queued" (waiting for import), "running", "imported", "skipped" (already in the library), "failed",
+    "unresolved" (no ID found for it)
+    A file is known by its path, size and modification time : a file replaced by another one is seen again
+    Files left "running" by a stopped daemon are queued again when the queue is opened
+    """
+    def __init__(self, path : str = "watch_queue.sqlite"):
+        """
+        Open (or create) the queue
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread = False, isolation_level = None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, link TEXT, state TEXT, folder TEXT, error TEXT, updated REAL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS files_state ON files (state, updated)")
+        self._connection.execute("UPDATE files SET state = 'queued' WHERE state = 'running'")
+
+    def state(self, path : str, status : os.stat_result) -> str:
+        """
+        State of a file, None if this version of it was never seen
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT state FROM files WHERE path = ? AND size = ? AND mtime_ns = ?", (path, status.st_size, status.st_mtime_ns)).fetchone()
+        return row[0] if row else None
+
+    def add(self, path : str, status : os.stat_result, link : str):
+        """
+        Queue a file, or record it as unresolved if it has no link
+        """
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, NULL, NULL, ?)", (path, status.st_size, status.st_mtime_ns, link, "queued" if link else "unresolved", time.time()))
+
+    def claim(self) -> tuple[str, str]:
+        """
+        Take the oldest queued file and mark it running, returns (path, link) or None if the queue is empty
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT path, link FROM files WHERE state = 'queued' ORDER BY updated LIMIT 1").fetchone()
+            if row:
+                self._connection.execute("UPDATE files SET state = 'running', updated = ? WHERE path = ?", (time.time(), row[0]))
+            return row
+
+    def finish(self, path : str, state : str, folder : str = None, error : str = None):
+        """
+        Record the outcome of an import
+        """
+        with self._lock:
+            self._connection.execute("UPDATE files SET state = ?, folder = ?, error = ?, updated = ? WHERE path = ?", (state, folder, error, time.time(), path))
+
+    def retry_failed(self) -> int:
+        """
+        Queue the failed files again, returns how many
+        """
+        with self._lock:
+            return self._connection.execute("UPDATE files SET state = 'queued', error = NULL WHERE state = 'failed'").rowcount
+
+    def counts(self) -> dict[str, int]:
+        """
+        Number of files in every state
+        """
+        with self._lock:
+            return dict(self._connection.execute("SELECT state, COUNT(*) FROM files GROUP BY state").fetchall())
+
+    def close(self):
+        """
+        Close the queue
+        """
+        with self._lock:
+            self._connection.close()
+
+def find_link(path : str) -> str:
+    """
+    Link of a media file : first line of a sidecar <file>.link or <file stem>.link, else a link built from an
+    IMDB (tt0133093) or TMDB (tmdb-603, tmdbid=603...) ID in the file or folder name, None if there is none
+    """
+    for sidecar in (path + LINK_SUFFIX, os.path.splitext(path)[0] + LINK_SUFFIX):
+        try:
+            with open(sidecar, encoding = "utf-8") as sidecar_file:
+                link = sidecar_file.readline().strip()
+            if link:
+                return link
+        except OSError:
+            pass
+    for name in (os.path.basename(path), os.path.basename(os.path.dirname(path))):
+        imdb_match = IMDB_ID.search(name)
+        if imdb_match:
+            return f"https://www.imdb.com/title/{imdb_match.group(1)}/"
+        tmdb_match = TMDB_ID.search(name)
+        if tmdb_match:
+            return f"https://www.themoviedb.org/movie/{tmdb_match.group(1)}"
+    return None
+
+def is_media(name : str) -> bool:
+    """
+    Whether a file name is a complete media file worth importing
+    """
+    lowered = name.lower()
+    return not name.startswith(".") and not lowered.endswith(PARTIAL_SUFFIXES) and os.path.splitext(lowered)[1] in MEDIA_EXTENSIONS
+
+class WatchDaemon:
+    """
+    Watch drop directories (recursively) and import what lands in them :
+    - a media file is a candidate once it was closed after writing or moved in (downloads renamed from .part)
+    - candidates are grouped by the top level entry of the drop directory they are in (a torrent's folder),
+      and a group is only looked at once it had no event for `debounce` seconds
+    - a file whose size or modification time still changed is given another `debounce`, otherwise it is
+      resolved (see find_link(), then the offline title index) and queued, a worker thread importing the queue through BatchImporter
+    Memory only holds the groups being debounced, the queue and the files already seen stay in SQLite
+    """
+    def __init__(self, importer : BatchImporter, directories : list[str], queue : ImportQueue, debounce : float = 10):
+        """
+        Initialize the daemon
+        """
+        self.importer = importer
+        self.logger = importer.filemanager.logger
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.queue = queue
+        self.debounce = debounce
+        self._inotify = None
+        self._watches = {} # wd -> directory
+        self._groups = {} # group path -> [deadline, {file path:stat}]
+        self._stop = threading.Event()
+        self._work = threading.Event()
+
+    def _log(self, event : str, output : str = "0"):
+        """
+        Write an EVENT entry, its invoker being the caller of this method
+        """
+        self.logger.write("EVENT", {"event":event, "output":output}, depth = 2)
+
+    def _root_of(self, path : str) -> str:
+        """
+        Drop directory containing a path
+        """
+        return max((directory for directory in self.directories if path == directory or path.startswith(directory + os.sep)), key = len)
+
+    def _group_of(self, path : str) -> str:
+        """
+        Top level entry of its drop directory that a path belongs to
+        """
+        root = self._root_of(path)
+        return os.path.join(root, os.path.relpath(path, root).split(os.sep)[0])
+
+    def _watch_tree(self, directory : str):
+        """
+        Watch a directory and its subdirectories, and take in the files already there (written while unwatched)
+        """
+        for current, subdirectories, files in os.walk(directory):
+            try:
+                self._watches[self._inotify.add_watch(current)] = current
+            except OSError as error:
+                if error.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    raise
+                continue
+            for name in files:
+                if is_media(name):
+                    self._candidate(os.path.join(current, name))
+
+    def _candidate(self, path : str):
+        """
+        Add a file to its group and push the group's deadline back
+        """
+        try:
+            status = os.stat(path)
+        except FileNotFoundError:
+            return
+        if self.queue.state(path, status) not in (None, "unresolved"):
+            return
+        group = self._groups.setdefault(self._group_of(path), [0, {}])
+        group[1][path] = status
+        self._touch(path)
+
+    def _touch(self, path : str):
+        """
+        Push back the deadline of the group of a path, if it has one
+        """
+        group = self._groups.get(self._group_of(path))
+        if group is not None:
+            group[0] = time.monotonic() + self.debounce
+
+    def _handle(self, wd : int, mask : int, name : str):
+        """
+        Process one inotify event
+        """
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost, look at everything again :
+            self._log("inotify queue overflowed, rescanning the drop directories")
+            for directory in self.directories:
+                self._watch_tree(directory)
+            return
+        directory = self._watches.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            del self._watches[wd]
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            return
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path)
+            return
+        if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            if is_media(name):
+                self._candidate(path)
+            elif name.endswith(LINK_SUFFIX): # a sidecar appeared, its media file may now be resolvable
+                for media in (path[:-len(LINK_SUFFIX)], *(path[:-len(LINK_SUFFIX)] + extension for extension in MEDIA_EXTENSIONS)):
+                    if os.path.isfile(media):
+                        self._candidate(media)
+            else:
+                self._touch(path)
+        else: # file created or moved away, the group is still busy
+            self._touch(path)
+
+    def _expire(self):
+        """
+        Queue the files of the groups that have been quiet long enough, returns the time until the next deadline
+        """
+        now = time.monotonic()
+        for group_path, (deadline, files) in list(self._groups.items()):
+            if deadline > now:
+                continue
+            changed = False
+            for path, status in list(files.items()):
+                try:
+                    current = os.stat(path)
+                except FileNotFoundError:
+                    del files[path]
+                    continue
+                if (current.st_size, current.st_mtime_ns) != (status.st_size, status.st_mtime_ns):
+                    files[path] = current
+                    changed = True
+            if changed:
+                self._groups[group_path][0] = now + self.debounce
+                continue
+            del self._groups[group_path]
+            for path, status in files.items():
+                link = find_link(path) or self.importer.resolve_link({"path":path, "link":""})
+                self.queue.add(path, status, link)
+                self._log(f"Queued {path}" if link else f"No IMDB/TMDB ID nor matching title found for {path}, add a {os.path.basename(path)}{LINK_SUFFIX} file with its link", link or "unresolved")
+            self._work.set()
+        deadlines = [deadline for deadline, _ in self._groups.values()]
+        return max(0.0, min(deadlines) - now) if deadlines else None
+
+    def _worker(self):
+        """
+        Import the queued files one after the other
+        """
+        while not self._stop.is_set():
+            claimed = self.queue.claim()
+            if claimed is None:
+                self._work.wait(1)
+                self._work.clear()
+                continue
+            path, link = claimed
+            result = self.importer.import_item({"path":path, "name":"", "link":link})
+            self.queue.finish(path, result["status"], result["folder"], result["error"])
+            if result["status"] == "failed":
+                self._log(f"Import of {path} failed : {result['error']}", result["status"])
+            elif result["status"] == "skipped":
+                self._log(f"Skipped {path}, already in the library" + (f" at {result['folder']}" if result["folder"] else ""), result["status"])
+            else:
+                self._log(f"Imported {path} into {result['folder']} ({result['placement']})", result["status"])
+
+    def run(self):
+        """
+        Watch until stop() is called
+        """
+        self._inotify = Inotify()
+        worker = threading.Thread(target = self._worker, name = "watch_import", daemon = True)
+        try:
+            for directory in self.directories:
+                os.makedirs(directory, exist_ok = True)
+                self._watch_tree(directory)
+            self._log(f"Watching {', '.join(self.directories)}", json.dumps(self.queue.counts()))
+            worker.start()
+            timeout = self._expire()
+            while not self._stop.is_set():
+                # Wake up at least every second to notice stop() :
+                for wd, mask, cookie, name in self._inotify.read(min(timeout, 1.0) if timeout is not None else 1.0):
+                    self._handle(wd, mask, name)
+                timeout = self._expire()
+        finally:
+            self._stop.set()
+            self._work.set()
+            if worker.is_alive():
+                worker.join()
+            self._inotify.close()
+
+    def stop(self):
+        """
+        Ask run() to return, after the import in progress (if any)
+        """
+        self._stop.set()
+        self._work.set()
+
+# Daemon :
+if __name__ == "__main__":
+    with open("config.json") as config_file:
+        config = json.load(config_file)
+    parser = argparse.ArgumentParser(description = "Watch drop directories and import the media files landing in them")
+    parser.add_argument("directories", nargs = "*", default = config["watch"]["directories"], help = "drop directories (default: config.json watch.directories)")
+    parser.add_argument("--base-path", default = config["paths"]["library"], help = "library folder (default: config.json paths.library)")
+    parser.add_argument("--debounce", type = float, default = config["watch"]["debounce"], help = "seconds a folder must stay quiet before its files are imported")
+    parser.add_argument("--queue", default = config["watch"]["queue"], help = "SQLite file of the import queue")
+    parser.add_argument("--retry-failed", action = "store_true", help = "queue the files that failed to import again")
+    arguments = parser.parse_args()
+
+    logger = open_logger("log.txt", queued = True)
+    filemanager = FileManager(logger, TMDB_API_KEY, MetadataCache(**config["cache"]), TMDBClient(**config["network"]), config["placement"], open_title_index(config["title_index"]["path"]), config["title_index"]["min_score"], LibraryIndex(config["library"]["index"]), config["library"]["conflicts"], FileHasher(**config["hash_parameters"]), ArtworkCache(**config["artwork"]))
+    # Catch up with changes made to the library by hand, only the folders that changed are read :
+    if os.path.isdir(arguments.base_path):
+        filemanager.library.rescan(arguments.base_path)
+    queue = ImportQueue(arguments.queue)
+    if arguments.retry_failed:
+        queue.retry_failed()
+    daemon = WatchDaemon(BatchImporter(filemanager, arguments.base_path, output = None), arguments.directories, queue, arguments.debounce)
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+    daemon.run()
+    queue.close()
+    filemanager.hasher.close()
+    logger.close()
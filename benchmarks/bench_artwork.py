@@ -0,0 +1,156 @@
+# bench_artwork.py
+
+# Benchmark of filling the metadata folders of a batch of movies with their artwork, against a local stub
+# image server with injected latency and a per-connection throughput :
+# - sequential : every image of every folder downloaded one after the other, as a media server scanning the
+#   library item by item would
+# - ArtworkCache : concurrent downloads into the content addressed cache, each image fetched once, hardlinked
+#   into the folders, then the same batch again (all from the cache)
+# Some movies share images (versions of the same movie, collections), and some distinct paths hold identical bytes
+# Run from the repository root : python benchmarks/bench_artwork.py [--movies 100] [--latency 0.05] [--workers 8]
+
+# Library imports :
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module imports :
+from ArtworkCache import ArtworkCache, image_paths
+
+class StubImages(BaseHTTPRequestHandler):
+    """
+    Answers /t/p/<size>/<name> with the bytes of an image after `latency` seconds, sent at `throughput` bytes per second
+    """
+    protocol_version = "HTTP/1.1"
+    wbufsize = 1 << 16
+    latency = 0.05
+    throughput = 20e6
+    images = {}
+    requests = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        type(self).requests += 1
+        time.sleep(self.latency)
+        data = self.images.get(self.path.rsplit("/", 1)[-1])
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        for offset in range(0, len(data), 1 << 16):
+            self.wfile.write(data[offset:offset + (1 << 16)])
+            time.sleep(min(1 << 16, len(data) - offset) / self.throughput)
+
+def make_movies(count : int) -> list[dict[str, any]]:
+    """
+    Movie data with poster, backdrop and logo paths, a fifth of the movies being versions of others and a
+    tenth of the images being identical to another one under a new name
+    """
+    random.seed(0)
+    movies = []
+    for number in range(count):
+        if movies and random.random() < 0.2:
+            movies.append(dict(random.choice(movies)))
+            continue
+        paths = {"poster_path":f"/p{number}.jpg", "backdrop_path":f"/b{number}.jpg"}
+        for name, size in ((f"p{number}.jpg", 300 << 10), (f"b{number}.jpg", 900 << 10), (f"l{number}.png", 40 << 10)):
+            StubImages.images[name] = random.randbytes(size)
+        if number > 0 and random.random() < 0.1:
+            StubImages.images[f"p{number}.jpg"] = StubImages.images[f"p{number - 1}.jpg"]
+        movies.append({"id":number, **paths, "images":{"logos":[{"file_path":f"/l{number}.png", "iso_639_1":"en"}]}})
+    return movies
+
+def sequential(base_url : str, movies : list[dict[str, any]], library : str):
+    """
+    One request after the other, every folder downloading its own images
+    """
+    session = requests.Session()
+    for number, movie_data in enumerate(movies):
+        folder = os.path.join(library, f"movie{number}", "metadata")
+        os.makedirs(folder)
+        for kind, image_path in image_paths(movie_data).items():
+            with open(os.path.join(folder, kind + os.path.splitext(image_path)[1]), "wb") as image_file:
+                image_file.write(session.get(f"{base_url}/original{image_path}").content)
+    session.close()
+
+def with_cache(cache : ArtworkCache, movies : list[dict[str, any]], library : str):
+    """
+    Prefetch the whole batch, then install every folder
+    """
+    for movie_data in movies:
+        cache.prefetch(movie_data)
+    for number, movie_data in enumerate(movies):
+        folder = os.path.join(library, f"movie{number}", "metadata")
+        os.makedirs(folder, exist_ok = True)
+        result = cache.install(movie_data, folder)
+        assert not result["errors"], result["errors"]
+
+def folder_digests(library : str) -> dict[str, str]:
+    """
+    Content of every image installed in a library, to compare the methods
+    """
+    digests = {}
+    for directory, _, names in os.walk(library):
+        for name in names:
+            with open(os.path.join(directory, name), "rb") as image_file:
+                digests[os.path.relpath(os.path.join(directory, name), library)] = hashlib.sha256(image_file.read()).hexdigest()
+    return digests
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark ArtworkCache against sequential artwork downloads")
+    parser.add_argument("--movies", type = int, default = 100)
+    parser.add_argument("--latency", type = float, default = 0.05, help = "seconds before every stub response")
+    parser.add_argument("--throughput", type = float, default = 20, help = "MB/s of every stub connection")
+    parser.add_argument("--workers", type = int, default = 8)
+    parser.add_argument("--bandwidth", type = float, default = 0, help = "ArtworkCache cap in MB/s, 0 for none")
+    arguments = parser.parse_args()
+
+    StubImages.latency = arguments.latency
+    StubImages.throughput = arguments.throughput * 1e6
+    movies = make_movies(arguments.movies)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubImages)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/t/p"
+    directory = tempfile.mkdtemp(prefix = "centaurus-bench-")
+    try:
+        StubImages.requests = 0
+        start = time.perf_counter()
+        sequential(base_url, movies, os.path.join(directory, "sequential"))
+        elapsed_sequential = time.perf_counter() - start
+        print(f"sequential   : {len(movies)} folders in {elapsed_sequential:6.2f} s, {StubImages.requests} requests")
+
+        cache = ArtworkCache(os.path.join(directory, "cache"), base_url, workers = arguments.workers, bandwidth = arguments.bandwidth * 1e6)
+        for run in ("cold", "warm"):
+            StubImages.requests = 0
+            library = os.path.join(directory, f"library-{run}")
+            start = time.perf_counter()
+            with_cache(cache, movies, library)
+            elapsed = time.perf_counter() - start
+            print(f"ArtworkCache : {len(movies)} folders in {elapsed:6.2f} s, {StubImages.requests} requests, {run} cache ({elapsed_sequential / elapsed:.1f}x faster)")
+        stats = cache.stats()
+        objects = sum(len(names) for _, _, names in os.walk(os.path.join(directory, "cache", "objects")))
+        print(f"cache        : {stats['downloaded']} downloads ({stats['bytes'] >> 20} MiB), {objects} distinct images stored, {stats['shared']} downloads already stored under another name")
+        print(f"same images as sequential : {folder_digests(os.path.join(directory, 'sequential')) == folder_digests(library)}")
+        cache.close()
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory)
@@ -0,0 +1,119 @@
+# bench_fetch_many.py
+
+# Benchmark of bulk metadata resolution against a local mock TMDB server with injected latency :
+# - sequential : extract_id() then fetch_data() for every link, as the GUI does
+# - fetch_many() : concurrent fetches, bounded, rate limited and with duplicate IDs collapsed
+# Run from the repository root : python benchmarks/bench_fetch_many.py [--links 200] [--latency 0.05] [--concurrency 16]
+
+# Library imports :
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module imports :
+from FileManager import FileManager
+from LogWriter import LogWriter
+from TMDBClient import TMDBClient
+
+class MockTMDB(BaseHTTPRequestHandler):
+    """
+    Answers /3/movie/<id> and /3/find/<imdb id> after `latency` seconds
+    """
+    protocol_version = "HTTP/1.1"
+    wbufsize = 1 << 16 # headers and body in one send, no Nagle delay on kept-alive connections
+    latency = 0.05
+    requests = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        type(self).requests += 1
+        time.sleep(self.latency)
+        path = self.path.split("?")[0].split("/")
+        if path[2] == "find":
+            body = {"movie_results":[{"id":int(path[3][2:])}]}
+        else:
+            body = {"id":int(path[3]), "title":f"Movie {path[3]}", "release_date":"2000-01-01", "genres":[]}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def make_links(count : int) -> list[str]:
+    """
+    Mix of TMDB and IMDB links, about 20% of them duplicates
+    """
+    random.seed(0)
+    links = []
+    for _ in range(count):
+        movie_id = random.randrange(int(count * 0.8))
+        links.append(f"https://www.themoviedb.org/movie/{movie_id}" if movie_id % 2 else f"https://www.imdb.com/title/tt{movie_id:07d}/")
+    return links
+
+async def consume(filemanager : FileManager, links : list[str], concurrency : int) -> int:
+    """
+    Drain fetch_many(), returns the number of resolved links
+    """
+    resolved = 0
+    async for link, id_type, movie_id, movie_data in filemanager.fetch_many(links, concurrency):
+        resolved += movie_data is not None
+    return resolved
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark fetch_many() against sequential fetching")
+    parser.add_argument("--links", type = int, default = 200)
+    parser.add_argument("--latency", type = float, default = 0.05, help = "seconds added to every mock response")
+    parser.add_argument("--concurrency", type = int, default = 16)
+    parser.add_argument("--rate", type = float, default = 0, help = "client rate limit in requests per second, 0 for none")
+    arguments = parser.parse_args()
+
+    MockTMDB.latency = arguments.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockTMDB)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    directory = tempfile.mkdtemp(prefix = "centaurus-bench-")
+    shutil.copy(os.path.join(ROOT, "config.json"), directory)
+    os.chdir(directory)
+    try:
+        links = make_links(arguments.links)
+        logger = LogWriter("log.txt", minimum_level = "WARNING")
+
+        def filemanager():
+            client = TMDBClient(f"http://127.0.0.1:{server.server_port}/3", rate = arguments.rate, pool_size = arguments.concurrency)
+            return FileManager(logger, "key", client = client)
+
+        # Sequential :
+        MockTMDB.requests = 0
+        sequential = filemanager()
+        start = time.perf_counter()
+        resolved = 0
+        for link in links:
+            id_type, movie_id = sequential.extract_id(link)
+            resolved += sequential.fetch_data(id_type, movie_id) is not None
+        elapsed = time.perf_counter() - start
+        print(f"sequential  : {resolved} links in {elapsed:6.2f} s, {MockTMDB.requests} requests")
+
+        # Concurrent :
+        MockTMDB.requests = 0
+        concurrent = filemanager()
+        start = time.perf_counter()
+        resolved = asyncio.run(consume(concurrent, links, arguments.concurrency))
+        elapsed_concurrent = time.perf_counter() - start
+        print(f"fetch_many  : {resolved} links in {elapsed_concurrent:6.2f} s, {MockTMDB.requests} requests ({elapsed / elapsed_concurrent:.1f}x faster)")
+    finally:
+        server.shutdown()
+        os.chdir(ROOT)
+        shutil.rmtree(directory)
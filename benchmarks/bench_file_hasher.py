@@ -0,0 +1,88 @@
+# bench_file_hasher.py
+
+# Benchmark of content hashing over a set of media-sized files :
+# - naive : hashlib.sha256 over every file, one after the other, reading 64 KiB at a time
+# - FileHasher : chunked reads into a reused buffer over a process pool, for every algorithm available,
+#   then the same files again (answered by the cache, keyed by inode, size and modification time)
+# - duplicates() over the files plus copies of a few of them : only files sharing a size are hashed
+# Run from the repository root : python benchmarks/bench_file_hasher.py [--files 16] [--megabytes 64] [--workers 0]
+
+# Library imports :
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module imports :
+from FileHasher import FileHasher, ALGORITHMS
+
+def naive_sha256(path : str) -> str:
+    """
+    Plain sequential hashing
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark FileHasher against sequential sha256 hashing")
+    parser.add_argument("--files", type = int, default = 16)
+    parser.add_argument("--megabytes", type = int, default = 64, help = "size of every file, about")
+    parser.add_argument("--workers", type = int, default = 0, help = "parallelism cap, 0 for one per CPU")
+    parser.add_argument("--copies", type = int, default = 3, help = "files copied under another name for duplicates()")
+    arguments = parser.parse_args()
+
+    random.seed(0)
+    directory = tempfile.mkdtemp(prefix = "centaurus-bench-")
+    try:
+        paths = []
+        block = os.urandom(1 << 20)
+        for number in range(arguments.files):
+            path = os.path.join(directory, f"movie{number}.mkv")
+            with open(path, "wb") as file:
+                for _ in range(arguments.megabytes):
+                    file.write(block)
+                file.write(os.urandom(random.randrange(1, 1 << 16))) # distinct sizes and contents
+            paths.append(path)
+        total = sum(os.path.getsize(path) for path in paths)
+        print(f"{len(paths)} files, {total >> 20} MiB, {os.cpu_count()} CPUs")
+
+        start = time.perf_counter()
+        expected = {path:naive_sha256(path) for path in paths}
+        elapsed_naive = time.perf_counter() - start
+        print(f"naive sha256        : {elapsed_naive:6.2f} s, {total / elapsed_naive / (1 << 20):7.0f} MiB/s")
+
+        for algorithm in sorted(ALGORITHMS):
+            hasher = FileHasher(os.path.join(directory, f"{algorithm}.sqlite"), algorithm, parallelism_cap = arguments.workers)
+            start = time.perf_counter()
+            digests = hasher.hash_many(paths)
+            elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            cached = hasher.hash_many(paths)
+            elapsed_cached = time.perf_counter() - start
+            check = " (same digests as naive)" if algorithm == "sha256" and digests == expected else ""
+            print(f"FileHasher {algorithm:<8} : {elapsed:6.2f} s, {total / elapsed / (1 << 20):7.0f} MiB/s, {hasher.workers} workers, cached again in {elapsed_cached * 1e3:.1f} ms{check}")
+            assert cached == digests
+            hasher.close()
+
+        for path in paths[:arguments.copies]:
+            shutil.copy(path, path.replace(".mkv", ".copy.mkv"))
+        listed = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".mkv"))
+        hasher = FileHasher(os.path.join(directory, "duplicates.sqlite"), parallelism_cap = arguments.workers)
+        start = time.perf_counter()
+        groups = hasher.duplicates(listed)
+        elapsed = time.perf_counter() - start
+        stats = hasher.stats()
+        print(f"duplicates()        : {len(groups)} groups among {len(listed)} files in {elapsed:6.2f} s, {stats['hashed']} files hashed ({stats['bytes'] >> 20} MiB)")
+        hasher.close()
+    finally:
+        shutil.rmtree(directory)
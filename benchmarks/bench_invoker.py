@@ -0,0 +1,49 @@
+# bench_invoker.py
+
+# Micro-benchmark of the invoker attribution of log entries :
+# - before : every call site built {"file", "instance", "called by"} with inspect.stack()
+# - after : LogWriter captures an Invoker from the frame and formats it only when writing the entry
+# Run from the repository root : python benchmarks/bench_invoker.py
+
+# Library imports :
+import inspect
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Module imports :
+from LogWriter import Invoker
+
+class Caller:
+    """
+    Stand-in for FileManager, whose methods log their invoker
+    """
+    def before(self):
+        return {"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}
+
+    def after(self):
+        return Invoker.capture()
+
+    def after_formatted(self):
+        return Invoker.capture().as_dict()
+
+def nested(depth, function):
+    """
+    Call `function` under `depth` extra frames, since inspect.stack() cost grows with the stack depth
+    """
+    if depth:
+        return nested(depth - 1, function)
+    return function()
+
+if __name__ == "__main__":
+    caller = Caller()
+    assert caller.before()["called by"] == caller.after_formatted()["called by"]
+    for depth in (0, 20):
+        print(f"stack depth +{depth} :")
+        for name in ("before", "after", "after_formatted"):
+            function = getattr(caller, name)
+            number = 200 if name == "before" else 200000
+            seconds = min(timeit.repeat(lambda: nested(depth, function), number = number, repeat = 5))
+            print(f"    {name:<16} {seconds / number * 1e6:10.2f} µs/call")
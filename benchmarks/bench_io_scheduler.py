@@ -0,0 +1,110 @@
+# bench_io_scheduler.py
+
+# Benchmark of concurrent imports over simulated disks, each with a bandwidth and a seek time paid whenever
+# it switches from one stream to another (spinning disk heads) :
+# - naive : every copy on a plain thread pool, streams on the same disk interleave and thrash
+# - IOScheduler : at most `per_device` copies per disk, disks kept busy in parallel
+# Run from the repository root : python benchmarks/bench_io_scheduler.py [--jobs 24] [--workers 8] [--per-device 1]
+
+# Library imports :
+import argparse
+import concurrent.futures
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module imports :
+from IOScheduler import IOScheduler
+
+class SimulatedDisk:
+    """
+    Disk serving one chunk at a time at `bandwidth` bytes per second, plus `seek` seconds when the chunk
+    belongs to another stream than the previous one
+    """
+    def __init__(self, bandwidth : float, seek : float):
+        """
+        Idle disk, bandwidth in bytes per second
+        """
+        self.bandwidth = bandwidth
+        self.seek = seek
+        self.lock = threading.Lock()
+        self.last_stream = None
+        self.seeks = 0
+
+    def transfer(self, stream, size : int):
+        """
+        Read or write a chunk of a stream, waiting for the disk if another chunk is being served
+        """
+        with self.lock:
+            delay = size / self.bandwidth
+            if self.last_stream is not stream:
+                delay += self.seek
+                self.seeks += self.last_stream is not None
+            self.last_stream = stream
+            time.sleep(delay)
+
+def simulated_copy(disks : dict[str, SimulatedDisk], source : str, destination : str, size : int, chunk_size : int):
+    """
+    Copy `size` bytes chunk by chunk : read from the source disk, then write to the destination disk
+    """
+    stream = object()
+    for offset in range(0, size, chunk_size):
+        chunk = min(chunk_size, size - offset)
+        disks[device_of(source)].transfer(stream, chunk)
+        disks[device_of(destination)].transfer(stream, chunk)
+
+def device_of(path : str) -> str:
+    """
+    Simulated paths are /<disk>/<file>
+    """
+    return path.split("/")[1]
+
+def make_jobs(count : int, sources : str, destinations : str, megabytes : tuple[int, int]) -> list[tuple[str, str, int]]:
+    """
+    Copies from random source disks to random destination disks, random sizes
+    """
+    random.seed(0)
+    return [(f"/{random.choice(sources)}/file{number}", f"/{random.choice(destinations)}/library", random.randint(*megabytes) << 20) for number in range(count)]
+
+def run(jobs, disks, chunk_size : int, workers : int, per_device : int = None) -> float:
+    """
+    Run every job, naively on a thread pool when per_device is None, returns the elapsed time
+    """
+    start = time.perf_counter()
+    if per_device is None:
+        with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as pool:
+            futures = [pool.submit(simulated_copy, disks, source, destination, size, chunk_size) for source, destination, size in jobs]
+    else:
+        with IOScheduler(per_device, workers, device_of = device_of, free_bytes = lambda path: 1 << 50) as scheduler:
+            futures = [scheduler.submit(source, destination, size, simulated_copy, disks, source, destination, size, chunk_size) for source, destination, size in jobs]
+    for future in futures:
+        future.result()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark IOScheduler against naive parallel copies on simulated disks")
+    parser.add_argument("--jobs", type = int, default = 24)
+    parser.add_argument("--workers", type = int, default = 8)
+    parser.add_argument("--per-device", type = int, default = 1)
+    parser.add_argument("--sources", default = "ABC", help = "source disks, one letter each")
+    parser.add_argument("--destinations", default = "DE", help = "destination disks, one letter each")
+    parser.add_argument("--bandwidth", type = float, default = 2000, help = "simulated MB/s of every disk")
+    parser.add_argument("--seek", type = float, default = 0.008, help = "simulated seconds per stream switch")
+    parser.add_argument("--chunk", type = int, default = 4, help = "copy chunk in MB")
+    arguments = parser.parse_args()
+
+    jobs = make_jobs(arguments.jobs, arguments.sources, arguments.destinations, (20, 200))
+    total = sum(size for _, _, size in jobs)
+    print(f"{len(jobs)} copies, {total >> 20} MB over {len(arguments.sources)} source and {len(arguments.destinations)} destination disks")
+    results = {}
+    for name, per_device in (("naive", None), ("IOScheduler", arguments.per_device)):
+        disks = {letter:SimulatedDisk(arguments.bandwidth * 1e6, arguments.seek) for letter in arguments.sources + arguments.destinations}
+        elapsed = run(jobs, disks, arguments.chunk << 20, arguments.workers, per_device)
+        results[name] = elapsed
+        print(f"{name:<12}: {elapsed:6.2f} s, {total / elapsed / 1e6:7.1f} MB/s aggregate, {sum(disk.seeks for disk in disks.values())} seeks")
+    print(f"IOScheduler is {results['naive'] / results['IOScheduler']:.2f}x faster")
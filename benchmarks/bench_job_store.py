@@ -0,0 +1,88 @@
+# bench_job_store.py
+
+# Benchmark of the job history over a large store, as the GUI panel reads it :
+# - naive : every job read at once into a list (what a QListWidget with one item per job needs)
+# - paged : count() then one page of JobHistoryWidget.PAGE_SIZE rows per screen, as JobHistoryModel reads
+#   them while the view scrolls, from the top to the bottom of the list, then at random places
+# - filtered : the same with a title filter and a state filter
+# Run from the repository root : python benchmarks/bench_job_store.py [--jobs 50000]
+
+# Library imports :
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module imports :
+from JobStore import JobStore, FINAL_STATES
+
+# Rows per page, as in JobHistoryWidget (not imported, it needs PyQt6) :
+PAGE_SIZE = 256
+
+def timed(function) -> tuple[any, float, int]:
+    """
+    Result of a call, its seconds and the peak of memory it allocated
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def scroll(store : JobStore, pages : list[int], state : str = None, title : str = "") -> int:
+    """
+    Read the pages a view shows, returns the rows read
+    """
+    rows = 0
+    count = store.count(state, title)
+    for number in pages:
+        if number * PAGE_SIZE < count:
+            rows += len(store.page(number * PAGE_SIZE, PAGE_SIZE, state, title))
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark paged reads of the job history")
+    parser.add_argument("--jobs", type = int, default = 50000)
+    arguments = parser.parse_args()
+
+    random.seed(0)
+    directory = tempfile.mkdtemp(prefix = "centaurus-bench-")
+    try:
+        store = JobStore(os.path.join(directory, "jobs.sqlite"))
+        words = ["Matrix", "Alien", "Heat", "Fargo", "Brazil", "Ronin", "Gattaca", "Memento", "Tron", "Dune"]
+        start = time.perf_counter()
+        job_ids = store.add_many([(f"/downloads/{random.choice(words)}.{number}.1080p.mkv", None, "") for number in range(arguments.jobs)])
+        elapsed = time.perf_counter() - start
+        for job_id in job_ids:
+            if job_id % 7:
+                store.update(job_id, state = random.choice(FINAL_STATES), title = f"{random.choice(words)} {job_id}")
+        print(f"{arguments.jobs} jobs added in {elapsed:.2f} s (one transaction)")
+
+        rows, elapsed, peak = timed(lambda: store.page(0, arguments.jobs))
+        print(f"naive, every row         : {elapsed * 1e3:8.1f} ms, {peak >> 10:7} KiB, {len(rows)} rows")
+        del rows
+
+        total_pages = (arguments.jobs + PAGE_SIZE - 1) // PAGE_SIZE
+        rows, elapsed, peak = timed(lambda: scroll(store, [0]))
+        print(f"paged, first screen      : {elapsed * 1e3:8.1f} ms, {peak >> 10:7} KiB, {rows} rows")
+        rows, elapsed, peak = timed(lambda: scroll(store, range(total_pages)))
+        print(f"paged, scrolled to bottom: {elapsed * 1e3:8.1f} ms, {peak >> 10:7} KiB peak, {elapsed / total_pages * 1e3:.2f} ms per page")
+        jumps = [random.randrange(total_pages) for _ in range(100)]
+        rows, elapsed, peak = timed(lambda: scroll(store, jumps))
+        print(f"paged, 100 random jumps  : {elapsed * 1e3:8.1f} ms, {peak >> 10:7} KiB peak, {elapsed / len(jumps) * 1e3:.2f} ms per page")
+        rows, elapsed, peak = timed(lambda: scroll(store, [0], None, "matrix"))
+        print(f"filtered, title          : {elapsed * 1e3:8.1f} ms, {peak >> 10:7} KiB, first page of {store.count(None, 'matrix')} jobs")
+        rows, elapsed, peak = timed(lambda: scroll(store, [0, 10], "failed", "dune"))
+        print(f"filtered, state and title: {elapsed * 1e3:8.1f} ms, {peak >> 10:7} KiB, 2 pages of {store.count('failed', 'dune')} jobs")
+        store.close()
+    finally:
+        shutil.rmtree(directory)
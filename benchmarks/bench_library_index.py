@@ -0,0 +1,87 @@
+# bench_library_index.py
+
+# Benchmark of "is this movie already in the library ?" over a library of movie folders, each holding an NFO
+# and a small media file :
+# - walk : what it took without an index, listing the library and reading NFOs until the movie is found
+# - LibraryIndex : one indexed SQLite lookup
+# And of keeping the index up to date : first scan, rescan without changes, rescan after a few folders changed
+# Run from the repository root : python benchmarks/bench_library_index.py [--folders 20000] [--lookups 200]
+
+# Library imports :
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module imports :
+from LibraryIndex import LibraryIndex, read_nfo
+from NfoWriter import render_nfo
+
+def make_library(base_path : str, count : int):
+    """
+    Movie folders as create_data() writes them
+    """
+    for movie_id in range(count):
+        folder_name = f"Movie_{movie_id}"
+        folder = os.path.join(base_path, folder_name)
+        os.makedirs(os.path.join(folder, "metadata"))
+        with open(os.path.join(folder, f"{folder_name}.nfo"), "w", encoding = "utf-8") as nfo_file:
+            nfo_file.write(render_nfo({"id":movie_id, "imdb_id":f"tt{movie_id:07d}", "title":f"Movie {movie_id}", "release_date":"2000-01-01", "overview":"", "genres":[], "vote_average":5.0}))
+        with open(os.path.join(folder, f"movie_{movie_id}.mkv"), "wb") as media_file:
+            media_file.write(b"\0" * 1024)
+
+def walk_find(base_path : str, movie_id : int) -> str:
+    """
+    Folder holding a movie, found by reading the NFOs of the library
+    """
+    for entry in os.scandir(base_path):
+        for name in os.listdir(entry.path):
+            if name.endswith(".nfo") and read_nfo(os.path.join(entry.path, name))["tmdb_id"] == str(movie_id):
+                return entry.path
+    return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark library lookups and rescans with LibraryIndex against walking the library")
+    parser.add_argument("--folders", type = int, default = 20000)
+    parser.add_argument("--lookups", type = int, default = 200)
+    parser.add_argument("--changed", type = int, default = 100, help = "folders changed before the last rescan")
+    arguments = parser.parse_args()
+
+    random.seed(0)
+    directory = tempfile.mkdtemp(prefix = "centaurus-bench-")
+    try:
+        base_path = os.path.join(directory, "library")
+        make_library(base_path, arguments.folders)
+        index = LibraryIndex(os.path.join(directory, "library.sqlite"))
+
+        start = time.perf_counter()
+        counts = index.rescan(base_path)
+        print(f"first scan    : {counts['read']} folders read in {time.perf_counter() - start:6.3f} s")
+        start = time.perf_counter()
+        counts = index.rescan(base_path)
+        print(f"rescan        : {counts['checked']} folders checked, {counts['read']} read in {time.perf_counter() - start:6.3f} s")
+        for movie_id in random.sample(range(arguments.folders), arguments.changed):
+            os.rename(os.path.join(base_path, f"Movie_{movie_id}", f"movie_{movie_id}.mkv"), os.path.join(base_path, f"Movie_{movie_id}", f"movie_{movie_id}.1080p.mkv"))
+        start = time.perf_counter()
+        counts = index.rescan(base_path)
+        print(f"rescan        : {counts['checked']} folders checked, {counts['read']} read in {time.perf_counter() - start:6.3f} s ({arguments.changed} changed)")
+
+        wanted = [random.randrange(arguments.folders * 2) for _ in range(arguments.lookups)] # half of them missing
+        walk_lookups = wanted[:max(1, arguments.lookups // 20)]
+        start = time.perf_counter()
+        found = sum(walk_find(base_path, movie_id) is not None for movie_id in walk_lookups)
+        elapsed_walk = (time.perf_counter() - start) / len(walk_lookups)
+        print(f"walk          : {elapsed_walk * 1e3:9.3f} ms per lookup ({found}/{len(walk_lookups)} found)")
+        start = time.perf_counter()
+        found = sum(bool(index.find("tmdb", movie_id)) for movie_id in wanted)
+        elapsed_index = (time.perf_counter() - start) / len(wanted)
+        print(f"LibraryIndex  : {elapsed_index * 1e3:9.3f} ms per lookup ({found}/{len(wanted)} found, {elapsed_walk / elapsed_index:.0f}x faster)")
+        index.close()
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,114 @@
+# bench_link_parser.py
+
+# Benchmark of ID extraction over a large list of mixed links (desktop, mobile and locale IMDB/TMDB URLs,
+# bare tt IDs, TV shows and unrelated links) :
+# - two searches : the previous extract_id(), one re.search for IMDB then one for TMDB, without its logging
+# - extract_ids() : LinkParser's single precompiled pattern, streamed over the whole list
+# - FileManager : the previous extract_id() with its three log entries per link, against FileManager.extract_ids()
+# Run from the repository root : python benchmarks/bench_link_parser.py [--links 1000000] [--logged 20000]
+
+# Library imports :
+import argparse
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module imports :
+from FileManager import FileManager
+from LinkParser import extract_ids
+from LogWriter import LogWriter
+
+def two_searches(link : str) -> tuple[str, str]:
+    """
+    The previous extract_id(), without its logging
+    """
+    imdb_match = re.search(r"imdb\.com/title/(tt\d+)", link)
+    tmdb_match = re.search(r"themoviedb\.org/movie/(\d+)", link)
+    if imdb_match:
+        return "imdb", imdb_match.group(1)
+    elif tmdb_match:
+        return "tmdb", tmdb_match.group(1)
+    else:
+        return None, None
+
+def logged_two_searches(filemanager : FileManager, link : str) -> tuple[str, str]:
+    """
+    The previous extract_id(), with its logging
+    """
+    filemanager.logger.write("ACTION", {"action":f"Started ID exctraction from link {link}", "output":"0"})
+    imdb_match = re.search(r"imdb\.com/title/(tt\d+)", link)
+    filemanager.logger.write("ACTION", {"action":"Performed IMDB search", "output":f"{imdb_match is None}"})
+    tmdb_match = re.search(r"themoviedb\.org/movie/(\d+)", link)
+    filemanager.logger.write("ACTION", {"action":"Performed TMDB search", "output":f"{tmdb_match is None}"})
+    if imdb_match:
+        return "imdb", imdb_match.group(1)
+    elif tmdb_match:
+        return "tmdb", tmdb_match.group(1)
+    else:
+        return None, None
+
+def make_links(count : int) -> list[str]:
+    """
+    Links of every supported shape, plus about 5% of links without any ID
+    """
+    random.seed(0)
+    shapes = [
+        "https://www.imdb.com/title/tt{imdb}/",
+        "https://m.imdb.com/title/tt{imdb}/?ref_=nv_sr_srsg_0",
+        "https://www.imdb.com/fr/title/tt{imdb}/reference",
+        "tt{imdb}",
+        "https://www.themoviedb.org/movie/{tmdb}-some-title",
+        "https://www.themoviedb.org/movie/{tmdb}?language=fr-FR",
+        "https://www.themoviedb.org/tv/{tmdb}",
+        "https://www.example.com/watch?v={tmdb}",
+    ]
+    weights = [30, 5, 5, 10, 30, 5, 10, 5]
+    return [shape.format(imdb = f"{random.randrange(10 ** 7):07d}", tmdb = random.randrange(10 ** 6)) for shape in random.choices(shapes, weights, k = count)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark LinkParser against the previous two-search extract_id()")
+    parser.add_argument("--links", type = int, default = 1000000)
+    parser.add_argument("--logged", type = int, default = 20000, help = "links run through FileManager, with logging")
+    arguments = parser.parse_args()
+
+    links = make_links(arguments.links)
+    start = time.perf_counter()
+    old = [two_searches(link) for link in links]
+    elapsed_old = time.perf_counter() - start
+    start = time.perf_counter()
+    new = [(id_type, movie_id) for _, id_type, movie_id in extract_ids(links)]
+    elapsed_new = time.perf_counter() - start
+    print(f"two searches  : {len(links)} links in {elapsed_old:6.2f} s, {len(links) / elapsed_old * 60 / 1e6:6.1f} M links/min, {sum(movie_id is not None for _, movie_id in old)} IDs")
+    print(f"extract_ids() : {len(links)} links in {elapsed_new:6.2f} s, {len(links) / elapsed_new * 60 / 1e6:6.1f} M links/min, {sum(movie_id is not None for _, movie_id in new)} IDs ({elapsed_old / elapsed_new:.1f}x faster)")
+    changed = sum(previous != current for previous, current in zip(old, new) if previous[1] is not None)
+    print(f"{changed} links the previous extract_id() understood got another ID")
+
+    directory = tempfile.mkdtemp(prefix = "centaurus-bench-")
+    shutil.copy(os.path.join(ROOT, "config.json"), directory)
+    os.chdir(directory)
+    try:
+        logger = LogWriter("log.txt")
+        filemanager = FileManager(logger, "key")
+        sample = links[:arguments.logged]
+        start = time.perf_counter()
+        for link in sample:
+            logged_two_searches(filemanager, link)
+        logger.drain()
+        elapsed_old = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in filemanager.extract_ids(sample):
+            pass
+        logger.drain()
+        elapsed_new = time.perf_counter() - start
+        print(f"FileManager   : {len(sample)} links, previous extract_id() {elapsed_old:6.2f} s, extract_ids() {elapsed_new:6.3f} s ({elapsed_old / elapsed_new:.0f}x faster)")
+        logger.close()
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(directory)
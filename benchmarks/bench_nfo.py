@@ -0,0 +1,97 @@
+# bench_nfo.py
+
+# Benchmark of bulk NFO regeneration from cached metadata records :
+# - minidom : the previous generate_nfo(), ElementTree -> string -> minidom.parseString -> toprettyxml -> splitlines
+# - NfoWriter : one pass, written straight to the file
+# Both write one .nfo file per record, and their outputs are compared byte for byte
+# Run from the repository root : python benchmarks/bench_nfo.py [--records 10000]
+
+# Library imports :
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from xml.dom import minidom
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module imports :
+from MetadataCache import MetadataCache
+from NfoWriter import write_nfo
+
+def minidom_nfo(movie_data : dict[str, any]) -> str:
+    """
+    The previous generate_nfo(), without its logging
+    """
+    title = movie_data.get("title", "Unknown Title")
+    year = movie_data.get("release_date", "Unknown Year").split("-")[0]
+    plot = movie_data.get("overview", "")
+    imdb_link = f"https://www.imdb.com/title/{movie_data.get('imdb_id')}" if movie_data.get("imdb_id") else ""
+    tmdb_link = f"https://www.themoviedb.org/movie/{movie_data.get('id')}"
+    movie = ET.Element("movie")
+    ET.SubElement(movie, "title").text = title
+    ET.SubElement(movie, "year").text = year
+    ET.SubElement(movie, "plot").text = plot
+    ET.SubElement(movie, "imdb").text = imdb_link
+    ET.SubElement(movie, "tmdb").text = tmdb_link
+    ET.SubElement(movie, "genres").text = ", ".join([genre["name"] for genre in movie_data.get("genres", [])])
+    ET.SubElement(movie, "rating").text = str(movie_data.get("vote_average", "N/A"))
+    raw_xml = ET.tostring(movie, encoding="UTF-8", method="xml").decode("UTF-8")
+    pretty_xml = minidom.parseString(raw_xml).toprettyxml(indent="    ")
+    return "\n".join(pretty_xml.splitlines()[1:])
+
+def make_record(movie_id : int) -> dict[str, any]:
+    """
+    Movie data shaped like a TMDB answer, with text needing escaping now and then
+    """
+    words = ["the", "night", "of", "return", "l'été", "Tom & Jerry", "<b>", "\"quoted\"", "漢字", "dream", "city"]
+    return {
+        "id":movie_id,
+        "imdb_id":f"tt{movie_id:07d}" if movie_id % 5 else None,
+        "title":" ".join(random.choices(words, k = random.randint(1, 4))),
+        "release_date":f"{random.randint(1920, 2025)}-0{random.randint(1, 9)}-1{random.randint(0, 9)}",
+        "overview":" ".join(random.choices(words, k = random.randint(0, 120))),
+        "genres":[{"id":number, "name":name} for number, name in enumerate(random.sample(["Drama", "Comedy", "Action", "Horror", "Science Fiction"], k = random.randint(0, 3)))],
+        "vote_average":round(random.uniform(0, 10), 3),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark NFO regeneration over cached metadata records")
+    parser.add_argument("--records", type = int, default = 10000)
+    arguments = parser.parse_args()
+
+    random.seed(0)
+    directory = tempfile.mkdtemp(prefix = "centaurus-bench-")
+    try:
+        cache = MetadataCache(os.path.join(directory, "cache.sqlite"), max_bytes = 0)
+        for movie_id in range(arguments.records):
+            cache.put("tmdb", movie_id, make_record(movie_id))
+        records = [cache.get("tmdb", movie_id) for movie_id in range(arguments.records)]
+        cache.close()
+
+        timings = {}
+        for name in ("minidom", "NfoWriter"):
+            output = os.path.join(directory, name)
+            os.mkdir(output)
+            start = time.perf_counter()
+            for movie_data in records:
+                with open(os.path.join(output, f"{movie_data['id']}.nfo"), "w", encoding = "utf-8") as nfo_file:
+                    if name == "minidom":
+                        nfo_file.write(minidom_nfo(movie_data))
+                    else:
+                        write_nfo(movie_data, nfo_file)
+            timings[name] = time.perf_counter() - start
+            print(f"{name:<10}: {len(records)} NFO files in {timings[name]:6.2f} s ({timings[name] / len(records) * 1e6:6.1f} us each)")
+
+        differences = 0
+        for movie_data in records:
+            with open(os.path.join(directory, "minidom", f"{movie_data['id']}.nfo"), 'rb') as old, open(os.path.join(directory, "NfoWriter", f"{movie_data['id']}.nfo"), 'rb') as new:
+                differences += old.read() != new.read()
+        print(f"NfoWriter is {timings['minidom'] / timings['NfoWriter']:.1f}x faster, {differences} files differ")
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,125 @@
+# bench_title_index.py
+
+# Benchmark of the offline title index over a synthetic TMDB dump :
+# - build time and size of the index of `--titles` movies
+# - latency of identify() on release names made from random movies of the dump, spelled right, with two
+#   neighbour letters swapped or with a mistyped letter, and how many of them come back with the right TMDB ID
+# - the same on release names of movies missing from the dump, which should come back without a match
+# Run from the repository root : python benchmarks/bench_title_index.py [--titles 1000000] [--queries 1000]
+
+# Library imports :
+import argparse
+import gzip
+import itertools
+import json
+import os
+import random
+import shutil
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module imports :
+from TitleIndex import TitleIndex, build_index, read_dump, normalize
+
+SYLLABLES = ("ka", "lo", "mi", "ra", "ven", "tor", "el", "an", "dra", "sil", "mor", "ith", "qu", "zen", "bel", "ro", "sha", "ne", "ul", "gar", "fi", "os", "pen", "dy", "ac", "wor", "th", "é", "ña", "ch")
+COMMON = ("the", "of", "a", "and", "in", "la", "le", "de", "night", "love", "man", "last", "day")
+
+def make_vocabulary(count : int) -> list[str]:
+    """
+    Made-up words of 2 to 4 syllables, drawn with a Zipf distribution like the words of real titles
+    """
+    random.seed(0)
+    return list(COMMON) + ["".join(random.choice(SYLLABLES) for _ in range(random.randint(2, 4))) for _ in range(count)]
+
+QUALITIES = ("1080p.BluRay.x264-GRP", "720p.WEB-DL.AAC", "2160p.UHD.HDR.HEVC-RLS", "DVDRip.XviD", "WEBRip.x265")
+
+def write_dump(path : str, count : int):
+    """
+    Synthetic dump : titles of 1 to 5 random words, some with an original title, release years 1920-2025
+    """
+    words = make_vocabulary(50000)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    random.seed(0)
+    with gzip.open(path, "wt", encoding = "utf-8") as dump:
+        for movie_id in range(1, count + 1):
+            title = " ".join(random.choices(words, cum_weights = weights, k = random.choice((1, 2, 2, 3, 3, 3, 4, 5)))).title()
+            movie = {"id":movie_id, "title":title, "release_date":f"{random.randint(1920, 2025)}-01-01", "popularity":round(random.expovariate(0.5), 3)}
+            if random.random() < 0.2:
+                movie["original_title"] = " ".join(random.choices(words, cum_weights = weights, k = 3))
+            dump.write(json.dumps(movie, ensure_ascii = False) + "\n")
+
+def swap(title : str) -> str:
+    """
+    Swap two neighbour letters of a title
+    """
+    position = random.randrange(max(1, len(title) - 1))
+    return title[:position] + title[position + 1:position + 2] + title[position:position + 1] + title[position + 2:]
+
+def mistype(title : str) -> str:
+    """
+    Replace a letter of a title by another one
+    """
+    position = random.choice([position for position, character in enumerate(title) if character.isalpha()])
+    return title[:position] + random.choice(string.ascii_lowercase.replace(title[position].lower(), "")) + title[position + 1:]
+
+def release_name(title : str, year : int) -> str:
+    """
+    Release file name of a movie
+    """
+    return f"{title.replace(' ', '.')}.{year}.{random.choice(QUALITIES)}.mkv"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the offline title index")
+    parser.add_argument("--titles", type = int, default = 1000000)
+    parser.add_argument("--queries", type = int, default = 1000, help = "release names of every kind")
+    arguments = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix = "centaurus-bench-")
+    try:
+        dump_path = os.path.join(directory, "movies.json.gz")
+        index_path = os.path.join(directory, "titles.idx")
+        write_dump(dump_path, arguments.titles)
+        start = time.perf_counter()
+        entries = build_index(read_dump(dump_path), index_path)
+        print(f"build    : {entries} titles of {arguments.titles} movies in {time.perf_counter() - start:.1f} s, {os.path.getsize(index_path) / 2**20:.1f} MiB")
+
+        movies = {movie_id:(titles[0], year) for movie_id, titles, year, _ in read_dump(dump_path)}
+        random.seed(1)
+        queries = {}
+        for kind, change in (("spelled right", lambda title: title), ("letters swapped", swap), ("letter mistyped", mistype)):
+            queries[kind] = [(movie_id, release_name(change(movies[movie_id][0]), movies[movie_id][1])) for movie_id in random.sample(range(1, arguments.titles + 1), arguments.queries)]
+        # Titles made of the same words as the dump, but of no movie of it :
+        words = make_vocabulary(50000)[len(COMMON):]
+        known = {normalize(title) for title, _ in movies.values()}
+        queries["not in the dump"] = []
+        while len(queries["not in the dump"]) < arguments.queries:
+            title = " ".join(random.choice(words) for _ in range(random.choice((2, 3, 3, 4)))).title()
+            if normalize(title) not in known:
+                queries["not in the dump"].append((None, release_name(title, random.randint(1920, 2025))))
+        del known
+
+        start = time.perf_counter()
+        title_index = TitleIndex(index_path)
+        print(f"open     : {(time.perf_counter() - start) * 1000:.2f} ms")
+        for kind, names in queries.items():
+            latencies, found, correct = [], 0, 0
+            for movie_id, name in names:
+                start = time.perf_counter()
+                match = title_index.identify(name)
+                latencies.append(time.perf_counter() - start)
+                found += match is not None
+                if movie_id is None: # right when nothing matches
+                    correct += match is None
+                else: # synthetic titles repeat, an equally good match (same title and year) counts as right
+                    correct += match is not None and (match["id"] == movie_id or movies[match["id"]] == movies[movie_id])
+            latencies.sort()
+            print(f"identify, {kind:15} : mean {statistics.mean(latencies) * 1000:.3f} ms, median {latencies[len(latencies) // 2] * 1000:.3f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.3f} ms, {found}/{len(names)} matched, {correct} right")
+        title_index.close()
+    finally:
+        shutil.rmtree(directory)
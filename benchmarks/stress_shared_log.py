@@ -0,0 +1,102 @@
+# stress_shared_log.py
+
+# Stress test of multi-process logging : N processes write to the same log concurrently, either directly
+# (LogWriter(shared = True)) or through a LogCollector, then every segment is parsed to check that entry
+# numbers are unique and contiguous and that no entry was torn or interleaved with another one
+# Run from the repository root : python benchmarks/stress_shared_log.py [--processes 8] [--entries 500] [--collector]
+
+# Library imports :
+import argparse
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module imports :
+from LogWriter import LogWriter
+from LogSegments import LogSegments
+from LogCollector import LogClient, LogCollector
+
+# An entry as written by the producers : header, timestamp, type, then exactly these two arguments
+ENTRY = re.compile(r"entry (\d+) :\n├── timestamp : \S+\n└── type : DEBUG\n    ├── message : (p\d+-\d+)\n    └── padding : (x*)\n")
+
+def produce(worker : int, entries : int, queued : bool, socket_path : str):
+    """
+    Write `entries` numbered messages from one process
+    """
+    if socket_path:
+        logger = LogClient(socket_path, queued = queued)
+    else:
+        logger = LogWriter("log.txt", queued = queued, shared = True, max_segment_bytes = 64 << 10)
+    for index in range(entries):
+        # Varying sizes, so that writes of different processes would interleave if they weren't atomic :
+        logger.write("DEBUG", {"message":f"p{worker}-{index}", "padding":"x" * (index * 37 % 3000)})
+    logger.close()
+
+def check(processes : int, entries : int):
+    """
+    Parse every segment and verify numbering and integrity, returns the number of entries found
+    """
+    segments = LogSegments("log.txt")
+    paths = [segments.segment_path(segment_id) for segment_id in segments.segment_ids] + [segments.path]
+    segments.close()
+    numbers = []
+    messages = set()
+    for path in paths:
+        with open(path, encoding = "utf-8") as file:
+            text = file.read()
+        position = 0
+        for match in ENTRY.finditer(text):
+            assert match.start() == position, f"torn or interleaved entry in {path} at byte {position}"
+            position = match.end()
+            number, message, padding = int(match.group(1)), match.group(2), match.group(3)
+            worker, index = map(int, message[1:].split("-"))
+            assert len(padding) == index * 37 % 3000, f"entry {number} has a truncated argument"
+            numbers.append(number)
+            messages.add(message)
+        assert position == len(text), f"garbage at the end of {path}"
+    assert len(numbers) == len(set(numbers)), "duplicated entry numbers"
+    assert sorted(numbers) == list(range(1, processes * entries + 1)), "missing entry numbers"
+    assert len(messages) == processes * entries, "lost entries"
+    return len(numbers)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--processes", type = int, default = 8)
+    parser.add_argument("--entries", type = int, default = 500)
+    parser.add_argument("--queued", action = "store_true", help = "use the queued writer in every producer")
+    parser.add_argument("--collector", action = "store_true", help = "stream entries to a Unix socket collector")
+    arguments = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix = "centaurus-stress-")
+    shutil.copy(os.path.join(ROOT, "config.json"), directory)
+    os.chdir(directory)
+    collector = None
+    socket_path = None
+    if arguments.collector:
+        socket_path = os.path.join(directory, "log.sock")
+        collector = LogCollector(LogWriter("log.txt", queued = True, max_segment_bytes = 64 << 10), socket_path)
+        collector.start()
+    try:
+        start = time.perf_counter()
+        workers = [multiprocessing.Process(target = produce, args = (worker, arguments.entries, arguments.queued, socket_path)) for worker in range(arguments.processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert worker.exitcode == 0, "a producer failed"
+        if collector is not None:
+            collector.stop()
+            collector.logger.close()
+        elapsed = time.perf_counter() - start
+        found = check(arguments.processes, arguments.entries)
+        print(f"{found} entries from {arguments.processes} processes in {elapsed:.2f} s ({found / elapsed:.0f} entries/s) : numbering unique and contiguous, no torn entry")
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(directory)
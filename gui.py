@@ -2,24 +2,27 @@
 
 # Library imports :
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QFrame, QSizePolicy)
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QFileSystemWatcher, QTimer
 from PyQt6.QtGui import QColor, QPalette
 import sys
-import os
-import inspect
 import json
-import sass
 
 # Module imports :
-from LogWriter import LogWriter
+from LogCollector import open_logger
 from FileSelectorWidget import FileSelectorWidget
 from SingleLineTextbox import SingleLineTextbox
-from FileManager import FileManager
-
-# Initialize LogWriter :
-logger = LogWriter("log.txt")
-# Write to log file :
-logger.write("ACTION", {"action":"Initialize LogWriter", "invoker":f"file : {os.path.basename(__file__)}", "output":"0"})
+from FileManager import FileManager, TMDB_API_KEY
+from MetadataCache import MetadataCache
+from TMDBClient import TMDBClient
+from TitleIndex import open_title_index, MEDIA_EXTENSIONS
+from LibraryIndex import LibraryIndex
+from FileHasher import FileHasher
+from ArtworkCache import ArtworkCache
+from ImportJobs import JobQueue
+from JobStore import JobStore
+from JobHistoryWidget import JobHistoryWidget
+from Stylesheet import compile_stylesheet
+from WatchDaemon import find_link
 
 # Main window :
 class MainWindow(QWidget):
@@ -35,19 +38,42 @@ class MainWindow(QWidget):
         self.logger = logger
 
         # Write to log file :
-        self.logger.write("ACTION", {"action":"Initialize MainWindow", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
+        self.logger.write("ACTION", {"action":"Initialize MainWindow", "output":"0"})
 
         # Load config.json file :
         with open("config.json") as config_file:
             self.config = json.load(config_file)
         # Write to log file :
-        self.logger.write("ACTION", {"action":"Load config.json", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
+        self.logger.write("ACTION", {"action":"Load config.json", "output":"0"})
+
+        # Metadata cache and TMDB client shared by every import :
+        self.cache = MetadataCache(**self.config["cache"])
+        self.client = TMDBClient(**self.config["network"])
+        self.filemanager = FileManager(self.logger, TMDB_API_KEY, self.cache, self.client, self.config["placement"], open_title_index(self.config["title_index"]["path"]), self.config["title_index"]["min_score"], LibraryIndex(self.config["library"]["index"]), self.config["library"]["conflicts"], FileHasher(**self.config["hash_parameters"]), ArtworkCache(**self.config["artwork"]))
+
+        # Imports run on worker threads, the window only follows them, and they are kept in the history :
+        self.store = JobStore(self.config["gui"]["history"])
+        self.store.interrupt_unfinished()
+        self.jobs = JobQueue(self.filemanager, self.config["paths"]["library"], self.config["gui"]["workers"], self.store)
+        self.jobs.signals.stageChanged.connect(self.job_stage)
+        self.jobs.signals.progressed.connect(self.job_progress)
+        self.jobs.signals.finished.connect(self.job_finished)
+        self.jobs.signals.failed.connect(self.job_failed)
+        self.jobs.signals.cancelled.connect(self.job_cancelled)
         
         # Window style :
         self.setWindowTitle(' ')
         self.setGeometry(100, 100, 400, 300)
-        self.stylesheet = self.compile_stylesheet('config.json')
+        self.stylesheet = self.compile_stylesheet(self.config["colors"])
         self.setStyleSheet(self.stylesheet)
+
+        # Reload the stylesheet when the colors of config.json change, once the file is fully written :
+        self.config_watcher = QFileSystemWatcher(["config.json"], self)
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(200)
+        self.reload_timer.timeout.connect(self.reload_stylesheet)
+        self.config_watcher.fileChanged.connect(lambda _: self.reload_timer.start())
         
         # Main vertical layout
         self.main_layout = QVBoxLayout()
@@ -97,7 +123,7 @@ class MainWindow(QWidget):
         self.path_textbox.setObjectName("path_textbox")
         self.path_textbox.setFixedHeight(110)
         
-        self.file_browser = FileSelectorWidget()
+        self.file_browser = FileSelectorWidget(extensions = tuple(MEDIA_EXTENSIONS), min_size = self.config["gui"]["min_file_size"])
         self.file_browser.setObjectName("file_browser")
         self.file_browser.setStyleSheet("background-color: #f44336;")
         self.file_browser.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
@@ -132,12 +158,23 @@ class MainWindow(QWidget):
         self.confirm_button.setObjectName("confirm_button")
         self.confirm_button.clicked.connect(self.confirm)
         self.layout_4.addWidget(self.confirm_button)
+
+        # 5. Layout 5 - History of the imports, and a button to cancel the selected one
+        self.layout_5 = QVBoxLayout()
+        self.history = JobHistoryWidget(self.store)
+        self.history.setObjectName("history")
+        self.cancel_button = QPushButton("Cancel import")
+        self.cancel_button.setObjectName("cancel_button")
+        self.cancel_button.clicked.connect(self.cancel_job)
+        self.layout_5.addWidget(self.history)
+        self.layout_5.addWidget(self.cancel_button)
         
         # Add all sublayouts to the main layout
         self.main_layout.addLayout(self.layout_1)
         self.main_layout.addLayout(self.layout_2)
         self.main_layout.addLayout(self.layout_3)
         self.main_layout.addLayout(self.layout_4)
+        self.main_layout.addLayout(self.layout_5)
         
         # Set main layout to the main window
         self.setLayout(self.main_layout)
@@ -159,114 +196,123 @@ class MainWindow(QWidget):
 
     def confirm(self):
         """
-        Start the downloading/file managing process
+        Queue the import of the selected files, they run on worker threads and the window stays usable
+        Each file takes the link given, else its own (see WatchDaemon.find_link()), else is identified from
+        its name ; the name field is only used for a single file (with several, a dropped folder, each one is
+        named after its movie)
         """
-        # Check if file/name/link are provided :
-        path = self.file_browser.getSelectedFilePath() if self.method == "file" else self.path_textbox.get_content()
+        # Check if file(s)/name/link are provided :
+        paths = self.file_browser.getSelectedFilePaths() if self.method == "file" else [self.path_textbox.get_content()]
+        paths = [path for path in paths if path]
         name = self.name_textbox.get_content()
         link = self.link_textbox.get_content()
-        if path and name and link:
-            # Working directory :
-            base_path = "/home/thomas/Documents"
-            # Initialize FileManager :
-            filemanager = FileManager(self.logger, "f0ceb830389ee3d912871135d4489911")
-            # Extract metadata :
-            id_type, id_no = filemanager.extract_id(link)
-            if not movie_id:
-                print("Error: Could not extract ID from the provided link")
-            else:
-                data = filemanager.fetch_data(id_type, id_no)
-                if data:
-                    # Generate NFO content and create folder structure :
-                    nfo_content = filemanager.generate_nfo(data)
-                    folder_name = movie_data.get("title", "Unknown").replace(" ", "_")
-                    filemanager.create_data(base_path, folder_name, path, nfo_content)
-                else:
-                    print("Error: Could not fetch movie data from TMDb")
+        if not paths:
+            return
+        items = [(path, (name or None) if len(paths) == 1 else None, link or find_link(path) or "") for path in paths]
+        job_ids = self.jobs.add_many(items)
+        self.history.model.schedule_refresh()
+        # Write to log file :
+        self.logger.write("ACTION", {"action":f"Queued imports {job_ids[0]} to {job_ids[-1]}", "output":"0"})
+
+    def job_stage(self, job_id : int, stage : str):
+        """
+        A job entered a stage (see ImportJobs.STAGES), its state is in the store
+        """
+        self.history.model.schedule_refresh()
+
+    def job_progress(self, job_id : int, copied : int, total : int, rate : float):
+        """
+        Progress of the copy of a job
+        """
+        percent = 100 * copied / total if total else 100
+        self.history.model.set_progress(job_id, f"placing {percent:.0f} % ({rate / 1e6:.1f} MB/s)")
 
-    def compile_stylesheet(self, json_file):
+    def job_finished(self, job_id : int, result : dict):
         """
-        Compile a Scss file into CSS for the window's stylesheet to allow reading variables from config.json
+        A job is over : imported, or skipped because the library already has it
         """
-        with open(json_file, 'r') as config_file:
-            config = json.load(config_file)
-        colors = config["colors"]
-        scss_content="""
-            $background_color:{background_color};
-            $list_background_color:{list_background_color};
-            $border_color:{border_color};
-            $item_background_color:{item_background_color};
-            $selected_item_background_color:{selected_item_background_color};
-            $main_text_color:{main_text_color};
-            $small_text_color:{small_text_color};
-            $button_text_color:{button_text_color};
-            $connect_button_color:{connect_button_color};
-            $disconnect_button_color:{disconnect_button_color};
-            $scroll_border_color:{scroll_border_color};
-            QWidget#central_widget {{
-                background-color:$background_color;
-            }}
-            QListWidget {{
-                background-color: $list_background_color;
-                border:1px solid $border_color;
-                padding: 5px;
-            }}
-            QListWidget::item {{
-                background-color: $item_background_color;
-                margin: 5px;
-                padding: 10px;
-                border-radius: 10px;
-                color: $border_color;
-            }}
-            QListWidget::item:selected {{
-                background-color: $selected_item_background_color;
-            }}
-            QLabel#title_label {{
-                font-size: 28px;
-                font-weight: bold;
-                color: $main_text_color;
-            }}
-            QLabel#status_label {{
-                font-size: 18px;
-                font-weight: bold;
-                color: $small_text_color;
-            }}
-            QLabel#address_label {{
-                font-size: 14px;
-                color: $small_text_color;
-            }}
-            QLabel#location_label {{
-                font-size: 14px;
-                color: $small_text_color;
-            }}
-            QPushButton {{
-                font-size: 16px;
-                font-weight: bold;
-                padding: 10px;
-                border-radius: 10px;
-            }}
-            QPushButton#connect_button {{
-                background-color: $connect_button_color;
-                color: white;
-            }}
-            QPushButton#disconnect_button {{
-                background-color: $disconnect_button_color;
-                color: white;
-            }}
-            QScrollArea {{
-                border: 2px solid $scroll_border_color;
-            }}
+        self.history.model.set_progress(job_id, None)
+        self.history.model.schedule_refresh()
+
+    def job_failed(self, job_id : int, error : str):
+        """
+        A job stopped on an error
         """
-        scss_formatted = scss_content.format(**colors)
-        stylesheet = sass.compile(string=scss_formatted)
+        self.history.model.set_progress(job_id, None)
+        self.history.model.schedule_refresh()
         # Write to log file :
-        self.logger.write("ACTION", {"action":"Formatted and compiled stylesheet", "invoker":{"file":f"{os.path.basename(__file__)}", "instance":f"{self}", "called by":f"{inspect.stack()[1].function}"}, "output":"0"})
+        self.logger.write("ERROR", {"message":f"Import {job_id} failed : {error}"})
+
+    def job_cancelled(self, job_id : int):
+        """
+        A job was cancelled, nothing of it is left in the library
+        """
+        self.history.model.set_progress(job_id, None)
+        self.history.model.schedule_refresh()
+
+    def cancel_job(self):
+        """
+        Cancel the job selected in the history
+        """
+        job_id = self.history.selected_job()
+        if job_id is not None:
+            self.jobs.cancel(job_id)
+
+    def closeEvent(self, event):
+        """
+        Cancel the imports still running and wait for them to clean up before closing
+        """
+        self.file_browser.stop_scans(wait = True)
+        self.jobs.shutdown() # the last signals of the jobs are handled by now
+        self.history.model.stop_refresh()
+        self.store.close()
+        self.filemanager.hasher.close()
+        if self.filemanager.artwork is not None:
+            self.filemanager.artwork.close()
+        self.logger.close()
+        super().closeEvent(event)
+
+    def compile_stylesheet(self, colors : dict[str, str]) -> str:
+        """
+        Stylesheet of the window with the colors of config.json, from the cache when they didn't change
+        (see Stylesheet.compile_stylesheet())
+        """
+        stylesheet, cached = compile_stylesheet(colors, self.config["gui"]["stylesheet_cache"])
+        # Write to log file :
+        self.logger.write("ACTION", {"action":"Loaded cached stylesheet" if cached else "Formatted and compiled stylesheet", "output":"0"})
         return stylesheet
-    
-# Start the application :
+
+    def reload_stylesheet(self):
+        """
+        Apply the colors of config.json again if they changed
+        """
+        # Editors replace the file rather than write it, which removes it from the watcher :
+        if "config.json" not in self.config_watcher.files():
+            self.config_watcher.addPath("config.json")
+        try:
+            with open("config.json") as config_file:
+                colors = json.load(config_file)["colors"]
+        except (OSError, ValueError, KeyError) as error:
+            # Write to log file :
+            self.logger.write("WARNING", {"message":f"Could not reload config.json : {error}"})
+            return
+        if colors != self.config["colors"]:
+            try:
+                self.stylesheet = self.compile_stylesheet(colors)
+            except Exception as error: # a color libsass rejects
+                # Write to log file :
+                self.logger.write("WARNING", {"message":f"Could not compile the stylesheet : {error}"})
+                return
+            self.config["colors"] = colors
+            self.setStyleSheet(self.stylesheet)
+
+# Start the application (only here : the hashing worker processes import this module again, see FileHasher) :
 if __name__ == '__main__':
+    # Initialize the logger (queued, the import workers log without waiting for the disk) :
+    logger = open_logger("log.txt", queued = True)
     # Write to log file :
-    logger.write("EVENT", {"event":"Started application","triggered by":f"file : {os.path.basename(__file__)}", "output":"0"})
+    logger.write("ACTION", {"action":"Initialize LogWriter", "output":"0"})
+    logger.write("EVENT", {"event":"Started application", "output":"0"})
     # Create the window
     app = QApplication(sys.argv)
     main_window = MainWindow(logger)